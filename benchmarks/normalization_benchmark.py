@@ -0,0 +1,126 @@
+"""
+Compares the names normalization against the previous regular expressions based implementation,
+on a directory of 10,000 files.
+
+Usage: python benchmarks/normalization_benchmark.py [files count]
+"""
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+import urllib.parse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from mp3organizer.file_utils import DirectoryIndex  # noqa: E402
+from mp3organizer.lyrics.lyrics_utils import URL_CHARACTERS, encode  # noqa: E402
+from mp3organizer.normalization import normalize_name, get_name_tokens  # noqa: E402
+
+FILES_COUNT = 10000
+REPEATS = 5
+WORDS = ['Yellow', 'Trouble', 'Don\'t', 'Panic', 'Shiver', 'Spies', 'Sparks', 'High', 'Speed', 'We', 'Never',
+         'Change', 'Everything\'s', 'Not', 'Lost', '(Live)', '[Remastered]', 'The', 'Scientist', 'Clocks', '–',
+         'Café', 'Life', 'Is', 'For', 'Living', 'feat.', 'A', 'Rush', 'Of', 'Blood']
+
+
+def regex_normalize_name(filename):
+    """
+    The previous implementation of normalize_name.
+    """
+    simple_string = re.sub('[^0-9a-zA-Z]', ' ', filename).lower()
+    return ' '.join(filter(lambda x: len(x) > 0, simple_string.split(' ')))
+
+
+def replace_encode(string):
+    """
+    The previous implementation of lyrics_utils.encode.
+    """
+    for char, replace in URL_CHARACTERS.items():
+        string = string.replace(char, replace)
+    return urllib.parse.quote(string)
+
+
+def create_names(count):
+    """
+    Creates random track file names.
+
+    :param count: The number of names.
+    :return: The names list.
+    """
+    random.seed(0)
+    return ['{:02d} - {}'.format(index % 99 + 1, ' '.join(random.choice(WORDS) for _ in range(random.randint(1, 6))))
+            for index in range(count)]
+
+
+def measure(function, *args):
+    """
+    :return: The best run time (in seconds) of the function.
+    """
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    files_count = int(sys.argv[1]) if len(sys.argv) > 1 else FILES_COUNT
+    names = create_names(files_count)
+    directory = tempfile.mkdtemp()
+    try:
+        for index, name in enumerate(names):
+            open(os.path.join(directory, '{} {}.mp3'.format(name, index)), 'w').close()
+        file_names = [os.path.splitext(entry)[0] for entry in os.listdir(directory)]
+
+        def regex_tokens():
+            for file_name in file_names:
+                tuple(regex_normalize_name(file_name).split(' '))
+
+        def uncached_tokens():
+            for file_name in file_names:
+                tuple(normalize_name.__wrapped__(file_name).split(' '))
+
+        def cached_tokens():
+            for file_name in file_names:
+                get_name_tokens(file_name)
+
+        def build_index():
+            get_name_tokens.cache_clear()
+            normalize_name.cache_clear()
+            DirectoryIndex(directory, '.mp3')
+
+        def replace_titles():
+            for name in names:
+                replace_encode(name)
+
+        def translate_titles():
+            for name in names:
+                encode.__wrapped__(name)
+
+        def cached_titles():
+            for name in names:
+                encode(name)
+
+        results = [
+            ('Tokens (regular expressions)', measure(regex_tokens)),
+            ('Tokens (translation table)', measure(uncached_tokens)),
+            ('Tokens (memoized)', measure(cached_tokens)),
+            ('Directory index (cold caches)', measure(build_index)),
+            ('URL characters (str.replace)', measure(replace_titles)),
+            ('URL characters (translation table)', measure(translate_titles)),
+            ('URL characters (memoized)', measure(cached_titles)),
+        ]
+        print('{} files:'.format(len(file_names)))
+        for title, elapsed in results:
+            print('{:<40}{:>10.2f} ms'.format(title, elapsed * 1000))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,38 +1,47 @@
+import copy
+import datetime
 import time
-import urllib.request
 import urllib.parse
 import hmac
-import gzip
 from base64 import b64encode
 from hashlib import sha256
 from itertools import islice
 
-from lxml import objectify, etree
+from lxml import etree
 import logbook
 
 from .amazon_exceptions import NoMorePages, SearchException, LookupException, ASINNotFound
+from mp3organizer import http_utils
+from mp3organizer.http_utils import fetch, fetch_async
 
 REGION = 'com'
 SERVICE_DOMAIN = 'ecs.amazonaws.com'
 VERSION = '2013-08-01'
-DEFAULT_TIMEOUT = 20
+# The service throttles clients sending more than a request per second.
+REQUESTS_PER_SECOND = 1.0
+# The default response groups (the items' attributes, tracks and images).
+RESPONSE_GROUP = 'ItemAttributes,Tracks,Images'
+# The maximal number of items the service looks up in a single request.
+MAX_LOOKUP_ITEMS = 10
 
 logger = logbook.Logger('AmazonClient')
 
+http_utils.set_host_rate(SERVICE_DOMAIN, REQUESTS_PER_SECOND)
+
 
 class AmazonAPI(object):
     """
     An API for querying the Amazon Web Service.
     """
 
-    def __init__(self, access_key, secret_key, associate_tag, timeout=DEFAULT_TIMEOUT):
+    def __init__(self, access_key, secret_key, associate_tag, timeout=None):
         """
         Initialize the Amazon API Proxy.
 
         :param access_key: The AWS authentication key.
         :param secret_key: The AWS authentication secret.
         :param associate_tag: The AWS associate tag.
-        :param timeout: The timeout (in seconds) for the request.
+        :param timeout: The timeout (in seconds) for the request (the transport's configured timeout if None).
         """
         self.access_key = access_key
         self.secret_key = secret_key
@@ -41,11 +50,38 @@ class AmazonAPI(object):
 
     def _call(self, operation, **kwargs):
         """
-        Send a request for the Amazon Web Service, and parse the result.
+        Send a request for the Amazon Web Service, and parse the response's items while it's read.
+
+        :param operation: The operation to perform.
+        :param kwargs: Every given parameter is sent with the request.
+        :return: A list of the items' lxml elements, and the request's error code and message (or None).
+        """
+        parser = ItemsParser()
+        fetch(self._get_api_string(operation, **kwargs), headers={'Accept-Encoding': 'gzip'},
+              timeout=self.timeout, consumer=parser.feed)
+        return parser.close()
+
+    async def _call_async(self, operation, **kwargs):
+        """
+        The asynchronous version of _call.
+        Send a request for the Amazon Web Service, and parse the response's items while it's read.
+
+        :param operation: The operation to perform.
+        :param kwargs: Every given parameter is sent with the request.
+        :return: A list of the items' lxml elements, and the request's error code and message (or None).
+        """
+        parser = ItemsParser()
+        await fetch_async(self._get_api_string(operation, **kwargs), headers={'Accept-Encoding': 'gzip'},
+                          timeout=self.timeout, consumer=parser.feed)
+        return parser.close()
+
+    def _get_api_string(self, operation, **kwargs):
+        """
+        Creates the signed request URL for the Amazon Web Service.
 
         :param operation: The operation to perform.
         :param kwargs: Every given parameter is sent with the request.
-        :return: The response text.
+        :return: The request's URL.
         """
         kwargs['Timestamp'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
         kwargs['Operation'] = operation
@@ -63,55 +99,111 @@ class AmazonAPI(object):
 
         api_string = 'http://{}/onca/xml?{}&Signature={}'.format(SERVICE_DOMAIN, quoted_strings, signature)
         logger.debug('Connecting to: {}'.format(api_string))
-        api_request = urllib.request.Request(api_string, headers={'Accept-Encoding': 'gzip'})
+        return api_string
 
-        response = urllib.request.urlopen(api_request, timeout=self.timeout)
+    def _query(self, response_group=RESPONSE_GROUP, **kwargs):
+        """
+        Search products in Amazon according to the given keywords.
 
-        if 'gzip' in response.info().get('Content-Encoding'):
-            response_text = gzip.decompress(response.read())
-        else:
-            response_text = response.read()
-        return response_text
+        :param response_group: The amount of information to ask for.
+        :return: A list of the found items' lxml elements.
+        """
+        return self._check_query_response(*self._call('ItemSearch', ResponseGroup=response_group, **kwargs))
 
-    def _query(self, response_group='Large', **kwargs):
+    async def _query_async(self, response_group=RESPONSE_GROUP, **kwargs):
         """
+        The asynchronous version of _query.
         Search products in Amazon according to the given keywords.
 
         :param response_group: The amount of information to ask for.
-        :return: An lxml root element.
+        :return: A list of the found items' lxml elements.
+        """
+        return self._check_query_response(*await self._call_async('ItemSearch', ResponseGroup=response_group,
+                                                                  **kwargs))
+
+    @staticmethod
+    def _check_query_response(items, error):
+        """
+        Checks the parsed response of a search.
+
+        :param items: The found items' lxml elements.
+        :param error: The request's error code and message (or None).
+        :return: A list of the found items' lxml elements.
         """
-        response = self._call('ItemSearch', ResponseGroup=response_group, **kwargs)
-        root = objectify.fromstring(response)
-        if root.Items.Request.IsValid == 'False':
-            code = root.Items.Request.Errors.Error.Code
-            msg = root.Items.Request.Errors.Error.Message
+        if error:
+            code, msg = error
             if code == 'AWS.ParameterOutOfRange':
                 raise NoMorePages(msg)
             else:
                 raise SearchException('Amazon Search Error: "{}", "{}"'.format(code, msg))
-        return root
+        return items
 
-    def get_item(self, item_id, response_group='Large', **kwargs):
+    @staticmethod
+    def _split_item_ids(item_ids):
         """
-        Find a specific Amazon product, according to the given item ID.
+        Splits the item IDs into batches, which are looked up together.
 
-        :param item_id: The item ID to look for.
+        :param item_ids: A list of item IDs, or a comma-separated string of item IDs.
+        :return: Yields comma-separated strings of up to MAX_LOOKUP_ITEMS item IDs.
+        """
+        item_ids = item_ids.split(',') if isinstance(item_ids, str) else list(item_ids)
+        for index in range(0, len(item_ids), MAX_LOOKUP_ITEMS):
+            yield ','.join(item_ids[index:index + MAX_LOOKUP_ITEMS])
+
+    def lookup_items(self, item_ids, response_group=RESPONSE_GROUP, **kwargs):
+        """
+        Find specific Amazon products, according to the given item IDs.
+        Up to MAX_LOOKUP_ITEMS items are looked up in every request.
+
+        :param item_ids: A list of item IDs, or a comma-separated string of item IDs.
+        :param response_group: The amount of information to ask for.
+        :return: A list of :class:`~.AmazonProduct` instances (of the items which were found).
+        """
+        products = []
+        for batch in self._split_item_ids(item_ids):
+            items, error = self._call('ItemLookup', ItemId=batch, ResponseGroup=response_group, **kwargs)
+            if error:
+                raise LookupException('Amazon Product Lookup Error: "{}", "{}"'.format(*error))
+            products.extend(AmazonProduct(item, self) for item in items)
+        return products
+
+    async def lookup_items_async(self, item_ids, response_group=RESPONSE_GROUP, **kwargs):
+        """
+        The asynchronous version of lookup_items.
+        Find specific Amazon products, according to the given item IDs.
+        Up to MAX_LOOKUP_ITEMS items are looked up in every request.
+
+        :param item_ids: A list of item IDs, or a comma-separated string of item IDs.
+        :param response_group: The amount of information to ask for.
+        :return: A list of :class:`~.AmazonProduct` instances (of the items which were found).
+        """
+        products = []
+        for batch in self._split_item_ids(item_ids):
+            items, error = await self._call_async('ItemLookup', ItemId=batch, ResponseGroup=response_group,
+                                                  **kwargs)
+            if error:
+                raise LookupException('Amazon Product Lookup Error: "{}", "{}"'.format(*error))
+            products.extend(AmazonProduct(item, self) for item in items)
+        return products
+
+    def get_item(self, item_id, response_group=RESPONSE_GROUP, **kwargs):
+        """
+        Find specific Amazon products, according to the given item IDs.
+        Up to MAX_LOOKUP_ITEMS items are looked up in every request.
+
+        :param item_id: The item ID to look for, or a list of item IDs (or a comma-separated string of them).
         :param response_group: The amount of information to ask for.
         :return: An instance of :class:`~.AmazonProduct` if one item was returned,
         or a list of  :class:`~.AmazonProduct` instances if multiple items where returned.
         """
-        response = self._call('ItemLookup', ItemId=item_id, ResponseGroup=response_group, **kwargs)
-        root = objectify.fromstring(response)
-        if root.Items.Request.IsValid == 'False':
-            code = root.Items.Request.Errors.Error.Code
-            msg = root.Items.Request.Errors.Error.Message
-            raise LookupException('Amazon Product Lookup Error: "{}", "{}"'.format(code, msg))
-        if not hasattr(root.Items, 'Item'):
-            raise ASINNotFound('ASIN(s) not found: "{}"'.format(etree.tostring(root, pretty_print=True)))
-        if len(root.Items.Item) > 1:
-            return [AmazonProduct(item, self) for item in root.Items.Item]
+        products = self.lookup_items(item_id, response_group, **kwargs)
+        if not products:
+            raise ASINNotFound('ASIN(s) not found: "{}"'.format(
+                item_id if isinstance(item_id, str) else ','.join(item_id)))
+        if len(products) > 1:
+            return products
         else:
-            return AmazonProduct(root.Items.Item, self)
+            return products[0]
 
     def search_items(self, **kwargs):
         """
@@ -131,6 +223,85 @@ class AmazonAPI(object):
         items = AmazonSearch(self, **kwargs)
         return list(islice(items, limit))
 
+    async def search_items_limited_async(self, limit, **kwargs):
+        """
+        The asynchronous version of search_items_limited.
+        Search and return first N results.
+
+        :param limit: The number of results to return.
+        :return: A list of :class:`~.AmazonProduct`.
+        """
+        items = []
+        current_page = 1
+        try:
+            while len(items) < limit:
+                page_items = await self._query_async(ItemPage=current_page, **kwargs)
+                if len(page_items) == 0:
+                    break
+                items.extend(AmazonProduct(item, self) for item in page_items)
+                current_page += 1
+        except NoMorePages:
+            pass
+        return items[:limit]
+
+
+class ItemsParser(object):
+    """
+    Parses the items out of a search or lookup response while it's read, element by element (without building
+    an objectified tree of the whole response). Every parsed element is cleared once it's extracted,
+    so the response's tree doesn't grow while it's parsed.
+    """
+
+    def __init__(self):
+        """
+        Initializes the parser.
+        """
+        self.items = []
+        self.error = None
+        self._parser = etree.XMLPullParser(events=('end',), tag=('{*}Request', '{*}Item'))
+
+    def feed(self, chunk):
+        """
+        Parses the next chunk of the response.
+
+        :param chunk: The response's chunk.
+        :return: True once the response turned out to be an error (so the rest of it isn't needed).
+        """
+        self._parser.feed(chunk)
+        return self._read_events()
+
+    def close(self):
+        """
+        Finishes parsing the response.
+
+        :return: A list of the items' lxml elements, and the request's error code and message (or None).
+        """
+        if self.error is None:
+            self._parser.close()
+            self._read_events()
+        return self.items, self.error
+
+    def _read_events(self):
+        """
+        Extracts the items (and the request's error) out of the elements parsed so far.
+
+        :return: True if the request's error was found, False otherwise.
+        """
+        for _, elem in self._parser.read_events():
+            if etree.QName(elem.getparent()).localname != 'Items':
+                continue
+            if etree.QName(elem).localname == 'Item':
+                self.items.append(copy.deepcopy(elem))
+            elif elem.findtext('{*}IsValid') == 'False':
+                self.error = elem.findtext('{*}Errors/{*}Error/{*}Code'), \
+                    elem.findtext('{*}Errors/{*}Error/{*}Message')
+                return True
+            elem.clear()
+            # Drop the extracted elements which came before it as well.
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+        return False
+
 
 class AmazonSearch(object):
     """
@@ -153,8 +324,8 @@ class AmazonSearch(object):
 
         :return: Yields a :class:`~.AmazonProduct` for each result item.
         """
-        for page in self.iterate_pages():
-            for item in getattr(page.Items, 'Item', []):
+        for page_items in self.iterate_pages():
+            for item in page_items:
                 yield AmazonProduct(item, self.api)
 
     def iterate_pages(self):
@@ -162,7 +333,7 @@ class AmazonSearch(object):
         A generator which iterates over all pages.
         Keep in mind that Amazon limits the number of pages it makes available.
 
-        :return: Yields lxml root elements.
+        :return: Yields lists of the pages' items lxml elements.
         """
         try:
             while True:
@@ -196,6 +367,16 @@ class AmazonProduct(object):
         """
         return etree.tostring(self.item, pretty_print=True)
 
+    @staticmethod
+    def _get_xpath(path):
+        """
+        Converts a dotted element path to a namespace agnostic ElementPath.
+
+        :param path: The element's path.
+        :return: The ElementPath.
+        """
+        return '/'.join('{*}' + element for element in path.split('.'))
+
     def _safe_get_element(self, path, root=None):
         """
         Get a child element of root (multiple levels deep).
@@ -205,13 +386,19 @@ class AmazonProduct(object):
         :param path: The element's path.
         :return: The request element or None.
         """
-        elements = path.split('.')
         parent = root if root is not None else self.item
-        for element in elements[:-1]:
-            parent = getattr(parent, element, None)
-            if parent is None:
-                return None
-        return getattr(parent, elements[-1], None)
+        return parent.find(self._get_xpath(path))
+
+    def _safe_get_elements(self, path, root=None):
+        """
+        Get all the child elements of root in the given path (multiple levels deep).
+
+        :param root: The root element to work with.
+        :param path: The elements' path.
+        :return: A list of the request elements (empty if none exist).
+        """
+        parent = root if root is not None else self.item
+        return parent.findall(self._get_xpath(path))
 
     def _safe_get_element_text(self, path, root=None):
         """
@@ -222,7 +409,7 @@ class AmazonProduct(object):
         :return: The request element as a string or None.
         """
         element = self._safe_get_element(path, root)
-        if element:
+        if element is not None:
             return element.text
         else:
             return None
@@ -238,7 +425,7 @@ class AmazonProduct(object):
         value = self._safe_get_element_text(path=path, root=root)
         if value is not None:
             try:
-                value = time.strptime(value, '%Y-%m-%d').date()
+                value = datetime.datetime.strptime(value, '%Y-%m-%d').date()
             except ValueError:
                 value = None
 
@@ -288,11 +475,7 @@ class AmazonProduct(object):
         """
         The list of authors.
         """
-        result = []
-        authors = self._safe_get_element('ItemAttributes.Author') or []
-        for author in authors:
-            result.append(author.text)
-        return result
+        return [author.text for author in self._safe_get_elements('ItemAttributes.Author')]
 
     @property
     def publisher(self):
@@ -421,10 +604,9 @@ class AmazonProduct(object):
         """
         ean = self._safe_get_element_text('ItemAttributes.EAN')
         if ean is None:
-            ean_list = self._safe_get_element_text('ItemAttributes.EANList')
-            if ean_list:
-                ean = self._safe_get_element_text(
-                    'EANListElement', root=ean_list[0])
+            ean_list = self._safe_get_element('ItemAttributes.EANList')
+            if ean_list is not None:
+                ean = self._safe_get_element_text('EANListElement', root=ean_list)
         return ean
 
     @property
@@ -434,10 +616,9 @@ class AmazonProduct(object):
         """
         upc = self._safe_get_element_text('ItemAttributes.UPC')
         if upc is None:
-            upc_list = self._safe_get_element_text('ItemAttributes.UPCList')
-            if upc_list:
-                upc = self._safe_get_element_text(
-                    'UPCListElement', root=upc_list[0])
+            upc_list = self._safe_get_element('ItemAttributes.UPCList')
+            if upc_list is not None:
+                upc = self._safe_get_element_text('UPCListElement', root=upc_list)
         return upc
 
     @property
@@ -475,6 +656,22 @@ class AmazonProduct(object):
         """
         return self._safe_get_element_text('ItemAttributes.Title')
 
+    @property
+    def detail_page_url(self):
+        """
+        The URL of the product's web page.
+        """
+        return self._safe_get_element_text('DetailPageURL')
+
+    @property
+    def discs(self):
+        """
+        The product's tracks.
+
+        :return: A list of the track names lists of every disc.
+        """
+        return [[track.text for track in disc] for disc in self._safe_get_elements('Tracks.Disc')]
+
     @property
     def editorial_review(self):
         """
@@ -489,11 +686,7 @@ class AmazonProduct(object):
 
         :return: Returns a list of 'ItemAttributes.Feature' elements (strings).
         """
-        result = []
-        features = self._safe_get_element('ItemAttributes.Feature') or []
-        for feature in features:
-            result.append(feature.text)
-        return result
+        return [feature.text for feature in self._safe_get_elements('ItemAttributes.Feature')]
 
     @property
     def list_price(self):
@@ -505,7 +698,7 @@ class AmazonProduct(object):
         price = self._safe_get_element_text('ItemAttributes.ListPrice.Amount')
         currency = self._safe_get_element_text('ItemAttributes.ListPrice.CurrencyCode')
         if price:
-            return price / 100, currency
+            return float(price) / 100, currency
         else:
             return None, None
 
@@ -547,7 +740,7 @@ class AmazonProduct(object):
         """
         The product's parent ASIN, if it has a parent.
         """
-        return self._safe_get_element('ParentASIN')
+        return self._safe_get_element_text('ParentASIN')
 
     def get_parent(self):
         """
@@ -557,7 +750,7 @@ class AmazonProduct(object):
         :return: An instance of :class:`~.AmazonProduct` representing the parent product.
         """
         if not self.parent:
-            parent = self._safe_get_element('ParentASIN')
+            parent = self.parent_asin
             if parent:
-                self.parent = self.api.lookup(item_id=parent)
+                self.parent = self.api.get_item(item_id=parent)
         return self.parent
@@ -1,11 +1,10 @@
 import webbrowser
-import urllib.request
 
 import logbook
 
 from .amazon_api import AmazonAPI
 from .amazon_account import ACCESS_KEY, SECRET_KEY, ASSOCIATE_TAG
-from ..base import Client, ConnectionException
+from ..base import Client
 from mp3organizer.datatypes.album import Album
 from mp3organizer.datatypes.track import Track
 
@@ -19,6 +18,8 @@ class AmazonClient(Client):
 
     SEARCH_INDEX = 'Music'
     VALID_BINDINGS = ['Audio CD', 'Vinyl']
+    # The searches only ask for the items' attributes (enough to pick the candidates, which are looked up later).
+    SEARCH_RESPONSE_GROUP = 'ItemAttributes'
 
     @staticmethod
     def get_name():
@@ -35,65 +36,92 @@ class AmazonClient(Client):
         if self.verbose:
             logger.debug('Connection successful!')
 
-    def find_album(self, album, artist=None, prompt=True, web=True):
+    def _search(self, album, artist=None):
         """
-        Searches Amazon for the artist and returns the album data.
+        Searches Amazon for the album, and looks up the albums found (their tracks and images) in a single request.
 
+        :param album: The album's name.
+        :param artist: The artist's name.
+        :returns: A list of AmazonProduct results.
+        """
+        results = self.api.search_items_limited(limit=Client.MAX_RESULTS,
+                                                response_group=AmazonClient.SEARCH_RESPONSE_GROUP,
+                                                Keywords=self._get_search_string(album, artist),
+                                                SearchIndex=AmazonClient.SEARCH_INDEX)
+        item_ids = self._get_candidates(results)
+        return self.api.lookup_items(item_ids) if item_ids else []
+
+    async def _search_async(self, album, artist=None):
+        """
+        The asynchronous version of _search.
+        Searches Amazon for the album, and looks up the albums found (their tracks and images) in a single request.
+
+        :param album: The album's name.
+        :param artist: The artist's name.
+        :returns: A list of AmazonProduct results.
+        """
+        results = await self.api.search_items_limited_async(limit=Client.MAX_RESULTS,
+                                                            response_group=AmazonClient.SEARCH_RESPONSE_GROUP,
+                                                            Keywords=self._get_search_string(album, artist),
+                                                            SearchIndex=AmazonClient.SEARCH_INDEX)
+        item_ids = self._get_candidates(results)
+        return await self.api.lookup_items_async(item_ids) if item_ids else []
+
+    @staticmethod
+    def _get_candidates(results):
+        """
+        Picks the search results which are albums.
+
+        :param results: A list of AmazonProduct results (with their attributes only).
+        :returns: The albums' item IDs, in the results' order.
+        """
+        return [result.asin for result in results if result.binding in AmazonClient.VALID_BINDINGS and result.asin]
+
+    def _select_result(self, results, album, artist=None, prompt=True, web=True):
+        """
+        Chooses the right Amazon result, and extracts the album data from it.
+
+        :param results: A list of AmazonProduct results.
         :param album: The album's name.
         :param artist: The artist's name.
         :param prompt: Whether or not to prompt the user for approval.
         :param web: Whether or not to open a browser with the album's information.
-        :returns: album or None.
+        :returns: The album data (without artwork) and the artwork's URL, or None.
         """
-        if not self.is_connected():
-            raise ConnectionException('Connection wasn\'t initialized')
-
-        search_string = album
-        if artist:
-            search_string += ' {}'.format(artist)
-        results = self.api.search_items_limited(limit=Client.MAX_RESULTS, Keywords=search_string,
-                                                SearchIndex=AmazonClient.SEARCH_INDEX)
-        if self.verbose:
-            logger.info('Found {} results.'.format(len(results)))
         for result in results:
-            try:
-                # If any of these attributes doesn't exist, an exception will be raised.
-                tracks_list = self._get_tracks_list(result)
-                result_artist = result.item.ItemAttributes.Artist.text.capitalize()
-                result_album = result.title.capitalize()
-                # Check if the result is an album.
-                if result.item.ItemAttributes.Binding not in AmazonClient.VALID_BINDINGS:
-                    continue
-                # Open the item's web page in a new tab, to help the user.
-                if web:
-                    webbrowser.open(result.item.DetailPageURL.text, new=2)
-                # Confirm with the user.
-                if prompt:
-                    user_answer = self._prompt_user(result_album, result_artist)
-                else:
-                    user_answer = 'y'
-                if user_answer == 'y':
-                    if self.verbose:
-                        logger.debug('Getting more info on result: {} by {}'.format(result_album, result_artist))
-                    # Get extra data and return the result.
-                    result_year = self._get_release_year(result.item.ItemAttributes.ReleaseDate.text)
-                    try:
-                        image_data = urllib.request.urlopen(result.item.LargeImage.URL.text).read()
-                        result_artwork = None
-                        if self.artwork_folder:
-                            result_artwork = self._save_image(image_data, album)
-                            if self.verbose:
-                                logger.debug('Artwork found!')
-                    except AttributeError:
-                        logger.debug('Artwork not found!')
-                        result_artwork = None
-                    if self.verbose:
-                        logger.debug('Finished extracting information from the service.')
-                    return Album(album, artist or result_artist, artwork_path=result_artwork,
-                                 year=result_year, tracks_list=tracks_list)
-            except AttributeError as ex:
+            tracks_list = self._get_tracks_list(result)
+            result_artist = result.get_attribute('Artist')
+            result_album = result.title
+            release_date = result.get_attribute('ReleaseDate')
+            if not tracks_list or not result_artist or not result_album or not release_date:
                 # This result wasn't an Audio CD. Move on to the next result.
-                logger.warning('Bad result ({}), moving on to the next one...'.format(ex))
+                logger.warning('Bad result (missing attributes), moving on to the next one...')
+                continue
+            result_artist = result_artist.capitalize()
+            result_album = result_album.capitalize()
+            # Check if the result is an album.
+            if result.binding not in AmazonClient.VALID_BINDINGS:
+                continue
+            # Open the item's web page in a new tab, to help the user.
+            if web and result.detail_page_url:
+                webbrowser.open(result.detail_page_url, new=2)
+            # Confirm with the user.
+            if prompt:
+                user_answer = self._prompt_user(result_album, result_artist)
+            else:
+                user_answer = 'y'
+            if user_answer == 'y':
+                if self.verbose:
+                    logger.debug('Getting more info on result: {} by {}'.format(result_album, result_artist))
+                # Get extra data and return the result.
+                result_year = self._get_release_year(release_date)
+                artwork_url = result.large_image_url
+                if not artwork_url:
+                    logger.debug('Artwork not found!')
+                if self.verbose:
+                    logger.debug('Finished extracting information from the service.')
+                return Album(album, artist or result_artist, year=result_year,
+                             tracks_list=tracks_list), artwork_url
 
         return None
 
@@ -103,6 +131,20 @@ class AmazonClient(Client):
         """
         return 'Amazon service'
 
+    @staticmethod
+    def _get_search_string(album, artist=None):
+        """
+        Creates the search keywords for the album.
+
+        :param album: The album's name.
+        :param artist: The artist's name.
+        :return: The search keywords.
+        """
+        search_string = album
+        if artist:
+            search_string += ' {}'.format(artist)
+        return search_string
+
     @staticmethod
     def _get_release_year(release_date):
         """
@@ -117,17 +159,14 @@ class AmazonClient(Client):
         """
         Retrieves the tracks list from the results object (supports multiple discs).
 
-        :param result: An ordered list of the track names.
+        :param result: The AmazonProduct result.
         :return: An ordered list of Track objects.
         """
         tracks_list = []
-        current_disc = result.item.Tracks.Disc
-        multiple_discs = True if current_disc.getnext() is not None else False
-        disc_num = 1 if multiple_discs else None
-        while current_disc is not None:
-            for track_number, track_name in enumerate(current_disc.getchildren()):
-                tracks_list.append(Track(track_number+1, track_name.text, disc_num))
-            current_disc = current_disc.getnext()
-            if current_disc is not None:
-                disc_num += 1
+        discs = result.discs
+        multiple_discs = len(discs) > 1
+        for disc_index, disc in enumerate(discs):
+            disc_num = disc_index + 1 if multiple_discs else None
+            for track_number, track_name in enumerate(disc):
+                tracks_list.append(Track(track_number+1, track_name, disc_num))
         return tracks_list
@@ -0,0 +1,103 @@
+import hashlib
+import os
+import tempfile
+
+import logbook
+
+logger = logbook.Logger('ArtworkStore')
+
+
+class ArtworkStore(object):
+    """
+    A content-addressed store of the downloaded artworks.
+    Every image is saved once (by its hash), and the URLs it was downloaded from point to it.
+    """
+
+    IMAGES_DIRECTORY = 'images'
+    URLS_DIRECTORY = 'urls'
+    PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+    def __init__(self, path):
+        """
+        Initializes the store (creates its directories if needed).
+
+        :param path: The store's directory.
+        """
+        self.path = path
+        for directory in (ArtworkStore.IMAGES_DIRECTORY, ArtworkStore.URLS_DIRECTORY):
+            if not os.path.exists(os.path.join(path, directory)):
+                os.makedirs(os.path.join(path, directory))
+
+    @staticmethod
+    def _get_hash(data):
+        """
+        Hashes the given data.
+
+        :param data: The data to hash (bytes).
+        :return: The hash's hex string.
+        """
+        return hashlib.sha1(data).hexdigest()
+
+    def _get_url_path(self, url):
+        """
+        Returns the path of the file pointing from the given URL to its image.
+
+        :param url: The image's URL.
+        :return: The URL file's path.
+        """
+        return os.path.join(self.path, ArtworkStore.URLS_DIRECTORY, self._get_hash(url.encode('UTF-8')))
+
+    def get_image_path(self, image_data):
+        """
+        Returns the path of the given image in the store (whether or not it's already there).
+
+        :param image_data: The image's data.
+        :return: The image's path.
+        """
+        extension = '.png' if image_data.startswith(ArtworkStore.PNG_SIGNATURE) else '.jpg'
+        return os.path.join(self.path, ArtworkStore.IMAGES_DIRECTORY, self._get_hash(image_data) + extension)
+
+    def get(self, url):
+        """
+        Looks for the image downloaded from the given URL.
+
+        :param url: The image's URL.
+        :return: The image's data, or None if it wasn't downloaded yet.
+        """
+        try:
+            with open(self._get_url_path(url), 'r') as url_file:
+                image_name = url_file.read().strip()
+            with open(os.path.join(self.path, ArtworkStore.IMAGES_DIRECTORY, image_name), 'rb') as image_file:
+                return image_file.read()
+        except IOError:
+            return None
+
+    def put(self, image_data, url=None):
+        """
+        Saves the image in the store (unless it's already there).
+
+        :param image_data: The image's data.
+        :param url: The URL the image was downloaded from.
+        :return: The image's path.
+        """
+        image_path = self.get_image_path(image_data)
+        if not os.path.exists(image_path):
+            self._write(image_path, image_data)
+        elif logger.level <= logbook.DEBUG:
+            logger.debug('Artwork already exists in the store.')
+        if url:
+            self._write(self._get_url_path(url), os.path.basename(image_path).encode('UTF-8'))
+        return image_path
+
+    @staticmethod
+    def _write(path, data):
+        """
+        Writes the file atomically, so concurrent readers never see partial files.
+
+        :param path: The file's path.
+        :param data: The data to write.
+        """
+        file_descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(file_descriptor, 'wb') as temp_file:
+            temp_file.write(data)
+        os.replace(temp_path, path)
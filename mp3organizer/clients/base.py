@@ -1,6 +1,11 @@
 import os
 
-from mp3organizer.file_utils import normalize_name
+import logbook
+
+from mp3organizer.normalization import normalize_name
+from mp3organizer.http_utils import fetch, fetch_async
+
+logger = logbook.Logger('MP3OrganizerClient')
 
 
 class ConnectionException(Exception):
@@ -17,17 +22,23 @@ class Client(object):
 
     MAX_RESULTS = 1
     ARTWORK_EXTENSION = '.jpg'
+    # Whether or not the service supports batched searches (see prefetch_albums).
+    BATCHED_SEARCHES = False
 
-    def __init__(self, artwork_folder=None, verbose=True):
+    def __init__(self, artwork_folder=None, verbose=True, metadata_cache=None, artwork_store=None):
         """
         Initializes the client.
 
         :param artwork_folder: The folder to save pictures in.
         :param verbose: Whether or not to print output.
+        :param metadata_cache: The albums cache to check before searching the service.
+        :param artwork_store: The artworks store to check before downloading artworks.
         """
         self.api = None
         self.artwork_folder = artwork_folder
         self.verbose = verbose
+        self.metadata_cache = metadata_cache
+        self.artwork_store = artwork_store
         self._connected = False
 
     @staticmethod
@@ -58,6 +69,175 @@ class Client(object):
         :param web: Whether or not to open a browser with the album's information.
         :returns: album or None.
         """
+        if not self.is_connected():
+            raise ConnectionException('Connection wasn\'t initialized')
+        cached_album = self._get_cached_album(album, artist)
+        if cached_album:
+            result, artwork_url, artwork_data = cached_album
+        else:
+            results = self._search(album, artist)
+            if self.verbose:
+                logger.info('Found {} results.'.format(len(results)))
+            selection = self._select_result(results, album, artist, prompt, web)
+            if not selection:
+                return None
+            result, artwork_url = selection
+            artwork_data = None
+        if artwork_url and self.artwork_folder:
+            if artwork_data is None:
+                artwork_data = self._get_stored_artwork(artwork_url)
+            if artwork_data is None:
+                artwork_data = fetch(artwork_url)
+                self._store_artwork(artwork_data, artwork_url)
+                # Cache the album again, along with its artwork.
+                cached_album = None
+            self._add_artwork(result, artwork_data, album)
+        if not cached_album:
+            self._cache_album(album, artist, result, artwork_url, artwork_data)
+        return result
+
+    async def find_album_async(self, album, artist=None, prompt=True, web=True):
+        """
+        The asynchronous version of find_album.
+        Searches service for the artist and returns the album data.
+
+        :param album: The album's name.
+        :param artist: The artist's name.
+        :param prompt: Whether or not to prompt the user for approval.
+        :param web: Whether or not to open a browser with the album's information.
+        :returns: album or None.
+        """
+        if not self.is_connected():
+            raise ConnectionException('Connection wasn\'t initialized')
+        cached_album = self._get_cached_album(album, artist)
+        if cached_album:
+            result, artwork_url, artwork_data = cached_album
+        else:
+            results = await self._search_async(album, artist)
+            if self.verbose:
+                logger.info('Found {} results.'.format(len(results)))
+            selection = self._select_result(results, album, artist, prompt, web)
+            if not selection:
+                return None
+            result, artwork_url = selection
+            artwork_data = None
+        if artwork_url and self.artwork_folder:
+            if artwork_data is None:
+                artwork_data = self._get_stored_artwork(artwork_url)
+            if artwork_data is None:
+                artwork_data = await fetch_async(artwork_url)
+                self._store_artwork(artwork_data, artwork_url)
+                # Cache the album again, along with its artwork.
+                cached_album = None
+            self._add_artwork(result, artwork_data, album)
+        if not cached_album:
+            self._cache_album(album, artist, result, artwork_url, artwork_data)
+        return result
+
+    def prefetch_albums(self, queries):
+        """
+        Searches the service for many albums ahead of time, so the following find_album calls don't wait for it.
+        Does nothing, unless the service supports batched searches.
+
+        :param queries: A list of album and artist names pairs.
+        """
+        pass
+
+    def clear_prefetched_albums(self):
+        """
+        Discards the prefetched search results which weren't used (does nothing, unless the service supports
+        batched searches).
+        """
+        pass
+
+    def _get_cached_album(self, album, artist=None):
+        """
+        Looks for the album in the metadata cache.
+
+        :param album: The album's name.
+        :param artist: The artist's name.
+        :returns: The album data (without artwork), the artwork's URL and the artwork's data, or None.
+        """
+        if not self.metadata_cache:
+            return None
+        cached_album = self.metadata_cache.get(self.get_name(), album, artist)
+        if cached_album and self.verbose:
+            logger.info('Found album in the {} cache.'.format(self.get_name()))
+        return cached_album
+
+    def _cache_album(self, album, artist, result, artwork_url, artwork_data):
+        """
+        Saves the album in the metadata cache.
+
+        :param album: The searched album's name.
+        :param artist: The searched artist's name.
+        :param result: The album data.
+        :param artwork_url: The artwork's URL.
+        :param artwork_data: The artwork's data (None if it wasn't downloaded).
+        """
+        if self.metadata_cache:
+            # The artworks store already keeps the artwork.
+            if self.artwork_store:
+                artwork_data = None
+            self.metadata_cache.set(self.get_name(), album, artist, result, artwork_url, artwork_data)
+
+    def _get_stored_artwork(self, artwork_url):
+        """
+        Looks for the artwork in the artworks store.
+
+        :param artwork_url: The artwork's URL.
+        :return: The artwork's data, or None if it wasn't downloaded yet.
+        """
+        if not self.artwork_store:
+            return None
+        artwork_data = self.artwork_store.get(artwork_url)
+        if artwork_data is not None and self.verbose:
+            logger.debug('Found artwork in the store.')
+        return artwork_data
+
+    def _store_artwork(self, artwork_data, artwork_url):
+        """
+        Saves the downloaded artwork in the artworks store.
+
+        :param artwork_data: The artwork's data.
+        :param artwork_url: The artwork's URL.
+        """
+        if self.artwork_store:
+            self.artwork_store.put(artwork_data, artwork_url)
+
+    def _search(self, album, artist=None):
+        """
+        Searches service for the album.
+
+        :param album: The album's name.
+        :param artist: The artist's name.
+        :returns: The service's results list.
+        """
+        raise NotImplementedError('Client didn\'t implement this method.')
+
+    async def _search_async(self, album, artist=None):
+        """
+        The asynchronous version of _search.
+        Searches service for the album.
+
+        :param album: The album's name.
+        :param artist: The artist's name.
+        :returns: The service's results list.
+        """
+        raise NotImplementedError('Client didn\'t implement this method.')
+
+    def _select_result(self, results, album, artist=None, prompt=True, web=True):
+        """
+        Chooses the right result, and extracts the album data from it.
+
+        :param results: The service's results list.
+        :param album: The album's name.
+        :param artist: The artist's name.
+        :param prompt: Whether or not to prompt the user for approval.
+        :param web: Whether or not to open a browser with the album's information.
+        :returns: The album data (without artwork) and the artwork's URL (None if there's no artwork),
+        or None if no result was chosen.
+        """
         raise NotImplementedError('Client didn\'t implement this method.')
 
     def __repr__(self):
@@ -82,6 +262,18 @@ class Client(object):
             user_answer = input(question)
         return user_answer == 'y'
 
+    def _add_artwork(self, result, image_data, album):
+        """
+        Saves the album's artwork and adds it to the album data.
+
+        :param result: The album data.
+        :param image_data: The image to write.
+        :param album: The album's name.
+        """
+        result.artwork_path = self._save_image(image_data, album)
+        if self.verbose:
+            logger.debug('Artwork found!')
+
     def _save_image(self, image_data, album):
         """
         Saves the album's artwork.
@@ -93,6 +285,18 @@ class Client(object):
         normalized_album = normalize_name(album)
         album = ' '.join(x.capitalize() for x in normalized_album.split(' '))
         image_path = os.path.join(self.artwork_folder, album + Client.ARTWORK_EXTENSION)
+        if self.artwork_store:
+            stored_path = self.artwork_store.put(image_data)
+            if os.path.exists(image_path):
+                if os.path.samefile(stored_path, image_path):
+                    return image_path
+                os.remove(image_path)
+            try:
+                # Link the stored image instead of writing another copy of it.
+                os.link(stored_path, image_path)
+                return image_path
+            except OSError:
+                pass
         image_file = open(image_path, 'wb')
         image_file.write(image_data)
         image_file.close()
@@ -1,7 +1,8 @@
 import xml.etree.ElementTree
-import urllib.request
 import urllib.parse
 
+from mp3organizer.http_utils import fetch, fetch_async
+
 
 class GracenoteAPI(object):
     """
@@ -33,15 +34,35 @@ class GracenoteAPI(object):
     TRACK_MOOD = 'mood'
     TRACK_TEMPO = 'tempo'
 
-    def __init__(self, client_id, user_id):
+    # The maximal number of queries sent in a single request.
+    BATCH_SIZE = 10
+
+    # Fields selection profiles.
+    PROFILE_MINIMAL = 'minimal'
+    PROFILE_FULL = 'full'
+    # The extended data and the details level requested by every profile.
+    # The minimal profile only asks for the cover on top of the basic album data (title, year and tracks).
+    PROFILES = {
+        PROFILE_MINIMAL: ('COVER', None),
+        PROFILE_FULL: ('COVER,REVIEW,ARTIST_BIOGRAPHY,ARTIST_IMAGE,ARTIST_OET,MOOD,TEMPO',
+                       'GENRE:3LEVEL,MOOD:2LEVEL,TEMPO:3LEVEL,ARTIST_ORIGIN:4LEVEL,ARTIST_ERA:2LEVEL,'
+                       'ARTIST_TYPE:2LEVEL')
+    }
+
+    def __init__(self, client_id, user_id, profile=PROFILE_MINIMAL):
         """
         Initialize the Gracenote API Proxy.
 
         :param client_id: The Gracenote authentication key.
         :param user_id: The Gracenote user ID.
+        :param profile: The fields selection profile (only the full profile fetches the artist's OET, genres,
+        moods, tempos and extra URLs).
         """
+        if profile not in GracenoteAPI.PROFILES:
+            raise ValueError('Invalid fields selection profile: {}'.format(profile))
         self.client_id = client_id
         self.user_id = user_id
+        self.profile = profile
 
     @staticmethod
     def get_gracenote_url(client_id):
@@ -60,87 +81,34 @@ class GracenoteAPI(object):
         :param track: The track's name.
         :return: A list of name/value dictionaries with all the information (one for each result).
         """
-        # Create XML request.
-        query = GracenoteQuery()
-        query.add_auth(self.client_id, self.user_id)
-        query.add_query('ALBUM_SEARCH')
-        query.add_query_mode('SINGLE_BEST_COVER')
-        query.add_query_text_field('ARTIST', artist)
-        query.add_query_text_field('ALBUM_TITLE', album)
-        query.add_query_text_field('TRACK_TITLE', track)
-        query.add_query_option('SELECT_EXTENDED', 'COVER,REVIEW,ARTIST_BIOGRAPHY,'
-                               'ARTIST_IMAGE,ARTIST_OET,MOOD,TEMPO')
-        query.add_query_option('SELECT_DETAIL', 'GENRE:3LEVEL,MOOD:2LEVEL,TEMPO:3LEVEL,'
-                               'ARTIST_ORIGIN:4LEVEL,ARTIST_ERA:2LEVEL,ARTIST_TYPE:2LEVEL')
-        query_xml = query.to_string()
-
         # POST query.
-        response = urllib.request.urlopen(GracenoteAPI.get_gracenote_url(self.client_id), query_xml)
-        response_xml = response.read()
-        # Parse response.
-        results = []
-        response_tree = xml.etree.ElementTree.fromstring(response_xml)
-        response_elements = response_tree.findall('RESPONSE')
-        for response_elem in response_elements:
-            if response_elem.attrib['STATUS'] != 'OK':
-                continue
-            current_result = {}
-            # Find Album element.
-            album_elem = response_elem.find('ALBUM')
-            # Parse album metadata.
-            current_result[GracenoteAPI.ALBUM_GNID] = self._get_elem_text(album_elem, 'GN_ID')
-            current_result[GracenoteAPI.ARTIST_NAME] = self._get_elem_text(album_elem, 'ARTIST')
-            current_result[GracenoteAPI.ALBUM_TITLE] = self._get_elem_text(album_elem, 'TITLE')
-            current_result[GracenoteAPI.ALBUM_YEAR] = self._get_elem_text(album_elem, 'DATE')
-            current_result[GracenoteAPI.ALBUM_ART_URL] = self._get_elem_text(album_elem, 'URL', 'TYPE', 'COVERART')
-            current_result[GracenoteAPI.ALBUM_GENRE] = self._get_multi_elem_text(album_elem, 'GENRE', 'ORD', 'ID')
-            current_result[GracenoteAPI.ARTIST_IMAGE_URL] = self._get_elem_text(
-                album_elem, 'URL', 'TYPE', 'ARTIST_IMAGE')
-            current_result[GracenoteAPI.ARTIST_BIO_URL] = self._get_elem_text(
-                album_elem, 'URL', 'TYPE', 'ARTIST_BIOGRAPHY')
-            current_result[GracenoteAPI.ALBUM_REVIEW_URL] = self._get_elem_text(album_elem, 'URL', 'TYPE', 'REVIEW')
-
-            # Look for OET.
-            artist_origin_elem = album_elem.find('ARTIST_ORIGIN')
-            if artist_origin_elem is not None:
-                current_result[GracenoteAPI.ARTIST_ORIGIN] = self._get_multi_elem_text(
-                    album_elem, 'ARTIST_ORIGIN', 'ORD', 'ID')
-                current_result[GracenoteAPI.ARTIST_ERA] = self._get_multi_elem_text(
-                    album_elem, 'ARTIST_ERA', 'ORD', 'ID')
-                current_result[GracenoteAPI.ARTIST_TYPE] = self._get_multi_elem_text(
-                    album_elem, 'ARTIST_TYPE', 'ORD', 'ID')
-            else:
+        response_xml = fetch(GracenoteAPI.get_gracenote_url(self.client_id),
+                             self._create_search_query(artist, album, track))
+        results = self._parse_search_response(response_xml)
+        for result in results:
+            if self._is_missing_oet(result):
                 # Try to get OET again by fetching album by GNID.
-                current_result[GracenoteAPI.ARTIST_ORIGIN], current_result[GracenoteAPI.ARTIST_ERA], \
-                    current_result[GracenoteAPI.ARTIST_TYPE] = self._get_oet(current_result[GracenoteAPI.ALBUM_GNID])
-
-            # Parse tracks metadata.
-            current_result[GracenoteAPI.TRACKS] = []
-            track_elements = album_elem.findall('TRACK')
-            for track_elem in track_elements:
-                track_results = dict()
-                track_results[GracenoteAPI.TRACK_NUMBER] = self._get_elem_text(track_elem, 'TRACK_NUM')
-                track_results[GracenoteAPI.TRACK_GNID] = self._get_elem_text(track_elem, 'GN_ID')
-                track_results[GracenoteAPI.TRACK_TITLE] = self._get_elem_text(track_elem, 'TITLE')
-                track_results[GracenoteAPI.TRACK_ARTIST_NAME] = self._get_elem_text(track_elem, 'ARTIST')
-                track_results[GracenoteAPI.TRACK_MOOD] = self._get_multi_elem_text(track_elem, 'MOOD', 'ORD', 'ID')
-                track_results[GracenoteAPI.TRACK_TEMPO] = self._get_multi_elem_text(track_elem, 'TEMPO', 'ORD', 'ID')
-                # If track-level GOET exists, overwrite metadata from album.
-                if track_elem.find('GENRE') is not None:
-                    track_results[GracenoteAPI.ALBUM_GENRE] = self._get_multi_elem_text(
-                        track_elem, 'GENRE', 'ORD', 'ID')
-                if track_elem.find('ARTIST_ORIGIN') is not None:
-                    track_results[GracenoteAPI.ARTIST_ORIGIN] = self._get_multi_elem_text(
-                        track_elem, 'ARTIST_ORIGIN', 'ORD', 'ID')
-                if track_elem.find('ARTIST_ERA') is not None:
-                    track_results[GracenoteAPI.ARTIST_ERA] = self._get_multi_elem_text(
-                        track_elem, 'ARTIST_ERA', 'ORD', 'ID')
-                if track_elem.find('ARTIST_TYPE') is not None:
-                    track_results[GracenoteAPI.ARTIST_TYPE] = self._get_multi_elem_text(
-                        track_elem, 'ARTIST_TYPE', 'ORD', 'ID')
-                current_result[GracenoteAPI.TRACKS].append(track_results)
-            results.append(current_result)
+                self._add_oet(result, self._get_oet(result[GracenoteAPI.ALBUM_GNID]))
+        return results
 
+    async def search_track_async(self, artist, album, track=''):
+        """
+        The asynchronous version of search_track.
+        Queries the Gracenote service for a specific track.
+
+        :param artist: The artist's name.
+        :param album: The album's name.
+        :param track: The track's name.
+        :return: A list of name/value dictionaries with all the information (one for each result).
+        """
+        # POST query.
+        response_xml = await fetch_async(GracenoteAPI.get_gracenote_url(self.client_id),
+                                         self._create_search_query(artist, album, track))
+        results = self._parse_search_response(response_xml)
+        for result in results:
+            if self._is_missing_oet(result):
+                # Try to get OET again by fetching album by GNID.
+                self._add_oet(result, await self._get_oet_async(result[GracenoteAPI.ALBUM_GNID]))
         return results
 
     def search_album(self, album, artist):
@@ -152,6 +120,180 @@ class GracenoteAPI(object):
         """
         return self.search_track(artist, album)
 
+    async def search_album_async(self, album, artist):
+        """
+        The asynchronous version of search_album.
+        Queries the Gracenote service for a specific album.
+
+        :param album: The album's name.
+        :param artist: The artist's name.
+        """
+        return await self.search_track_async(artist, album)
+
+    def search_albums(self, queries):
+        """
+        Queries the Gracenote service for many albums at once.
+        Up to BATCH_SIZE searches are sent in every request, and the albums fetches of the results without OET
+        (in the full profile) are batched the same way.
+
+        :param queries: A list of album and artist names pairs.
+        :return: A list of results lists (one for each query, in the queries' order).
+        """
+        url = GracenoteAPI.get_gracenote_url(self.client_id)
+        albums_results = []
+        for batch in self._split_batches(queries):
+            # POST query.
+            response_xml = fetch(url, self._create_search_queries([(artist, album, '') for album, artist in batch]))
+            albums_results.extend(self._parse_search_responses(response_xml, len(batch)))
+        missing_oet = [result for results in albums_results for result in results if self._is_missing_oet(result)]
+        for batch in self._split_batches(missing_oet):
+            # Try to get OET again by fetching the albums by GNID.
+            albums_xml = fetch(url, self._create_oet_queries([result[GracenoteAPI.ALBUM_GNID] for result in batch]))
+            for result, oet in zip(batch, self._parse_oet_responses(albums_xml, len(batch))):
+                self._add_oet(result, oet)
+        return albums_results
+
+    def _is_missing_oet(self, result):
+        """
+        Checks if the result should have had the artist's OET (only in the full profile), but doesn't.
+
+        :param result: The result's name/value dictionary.
+        :return: True if the OET should be fetched separately, False otherwise.
+        """
+        return self.profile == GracenoteAPI.PROFILE_FULL and GracenoteAPI.ARTIST_ORIGIN not in result
+
+    @staticmethod
+    def _split_batches(items):
+        """
+        Splits the items into batches which fit in a single request.
+
+        :param items: The items list.
+        :return: Yields lists of up to BATCH_SIZE items.
+        """
+        for index in range(0, len(items), GracenoteAPI.BATCH_SIZE):
+            yield items[index:index + GracenoteAPI.BATCH_SIZE]
+
+    def _create_search_query(self, artist, album, track=''):
+        """
+        Creates the XML request for searching a specific track.
+
+        :param artist: The artist's name.
+        :param album: The album's name.
+        :param track: The track's name.
+        :return: The XML request.
+        """
+        return self._create_search_queries([(artist, album, track)])
+
+    def _create_search_queries(self, searches):
+        """
+        Creates the XML request for searching several tracks at once.
+
+        :param searches: A list of artist, album and track names tuples.
+        :return: The XML request.
+        """
+        select_extended, select_detail = GracenoteAPI.PROFILES[self.profile]
+        query = GracenoteQuery()
+        query.add_auth(self.client_id, self.user_id)
+        for artist, album, track in searches:
+            query.add_query('ALBUM_SEARCH')
+            query.add_query_mode('SINGLE_BEST_COVER')
+            query.add_query_text_field('ARTIST', artist)
+            query.add_query_text_field('ALBUM_TITLE', album)
+            query.add_query_text_field('TRACK_TITLE', track)
+            query.add_query_option('SELECT_EXTENDED', select_extended)
+            if select_detail:
+                query.add_query_option('SELECT_DETAIL', select_detail)
+        return query.to_string()
+
+    def _parse_search_response(self, response_xml):
+        """
+        Parses the response of a search.
+        Results without OET (always, in the minimal profile) are returned without the artist's origin, era and type.
+
+        :param response_xml: The XML response.
+        :return: A list of name/value dictionaries with all the information (one for each result).
+        """
+        return [result for results in self._parse_search_responses(response_xml) for result in results]
+
+    def _parse_search_responses(self, response_xml, queries_count=None):
+        """
+        Parses the response of several searches (the service answers the queries in their order).
+        Results without OET are returned without the artist's origin, era and type.
+
+        :param response_xml: The XML response.
+        :param queries_count: The number of queries in the request (not checked if None).
+        :return: A list of results lists (one for each query).
+        """
+        responses_results = []
+        response_tree = xml.etree.ElementTree.fromstring(response_xml)
+        response_elements = response_tree.findall('RESPONSE')
+        if queries_count is not None and len(response_elements) != queries_count:
+            raise ValueError('Expected {} responses, got {}'.format(queries_count, len(response_elements)))
+        for response_elem in response_elements:
+            if response_elem.attrib['STATUS'] != 'OK':
+                responses_results.append([])
+                continue
+            responses_results.append([self._parse_album(response_elem.find('ALBUM'))])
+        return responses_results
+
+    def _parse_album(self, album_elem):
+        """
+        Parses a single album element.
+
+        :param album_elem: The ALBUM element.
+        :return: A name/value dictionary with all the information.
+        """
+        current_result = {}
+        # Parse album metadata.
+        current_result[GracenoteAPI.ALBUM_GNID] = self._get_elem_text(album_elem, 'GN_ID')
+        current_result[GracenoteAPI.ARTIST_NAME] = self._get_elem_text(album_elem, 'ARTIST')
+        current_result[GracenoteAPI.ALBUM_TITLE] = self._get_elem_text(album_elem, 'TITLE')
+        current_result[GracenoteAPI.ALBUM_YEAR] = self._get_elem_text(album_elem, 'DATE')
+        current_result[GracenoteAPI.ALBUM_ART_URL] = self._get_elem_text(album_elem, 'URL', 'TYPE', 'COVERART')
+        current_result[GracenoteAPI.ALBUM_GENRE] = self._get_multi_elem_text(album_elem, 'GENRE', 'ORD', 'ID')
+        current_result[GracenoteAPI.ARTIST_IMAGE_URL] = self._get_elem_text(
+            album_elem, 'URL', 'TYPE', 'ARTIST_IMAGE')
+        current_result[GracenoteAPI.ARTIST_BIO_URL] = self._get_elem_text(
+            album_elem, 'URL', 'TYPE', 'ARTIST_BIOGRAPHY')
+        current_result[GracenoteAPI.ALBUM_REVIEW_URL] = self._get_elem_text(album_elem, 'URL', 'TYPE', 'REVIEW')
+
+        # Look for OET.
+        artist_origin_elem = album_elem.find('ARTIST_ORIGIN')
+        if artist_origin_elem is not None:
+            current_result[GracenoteAPI.ARTIST_ORIGIN] = self._get_multi_elem_text(
+                album_elem, 'ARTIST_ORIGIN', 'ORD', 'ID')
+            current_result[GracenoteAPI.ARTIST_ERA] = self._get_multi_elem_text(
+                album_elem, 'ARTIST_ERA', 'ORD', 'ID')
+            current_result[GracenoteAPI.ARTIST_TYPE] = self._get_multi_elem_text(
+                album_elem, 'ARTIST_TYPE', 'ORD', 'ID')
+
+        # Parse tracks metadata.
+        current_result[GracenoteAPI.TRACKS] = []
+        track_elements = album_elem.findall('TRACK')
+        for track_elem in track_elements:
+            track_results = dict()
+            track_results[GracenoteAPI.TRACK_NUMBER] = self._get_elem_text(track_elem, 'TRACK_NUM')
+            track_results[GracenoteAPI.TRACK_GNID] = self._get_elem_text(track_elem, 'GN_ID')
+            track_results[GracenoteAPI.TRACK_TITLE] = self._get_elem_text(track_elem, 'TITLE')
+            track_results[GracenoteAPI.TRACK_ARTIST_NAME] = self._get_elem_text(track_elem, 'ARTIST')
+            track_results[GracenoteAPI.TRACK_MOOD] = self._get_multi_elem_text(track_elem, 'MOOD', 'ORD', 'ID')
+            track_results[GracenoteAPI.TRACK_TEMPO] = self._get_multi_elem_text(track_elem, 'TEMPO', 'ORD', 'ID')
+            # If track-level GOET exists, overwrite metadata from album.
+            if track_elem.find('GENRE') is not None:
+                track_results[GracenoteAPI.ALBUM_GENRE] = self._get_multi_elem_text(
+                    track_elem, 'GENRE', 'ORD', 'ID')
+            if track_elem.find('ARTIST_ORIGIN') is not None:
+                track_results[GracenoteAPI.ARTIST_ORIGIN] = self._get_multi_elem_text(
+                    track_elem, 'ARTIST_ORIGIN', 'ORD', 'ID')
+            if track_elem.find('ARTIST_ERA') is not None:
+                track_results[GracenoteAPI.ARTIST_ERA] = self._get_multi_elem_text(
+                    track_elem, 'ARTIST_ERA', 'ORD', 'ID')
+            if track_elem.find('ARTIST_TYPE') is not None:
+                track_results[GracenoteAPI.ARTIST_TYPE] = self._get_multi_elem_text(
+                    track_elem, 'ARTIST_TYPE', 'ORD', 'ID')
+            current_result[GracenoteAPI.TRACKS].append(track_results)
+        return current_result
+
     def _get_oet(self, gnid):
         """
         Helper function to retrieve Origin, Era, and Artist Type by direct album fetch.
@@ -159,31 +301,92 @@ class GracenoteAPI(object):
         :param gnid: The GNID.
         :return: origin, era and artist, or None if an error occurred.
         """
-        # Create XML request.
+        # POST query.
+        album_xml = fetch(GracenoteAPI.get_gracenote_url(self.client_id), self._create_oet_query(gnid))
+        return self._parse_oet_response(album_xml)
+
+    async def _get_oet_async(self, gnid):
+        """
+        The asynchronous version of _get_oet.
+        Helper function to retrieve Origin, Era, and Artist Type by direct album fetch.
+
+        :param gnid: The GNID.
+        :return: origin, era and artist, or None if an error occurred.
+        """
+        # POST query.
+        album_xml = await fetch_async(GracenoteAPI.get_gracenote_url(self.client_id), self._create_oet_query(gnid))
+        return self._parse_oet_response(album_xml)
+
+    def _create_oet_query(self, gnid):
+        """
+        Creates the XML request for fetching the album's Origin, Era, and Artist Type.
+
+        :param gnid: The GNID.
+        :return: The XML request.
+        """
+        return self._create_oet_queries([gnid])
+
+    def _create_oet_queries(self, gnids):
+        """
+        Creates the XML request for fetching the Origin, Era, and Artist Type of several albums at once.
+
+        :param gnids: The albums' GNIDs.
+        :return: The XML request.
+        """
         query = GracenoteQuery()
 
         query.add_auth(self.client_id, self.user_id)
-        query.add_query('ALBUM_FETCH')
-        query.add_query_gnid(gnid)
-        query.add_query_option('SELECT_EXTENDED', 'ARTIST_OET')
-        query.add_query_option(
-            'SELECT_DETAIL', 'ARTIST_ORIGIN:4LEVEL,ARTIST_ERA:2LEVEL,ARTIST_TYPE:2LEVEL')
-        query_xml = query.to_string()
+        for gnid in gnids:
+            query.add_query('ALBUM_FETCH')
+            query.add_query_gnid(gnid)
+            query.add_query_option('SELECT_EXTENDED', 'ARTIST_OET')
+            query.add_query_option(
+                'SELECT_DETAIL', 'ARTIST_ORIGIN:4LEVEL,ARTIST_ERA:2LEVEL,ARTIST_TYPE:2LEVEL')
+        return query.to_string()
+
+    def _parse_oet_response(self, album_xml):
+        """
+        Parses the response of an album fetch.
 
-        # POST query.
-        response = urllib.request.urlopen(GracenoteAPI.get_gracenote_url(self.client_id), query_xml)
-        album_xml = response.read()
+        :param album_xml: The XML response.
+        :return: origin, era and artist, or None if an error occurred.
+        """
+        return self._parse_oet_responses(album_xml)[0]
 
-        # Parse XML
-        response_tree = xml.etree.ElementTree.fromstring(album_xml)
-        response_elem = response_tree.find('RESPONSE')
-        if response_elem.attrib['STATUS'] == 'OK':
-            album_elem = response_elem.find('ALBUM')
-            artist_origin = self._get_multi_elem_text(album_elem, 'ARTIST_ORIGIN', 'ORD', 'ID')
-            artist_era = self._get_multi_elem_text(album_elem, 'ARTIST_ERA', 'ORD', 'ID')
-            artist_type = self._get_multi_elem_text(album_elem, 'ARTIST_TYPE', 'ORD', 'ID')
-            return artist_origin, artist_era, artist_type
-        return None
+    def _parse_oet_responses(self, albums_xml, queries_count=None):
+        """
+        Parses the response of several albums fetches (the service answers the queries in their order).
+
+        :param albums_xml: The XML response.
+        :param queries_count: The number of queries in the request (not checked if None).
+        :return: A list of origin, era and artist tuples (None where an error occurred), one for each query.
+        """
+        oets = []
+        response_tree = xml.etree.ElementTree.fromstring(albums_xml)
+        response_elements = response_tree.findall('RESPONSE')
+        if queries_count is not None and len(response_elements) != queries_count:
+            raise ValueError('Expected {} responses, got {}'.format(queries_count, len(response_elements)))
+        for response_elem in response_elements:
+            if response_elem.attrib['STATUS'] == 'OK':
+                album_elem = response_elem.find('ALBUM')
+                artist_origin = self._get_multi_elem_text(album_elem, 'ARTIST_ORIGIN', 'ORD', 'ID')
+                artist_era = self._get_multi_elem_text(album_elem, 'ARTIST_ERA', 'ORD', 'ID')
+                artist_type = self._get_multi_elem_text(album_elem, 'ARTIST_TYPE', 'ORD', 'ID')
+                oets.append((artist_origin, artist_era, artist_type))
+            else:
+                oets.append(None)
+        return oets
+
+    @staticmethod
+    def _add_oet(result, oet):
+        """
+        Adds the Origin, Era, and Artist Type to the result (empty if they weren't found).
+
+        :param result: The result's name/value dictionary.
+        :param oet: origin, era and artist, or None.
+        """
+        result[GracenoteAPI.ARTIST_ORIGIN], result[GracenoteAPI.ARTIST_ERA], \
+            result[GracenoteAPI.ARTIST_TYPE] = oet or ({}, {}, {})
 
     @staticmethod
     def _get_elem_text(parent_elem, elem_name, elem_attribute_name=None, elem_attribute_value=None):
@@ -237,6 +440,8 @@ class GracenoteQuery:
 
     def __init__(self):
         self.root = xml.etree.ElementTree.Element('QUERIES')
+        # The query the add_query_* functions configure (the last one added).
+        self.query = None
 
     def add_auth(self, client_id, user_id):
         auth = xml.etree.ElementTree.SubElement(self.root, 'AUTH')
@@ -246,36 +451,31 @@ class GracenoteQuery:
         user.text = user_id
 
     def add_query(self, cmd):
-        query = xml.etree.ElementTree.SubElement(self.root, 'QUERY')
-        query.attrib['CMD'] = cmd
+        self.query = xml.etree.ElementTree.SubElement(self.root, 'QUERY')
+        self.query.attrib['CMD'] = cmd
 
     def add_query_mode(self, mode_string):
-        query = self.root.find('QUERY')
-        mode = xml.etree.ElementTree.SubElement(query, 'MODE')
+        mode = xml.etree.ElementTree.SubElement(self.query, 'MODE')
         mode.text = mode_string
 
     def add_query_text_field(self, field_name, value):
-        query = self.root.find('QUERY')
-        text = xml.etree.ElementTree.SubElement(query, 'TEXT')
+        text = xml.etree.ElementTree.SubElement(self.query, 'TEXT')
         text.attrib['TYPE'] = field_name
         text.text = value
 
     def add_query_option(self, parameter_name, value):
-        query = self.root.find('QUERY')
-        option = xml.etree.ElementTree.SubElement(query, 'OPTION')
+        option = xml.etree.ElementTree.SubElement(self.query, 'OPTION')
         parameter = xml.etree.ElementTree.SubElement(option, 'PARAMETER')
         parameter.text = parameter_name
         value_elem = xml.etree.ElementTree.SubElement(option, 'VALUE')
         value_elem.text = value
 
     def add_query_gnid(self, gnid):
-        query = self.root.find('QUERY')
-        gnid_elem = xml.etree.ElementTree.SubElement(query, 'GN_ID')
+        gnid_elem = xml.etree.ElementTree.SubElement(self.query, 'GN_ID')
         gnid_elem.text = gnid
 
     def add_query_client(self, client_id):
-        query = self.root.find('QUERY')
-        client = xml.etree.ElementTree.SubElement(query, 'CLIENT')
+        client = xml.etree.ElementTree.SubElement(self.query, 'CLIENT')
         client.text = client_id
 
     def to_string(self):
@@ -309,8 +509,7 @@ class UserIDGenerator(object):
         query_xml = query.to_string()
 
         # POST query
-        response = urllib.request.urlopen(GracenoteAPI.get_gracenote_url(self.client_id), query_xml)
-        response_xml = response.read()
+        response_xml = fetch(GracenoteAPI.get_gracenote_url(self.client_id), query_xml)
 
         # Parse response
         user_id = None
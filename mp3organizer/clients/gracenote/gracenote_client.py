@@ -1,5 +1,3 @@
-import urllib.request
-
 import logbook
 
 from .gracenote_api import GracenoteAPI
@@ -16,6 +14,21 @@ class GracenoteClient(Client):
     Supplies simple functions for finding an album in Gracenote.
     """
 
+    BATCHED_SEARCHES = True
+
+    def __init__(self, artwork_folder=None, verbose=True, metadata_cache=None, artwork_store=None):
+        """
+        Initializes the client.
+
+        :param artwork_folder: The folder to save pictures in.
+        :param verbose: Whether or not to print output.
+        :param metadata_cache: The albums cache to check before searching the service.
+        :param artwork_store: The artworks store to check before downloading artworks.
+        """
+        super().__init__(artwork_folder, verbose, metadata_cache, artwork_store)
+        # The results of the prefetched searches, by their album and artist names.
+        self._prefetched_results = {}
+
     @staticmethod
     def get_name():
         return 'Gracenote'
@@ -41,14 +54,85 @@ class GracenoteClient(Client):
         :param web: Whether or not to open a browser with the album's information.
         :returns: album or None.
         """
+        return super().find_album(album, artist, prompt, web)
+
+    async def find_album_async(self, album, artist=None, prompt=True, web=False):
+        """
+        The asynchronous version of find_album.
+        Searches Gracenote for the artist and returns the album data.
+
+        :param album: The album's name.
+        :param artist: The artist's name.
+        :param prompt: Whether or not to prompt the user for approval.
+        :param web: Whether or not to open a browser with the album's information.
+        :returns: album or None.
+        """
+        return await super().find_album_async(album, artist, prompt, web)
+
+    def prefetch_albums(self, queries):
+        """
+        Searches Gracenote for many albums in a few batched requests, so the following find_album calls
+        don't wait for the service. Albums which are already cached aren't searched.
+
+        :param queries: A list of album and artist names pairs.
+        """
         if not self.is_connected():
             raise ConnectionException('Connection wasn\'t initialized')
+        queries = [(album, artist) for album, artist in queries if (album, artist) not in self._prefetched_results and
+                   not (self.metadata_cache and self.metadata_cache.get(self.get_name(), album, artist))]
+        if not queries:
+            return
+        if self.verbose:
+            logger.debug('Prefetching {} albums...'.format(len(queries)))
+        for query, results in zip(queries, self.api.search_albums(queries)):
+            self._prefetched_results[query] = results
+
+    def clear_prefetched_albums(self):
+        """
+        Discards the prefetched search results which weren't used (like albums another client found).
+        """
+        self._prefetched_results.clear()
+
+    def _search(self, album, artist=None):
+        """
+        Searches Gracenote for the album (unless it was prefetched).
+
+        :param album: The album's name.
+        :param artist: The artist's name.
+        :returns: A list of name/value dictionaries (one for each result).
+        """
+        results = self._prefetched_results.pop((album, artist), None)
+        if results is not None:
+            return results
+        return self.api.search_album(album, artist)
+
+    async def _search_async(self, album, artist=None):
+        """
+        The asynchronous version of _search.
+        Searches Gracenote for the album.
+
+        :param album: The album's name.
+        :param artist: The artist's name.
+        :returns: A list of name/value dictionaries (one for each result).
+        """
+        results = self._prefetched_results.pop((album, artist), None)
+        if results is not None:
+            return results
+        return await self.api.search_album_async(album, artist)
+
+    def _select_result(self, results, album, artist=None, prompt=True, web=False):
+        """
+        Chooses the right Gracenote result, and extracts the album data from it.
+
+        :param results: A list of name/value dictionaries (one for each result).
+        :param album: The album's name.
+        :param artist: The artist's name.
+        :param prompt: Whether or not to prompt the user for approval.
+        :param web: Whether or not to open a browser with the album's information.
+        :returns: The album data (without artwork) and the artwork's URL, or None.
+        """
         if web:
             logger.debug('Web not supported in Gracenote.')
-
-        results = self.api.search_album(album, artist)
-        if self.verbose:
-            logger.info('Found {} results.'.format(len(results)))
         for result in results:
             try:
                 # If any of these attributes doesn't exist, an exception will be raised.
@@ -65,16 +149,11 @@ class GracenoteClient(Client):
                         logger.debug('Getting more info on result: {} by {}'.format(result_album, result_artist))
                     # Get extra data and return the result.
                     result_year = result[GracenoteAPI.ALBUM_YEAR]
-                    image_data = urllib.request.urlopen(result[GracenoteAPI.ALBUM_ART_URL]).read()
-                    result_artwork = None
-                    if self.artwork_folder:
-                        result_artwork = self._save_image(image_data, album)
-                        if self.verbose:
-                            logger.debug('Artwork found!')
+                    artwork_url = result[GracenoteAPI.ALBUM_ART_URL]
                     if self.verbose:
                         logger.debug('Finished extracting information from the service.')
-                    return Album(album, artist or result_artist, artwork_path=result_artwork,
-                                 year=result_year, tracks_list=tracks_list)
+                    return Album(album, artist or result_artist, year=result_year,
+                                 tracks_list=tracks_list), artwork_url
             except KeyError:
                 # This result didn't not contain all the necessary information.
                 logger.warning('Bad result, moving on to the next one...')
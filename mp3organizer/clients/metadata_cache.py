@@ -0,0 +1,111 @@
+import pickle
+import sqlite3
+import threading
+import time
+
+import logbook
+
+from mp3organizer.normalization import normalize_key
+
+logger = logbook.Logger('MetadataCache')
+
+
+class MetadataCache(object):
+    """
+    A persistent cache of the albums found by the clients, keyed by the client and the normalized album query.
+    Keeps every album for a limited time, and evicts the least recently used albums once the cache grows too big.
+    """
+
+    # The time (in seconds) to keep albums for.
+    DEFAULT_TTL = 30 * 24 * 60 * 60
+    # The maximal number of albums to keep.
+    DEFAULT_MAX_ENTRIES = 50000
+
+    def __init__(self, path, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Opens the cache database (creates it if needed).
+
+        :param path: The cache database's path.
+        :param ttl: The time (in seconds) to keep albums for.
+        :param max_entries: The maximal number of albums to keep.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute('CREATE TABLE IF NOT EXISTS albums (key TEXT PRIMARY KEY, data BLOB, '
+                                 'created REAL, accessed REAL)')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS albums_accessed ON albums (accessed)')
+        self._connection.commit()
+
+    @staticmethod
+    def _get_key(client_name, album, artist):
+        """
+        Creates the cache key of the given query.
+
+        :param client_name: The client's name.
+        :param album: The album's name.
+        :param artist: The artist's name.
+        :return: The cache key.
+        """
+        return '{}|{}|{}'.format(client_name, normalize_key(artist or ''), normalize_key(album))
+
+    def get(self, client_name, album, artist=None):
+        """
+        Looks for the album in the cache.
+
+        :param client_name: The client's name.
+        :param album: The album's name.
+        :param artist: The artist's name.
+        :return: The album data (without artwork), the artwork's URL and the artwork's data, or None if not found.
+        """
+        key = self._get_key(client_name, album, artist)
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute('SELECT data, created FROM albums WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._connection.execute('DELETE FROM albums WHERE key = ?', (key,))
+                self._connection.commit()
+                return None
+            self._connection.execute('UPDATE albums SET accessed = ? WHERE key = ?', (now, key))
+            self._connection.commit()
+        return pickle.loads(row[0])
+
+    def set(self, client_name, album, artist, result, artwork_url=None, artwork_data=None):
+        """
+        Saves the album in the cache.
+
+        :param client_name: The client's name.
+        :param album: The searched album's name.
+        :param artist: The searched artist's name.
+        :param result: The album data (its artwork path is not saved).
+        :param artwork_url: The artwork's URL.
+        :param artwork_data: The artwork's data.
+        """
+        key = self._get_key(client_name, album, artist)
+        artwork_path = result.artwork_path
+        result.artwork_path = None
+        try:
+            data = pickle.dumps((result, artwork_url, artwork_data))
+        finally:
+            result.artwork_path = artwork_path
+        now = time.time()
+        with self._lock:
+            self._connection.execute('INSERT OR REPLACE INTO albums VALUES (?, ?, ?, ?)', (key, data, now, now))
+            entries = self._connection.execute('SELECT COUNT(*) FROM albums').fetchone()[0]
+            if entries > self.max_entries:
+                self._connection.execute('DELETE FROM albums WHERE key IN '
+                                         '(SELECT key FROM albums ORDER BY accessed LIMIT ?)',
+                                         (entries - self.max_entries,))
+                logger.debug('Evicted {} albums from the cache.'.format(entries - self.max_entries))
+            self._connection.commit()
+
+    def close(self):
+        """
+        Closes the cache database.
+        """
+        with self._lock:
+            self._connection.close()
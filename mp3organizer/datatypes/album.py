@@ -2,11 +2,11 @@ class Album(object):
     """
     A POPO class to hold all the album data.
     Contains the following information:
-    Name, Artist, Genre, Year and Artwork (as path).
+    Name, Artist, Genre, Year, Artwork (as path) and Source (the client which found it).
     """
 
     def __init__(self, name, artist, genre=None, year=None,
-                 artwork_path=None, tracks_list=None):
+                 artwork_path=None, tracks_list=None, source=None):
         """
         Initializes the album data object.
 
@@ -16,6 +16,7 @@ class Album(object):
         :param year: The album's release year.
         :param artwork_path: The artwork's file path.
         :param tracks_list: The tracks_list.
+        :param source: The name of the client which found the album.
         """
         self.name = ' '.join(x.capitalize() for x in name.strip().split(' '))
         self.artist = ' '.join(x.capitalize() for x in artist.strip().split(' '))
@@ -23,6 +24,7 @@ class Album(object):
         self.year = year
         self.artwork_path = artwork_path
         self.tracks_list = tracks_list
+        self.source = source
 
     def __eq__(self, other):
         """
@@ -2,10 +2,10 @@ class Track(object):
     """
     A POPO class to hold all the track data.
     Contains the following information:
-    Number, Title and Disc Number.
+    Number, Title, Disc Number and Duration.
     """
 
-    def __init__(self, number, title, disc_num=None):
+    def __init__(self, number, title, disc_num=None, duration=None):
         """
         Initializes the track data object.
         Normalizes the number by adding a zero if needed.
@@ -14,11 +14,13 @@ class Track(object):
         :param number: The track's number.
         :param title: The track's title.
         :param disc_num: The Disc number (if there are multiple discs in the album).
+        :param duration: The track's length in seconds (if the client knows it).
         """
         self.number = str(number) if len(str(number)) > 1 else '0' + str(number)
         self.title = ' '.join(x.capitalize() for x in title.replace('\\', ' - ').replace('/', ' - ').replace('?', '').
                               strip().split(' '))
         self.disc_num = disc_num
+        self.duration = duration
 
     def __eq__(self, other):
         """
@@ -1,11 +1,14 @@
-import glob
+import hashlib
 import os.path
-import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 
 import logbook
 from mutagen.id3 import ID3, TRCK, TIT2, TPE1, TPE2, TALB, TCON, TDRC, APIC, USLT, ID3NoHeaderError
 
-from .file_utils import normalize_name, get_mime_type
+from .file_utils import get_mime_type, DirectoryIndex
+from .track_matcher import match_tracks, FUZZY_THRESHOLD
 
 logger = logbook.Logger('MP3OrganizerEditor')
 
@@ -15,22 +18,30 @@ class EditResults(object):
     A simple object representing the editing process result of a file.
     """
 
-    def __init__(self, track, success=False, lyrics=False, rename=False):
+    def __init__(self, track, success=False, lyrics=False, rename=False, rewritten_bytes=0, skipped=False,
+                 filename=None, lyrics_source=None):
         self.track = track
         self.success = success
         self.lyrics = lyrics
         self.rename = rename
+        self.rewritten_bytes = rewritten_bytes
+        self.skipped = skipped
+        self.filename = filename
+        self.lyrics_source = lyrics_source
 
     def __repr__(self):
         string = '{}: Editing '.format(self.track)
         if not self.success:
             string += 'failed'
+        elif self.skipped:
+            string += 'skipped (already up to date)'
         else:
             string += 'succeeded'
             if self.lyrics:
                 string += ' with lyrics'
             if self.rename:
                 string += '. File was renamed'
+            string += ' ({} bytes written)'.format(self.rewritten_bytes)
         return string
 
 
@@ -40,83 +51,267 @@ class FilesEditor(object):
     """
 
     FILES_EXTENSION = '.mp3'
+    # The number of tracks to look for lyrics for at the same time.
+    LYRICS_THREADS = 8
+    # The lyrics lookup strategies.
+    SEQUENTIAL_STRATEGY = 'sequential'
+    RACE_STRATEGY = 'race'
+    LYRICS_STRATEGIES = [SEQUENTIAL_STRATEGY, RACE_STRATEGY]
+    # The grabbers' orders (as given, or by their statistics).
+    FIXED_ORDER = 'fixed'
+    ADAPTIVE_ORDER = 'adaptive'
+    LYRICS_ORDERS = [FIXED_ORDER, ADAPTIVE_ORDER]
+    # The time (in seconds) higher priority grabbers get to finish, once a grabber found lyrics in a race.
+    RACE_GRACE_PERIOD = 0.5
+    # The frames removed from every tag (either replaced or unnecessary).
+    REMOVED_FRAMES = ['APIC', 'USLT', 'COMM', 'TCOM', 'TIT1', 'TPOS', 'TCMP']
+    # The padding (in bytes) reserved whenever a tag outgrows its file's tag space.
+    TAG_PADDING = 16 * 1024
+    # The source of lyrics found in the lyrics cache.
+    CACHE_LYRICS_SOURCE = 'Cache'
 
     def __init__(self, path, album, grabbers_list=None, prompt=True,
-                 web=True, verbose=True):
+                 web=True, verbose=True, lyrics_threads=LYRICS_THREADS,
+                 lyrics_strategy=SEQUENTIAL_STRATEGY, lyrics_cache=None, incremental=False,
+                 fuzzy_threshold=FUZZY_THRESHOLD, grabber_stats=None, lyrics_order=FIXED_ORDER):
         """
         Initializes the editor with the files' path.
 
         :param path: The MP3 files' path.
         :param album: The album's data.
-        :param grabbers_list: The list of lyrics grabbers to use.
+        :param grabbers_list: The list of lyrics grabbers (classes or shared instances) to use.
         :param prompt: Whether or not to prompt the user for approval.
         :param web: Whether or not to open a browser with the lyrics' information.
         :param verbose: Whether or not to print output.
+        :param lyrics_threads: The number of tracks to look for lyrics for at the same time.
+        :param lyrics_strategy: Whether to try the grabbers one after another ('sequential'),
+        or all at once ('race').
+        :param lyrics_cache: The lyrics cache to check before using the grabbers.
+        :param incremental: Whether or not to skip the tracks whose files are already up to date.
+        :param fuzzy_threshold: The minimal similarity (between 0 and 1) of tracks' titles to files' names
+        for fuzzy matches (None disables them).
+        :param grabber_stats: The grabbers' statistics to update (and to order the grabbers by).
+        :param lyrics_order: Whether to try the grabbers in the given order ('fixed'),
+        or by their expected hits per second for the album's artist ('adaptive', requires the grabbers' statistics).
         """
         self.path = path
         self.album = album
-        self.grabbers_list = grabbers_list
+        self.grabbers_list = [grabber(verbose=verbose) if isinstance(grabber, type) else grabber
+                              for grabber in grabbers_list or []]
         self.prompt = prompt
         self.web = web
         self.verbose = verbose
+        self.lyrics_threads = lyrics_threads
+        self.lyrics_strategy = lyrics_strategy
+        self.lyrics_cache = lyrics_cache
+        self.incremental = incremental
+        self.fuzzy_threshold = fuzzy_threshold
+        self.grabber_stats = grabber_stats
+        self.lyrics_order = lyrics_order
+        # Lyrics found ahead of editing, and where they were found (a grabber's name or 'Cache'), by track title.
+        self._prefetched_lyrics = {}
+        self._lyrics_sources = {}
+        # The titles of the tracks whose lyrics lookups failed (which aren't cached as not found).
+        self._failed_lyrics = set()
+        # The results of all the edited tracks.
+        self.results = []
+        # The album directory's files index (built on first use).
+        self._index = None
+        # The files matched to the tracks being edited (by the tracks' identities), and the files left unmatched.
+        self._matches = {}
+        self.unmatched_files = []
+        # The artwork frame shared by all the tracks (read once, on first use).
+        self._artwork_frame = None
+        self._artwork_hash = None
+        self._artwork_read = False
+        # Whether or not the tracks' files are already up to date (by the tracks' identities).
+        self._up_to_date = {}
+
+    @property
+    def index(self):
+        """
+        :return: The album directory's files index.
+        """
+        if self._index is None:
+            self._index = DirectoryIndex(self.path, FilesEditor.FILES_EXTENSION)
+        return self._index
 
     def _find_track(self, track):
         """
-        Finds the given track by name.
-        When searching by name, always returns the shortest result.
+        Finds the given track's file, matched by match_files (or on its own, if the track wasn't matched earlier).
 
         :param track: The track to find.
         :return: The track's file name, or None if not found.
         """
-        # Get all file names and normalize them.
-        files = glob.glob(os.path.join(self.path, '*' + FilesEditor.FILES_EXTENSION))
-        # Try and find the track's name.
-        optional_files = []
-        for filename in files:
-            if len(re.findall(r'\b' + normalize_name(track.title) + r'\b',
-                              normalize_name(os.path.splitext(os.path.basename(filename))[0]))) > 0:
-                optional_files.append(filename)
-        if len(optional_files) > 0:
+        if id(track) in self._matches:
+            filename = self._matches[id(track)]
+        else:
+            # The track is edited on its own.
+            filename = match_tracks([track], self.index, self.fuzzy_threshold).get(0)
+        if filename:
             if self.verbose:
                 logger.debug('Found track by its name.')
-            optional_files.sort(key=len)
-            return optional_files[0]
+            return filename
         # No file was found.
         if self.verbose:
             logger.warning('Track not found.')
         return None
 
+    def _get_artwork_frame(self):
+        """
+        Reads the album's artwork once, and creates the artwork frame all the tracks share.
+
+        :return: The artwork frame, or None if the album has no (supported) artwork.
+        """
+        if not self._artwork_read:
+            self._artwork_read = True
+            if self.album.artwork_path:
+                mime_type = get_mime_type(self.album.artwork_path)
+                if mime_type:
+                    with open(self.album.artwork_path, 'rb') as artwork_file:
+                        self._artwork_frame = APIC(encoding=3, mime=mime_type, type=3, desc='Cover',
+                                                   data=artwork_file.read())
+                    self._artwork_hash = hashlib.sha1(self._artwork_frame.data).digest()
+                elif self.verbose:
+                    logger.warning('Artwork file type not supported.')
+        return self._artwork_frame
+
     def _get_lyrics(self, track):
         """
         Uses the grabbers list to find lyrics for the given track.
+        The grabbers are either tried one after another, or raced against each other (by the lyrics strategy).
 
         :param track: The track to find lyrics to.
         :return: The track's lyrics, or None if not found.
         """
-        for grabber_class in self.grabbers_list:
-            grabber = grabber_class(verbose=self.verbose)
-            if self.verbose:
-                logger.info('Checking {} for lyrics.'.format(grabber))
-            try:
-                result = grabber.find_lyrics(track.title, artist=self.album.artist,
-                                             album=self.album.name)
-                if result:
-                    if self.verbose:
-                        logger.debug('Lyrics found!')
-                    return result
-            except Exception as ex:
+        if track.title in self._prefetched_lyrics:
+            return self._prefetched_lyrics[track.title]
+        if self.lyrics_cache:
+            found, result = self.lyrics_cache.get(track.title, self.album.artist)
+            if found:
                 if self.verbose:
-                    logger.debug(ex)
-                    logger.warning('Error occurred when using {}.'.format(grabber))
+                    logger.debug('Lyrics {}found in cache.'.format('' if result else 'were not '))
+                self._lyrics_sources[track.title] = FilesEditor.CACHE_LYRICS_SOURCE
+                return result
+        # Grabbers which already failed to find the artist are skipped.
+        grabbers_list = [grabber for grabber in self.grabbers_list if not grabber.is_artist_missing(self.album.artist)]
+        if self.lyrics_order == FilesEditor.ADAPTIVE_ORDER and self.grabber_stats:
+            grabbers_list = self.grabber_stats.sort(grabbers_list, self.album.artist)
+        if self.lyrics_strategy == FilesEditor.RACE_STRATEGY:
+            result = self._race_lyrics(track, grabbers_list)
+        else:
+            result = self._sequential_lyrics(track, grabbers_list)
+        # Lyrics are only cached as not found if none of the grabbers failed.
+        if self.lyrics_cache and (result or track.title not in self._failed_lyrics):
+            self.lyrics_cache.set(track.title, self.album.artist, result)
+        return result
+
+    def _sequential_lyrics(self, track, grabbers_list):
+        """
+        Tries the grabbers one after another, and returns the lyrics of the first grabber which found them.
+
+        :param track: The track to find lyrics to.
+        :param grabbers_list: The ordered grabbers to use.
+        :return: The track's lyrics, or None if not found.
+        """
+        for grabber in grabbers_list:
+            result = self._grab_lyrics(grabber, track)
+            if result:
+                self._lyrics_sources[track.title] = grabber.get_name()
+                return result
             if self.verbose:
                 logger.debug('Lyrics not found using {}. Proceeding to next grabber.'.format(grabber))
 
+    def _race_lyrics(self, track, grabbers_list):
+        """
+        Queries all the grabbers at once, and returns the lyrics of the grabber with the highest priority.
+        Once a grabber finds the lyrics, higher priority grabbers get a short grace period to finish as well,
+        and the results of the rest are ignored (they aren't recorded either, as the race may be long over).
+
+        :param track: The track to find lyrics to.
+        :param grabbers_list: The grabbers to use, ordered by their priority.
+        :return: The track's lyrics, or None if not found.
+        """
+        if not grabbers_list:
+            return None
+        executor = ThreadPoolExecutor(max_workers=len(grabbers_list))
+        # Set once the race is over, so the grabbers which are still running don't touch the shared resources.
+        race_over = threading.Event()
+        try:
+            futures = [executor.submit(self._grab_lyrics, grabber, track, race_over) for grabber in grabbers_list]
+            for future in as_completed(futures):
+                if future.result():
+                    break
+            else:
+                return None
+            # Give the higher priority grabbers a chance to finish as well.
+            wait(futures[:futures.index(future)], timeout=FilesEditor.RACE_GRACE_PERIOD)
+            for grabber, future in zip(grabbers_list, futures):
+                if future.done() and future.result():
+                    self._lyrics_sources[track.title] = grabber.get_name()
+                    return future.result()
+        finally:
+            race_over.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _grab_lyrics(self, grabber, track, race_over=None):
+        """
+        Uses a single grabber to find lyrics for the given track (and records the lookup in the grabbers' statistics).
+
+        :param grabber: The lyrics grabber to use.
+        :param track: The track to find lyrics to.
+        :param race_over: Set once the lookup's result is no longer needed (then it isn't recorded).
+        :return: The track's lyrics, or None if not found.
+        """
+        if self.verbose:
+            logger.info('Checking {} for lyrics.'.format(grabber))
+        result = None
+        failed = False
+        start_time = time.perf_counter()
+        try:
+            result = grabber.find_lyrics(track.title, artist=self.album.artist,
+                                         album=self.album.name)
+            if result:
+                if self.verbose:
+                    logger.debug('Lyrics found!')
+        except Exception as ex:
+            failed = True
+            if self.verbose:
+                logger.debug(ex)
+                logger.warning('Error occurred when using {}.'.format(grabber))
+        if race_over is not None and race_over.is_set():
+            # The shared resources might already be closed.
+            return None
+        if failed:
+            self._failed_lyrics.add(track.title)
+        if self.grabber_stats:
+            self.grabber_stats.record(grabber.get_name(), self.album.artist, bool(result),
+                                      time.perf_counter() - start_time)
+        return result or None
+
+    def prefetch_lyrics(self, tracks_list):
+        """
+        Looks for the lyrics of all the given tracks at once, using a bounded threads pool.
+        The results are used later on when editing the tracks.
+
+        :param tracks_list: The tracks to find lyrics to.
+        """
+        tracks_list = [track for track in tracks_list if track.title not in self._prefetched_lyrics]
+        if not tracks_list or not self.grabbers_list:
+            return
+        if self.verbose:
+            logger.debug('Looking for lyrics of {} tracks.'.format(len(tracks_list)))
+        with ThreadPoolExecutor(max_workers=self.lyrics_threads) as executor:
+            for track, lyrics in zip(tracks_list, executor.map(self._get_lyrics, tracks_list)):
+                self._prefetched_lyrics[track.title] = lyrics
+
     def edit_track(self, track, rename=True, lyrics=True):
         """
         Edits a single track, according to the given track info.
         Changes the file's name, and the following ID3 tag fields:
         Title, Track Number, Artist, Album Artist, Album, Genre, Year and Artwork.
         Also empties the following fields: Grouping, Composer and Comments.
+        All the frames are created before the file is touched, and the tag is written once (see _save_tag).
 
         :param track: The track's data object.
         :param rename: Whether to rename the file or not.
@@ -129,58 +324,160 @@ class FilesEditor(object):
         filename = self._find_track(track)
         if not filename:
             return results
+        tag = None
+        up_to_date = self._up_to_date.get(id(track))
+        if self.incremental and up_to_date is None:
+            tag = self._read_tag(filename)
+            up_to_date = self._is_up_to_date(track, filename, tag, rename, lyrics)
+        results.filename = filename
+        if up_to_date:
+            if self.verbose:
+                logger.debug('File "{}" is already up to date.'.format(filename))
+            results.success = True
+            results.skipped = True
+            return results
+        frames = self._create_frames(track)
+        # Add lyrics.
+        if lyrics:
+            result_lyrics = self._get_lyrics(track)
+            if result_lyrics:
+                frames.append(USLT(encoding=3, lang='eng', desc='Lyrics', text=result_lyrics))
+                results.lyrics = True
+                results.lyrics_source = self._lyrics_sources.get(track.title)
+            elif self.verbose:
+                logger.info('Couldn\'t find lyrics.')
+
+        # Edit ID3 information.
+        if tag is None:
+            tag = self._read_tag(filename)
+        # Remove replaced and unnecessary information.
+        for frame_id in FilesEditor.REMOVED_FRAMES:
+            tag.delall(frame_id)
+        for frame in frames:
+            tag.add(frame)
+        results.rewritten_bytes = self._save_tag(tag, filename)
         if rename:
             new_name = os.path.join(os.path.dirname(filename),
                                     str(track)) + FilesEditor.FILES_EXTENSION
             if new_name != filename:
                 os.rename(filename, new_name)
+                self.index.rename(filename, new_name)
                 results.rename = True
+                results.filename = new_name
                 if self.verbose:
                     logger.debug('File "{}" was renamed to "{}".'.format(filename, new_name))
-        else:
-            new_name = filename
+        results.success = True
+        return results
 
-        # Edit ID3 information.
+    @staticmethod
+    def _read_tag(filename):
+        """
+        Reads the file's ID3 tag.
+
+        :param filename: The file's name.
+        :return: The file's tag (an empty one, if the file has no tag).
+        """
         try:
-            tag = ID3(new_name)
+            return ID3(filename)
         except ID3NoHeaderError:
-            tag = ID3()
-        tag.add(TRCK(encoding=3, text=track.number))
-        tag.add(TIT2(encoding=3, text=track.title))
-        tag.add(TPE1(encoding=3, text=self.album.artist))
-        tag.add(TPE2(encoding=3, text=self.album.artist))
+            return ID3()
+
+    def _is_up_to_date(self, track, filename, tag, rename=True, lyrics=True):
+        """
+        Checks if the file already holds the track's information, so editing it would change nothing.
+        Compares the file's name, text frames, artwork (by its hash) and lyrics (by their presence).
+
+        :param track: The track's data object.
+        :param filename: The track's file name.
+        :param tag: The file's current tag.
+        :param rename: Whether the file should be renamed or not.
+        :param lyrics: Whether the file should have lyrics or not.
+        :return: True if the file is up to date, False otherwise.
+        """
+        if rename and os.path.basename(filename) != str(track) + FilesEditor.FILES_EXTENSION:
+            return False
+        for frame in self._create_frames(track):
+            if frame.FrameID == 'APIC':
+                continue
+            existing_frames = tag.getall(frame.FrameID)
+            if len(existing_frames) != 1 or [str(text) for text in existing_frames[0].text] != \
+                    [str(text) for text in frame.text]:
+                return False
+        artwork_hashes = [hashlib.sha1(frame.data).digest() for frame in tag.getall('APIC')]
+        if artwork_hashes != ([self._artwork_hash] if self._get_artwork_frame() else []):
+            return False
+        return not lyrics or len(tag.getall('USLT')) > 0
+
+    def _create_frames(self, track):
+        """
+        Creates the track's ID3 frames (except for the lyrics).
+
+        :param track: The track's data object.
+        :return: The list of frames.
+        """
         album_suffix = ' CD {}'.format(track.disc_num) if track.disc_num else ''
-        tag.add(TALB(encoding=3, text=self.album.name + album_suffix))
-        tag.add(TCON(encoding=3, text=self.album.genre))
-        tag.add(TDRC(encoding=3, text=str(self.album.year)))
-        # Edit the artwork.
-        tag.delall('APIC')
-        if self.album.artwork_path:
-            mime_type = get_mime_type(self.album.artwork_path)
-            if mime_type:
-                artwork_file = open(self.album.artwork_path, 'rb')
-                tag.add(APIC(encoding=3, mime=mime_type, type=3, desc='Cover', data=artwork_file.read()))
-                artwork_file.close()
-            elif self.verbose:
-                logger.warning('Artwork file type not supported.')
-        # Add lyrics.
-        tag.delall('USLT')
-        if lyrics:
-            result_lyrics = self._get_lyrics(track)
-            if result_lyrics:
-                tag.add(USLT(encoding=3, lang='eng', desc='Lyrics', text=result_lyrics))
-                results.lyrics = True
-            elif self.verbose:
-                logger.info('Couldn\'t find lyrics.')
-        # Remove unnecessary information.
-        tag.delall('COMM')
-        tag.delall('TCOM')
-        tag.delall('TIT1')
-        tag.delall('TPOS')
-        tag.delall('TCMP')
-        tag.save(new_name)
-        results.success = True
-        return results
+        frames = [TRCK(encoding=3, text=track.number),
+                  TIT2(encoding=3, text=track.title),
+                  TPE1(encoding=3, text=self.album.artist),
+                  TPE2(encoding=3, text=self.album.artist),
+                  TALB(encoding=3, text=self.album.name + album_suffix),
+                  TCON(encoding=3, text=self.album.genre),
+                  TDRC(encoding=3, text=str(self.album.year))]
+        # Add the artwork.
+        artwork_frame = self._get_artwork_frame()
+        if artwork_frame:
+            frames.append(artwork_frame)
+        return frames
+
+    @staticmethod
+    def _save_tag(tag, filename):
+        """
+        Saves the tag in the file.
+        As long as the new tag fits in the old one (including its padding), only the tag is rewritten.
+        Otherwise, the whole file is rewritten once, and padding is reserved so the next edits fit.
+
+        :param tag: The tag to save.
+        :param filename: The file's name.
+        :return: The number of bytes written to the file.
+        """
+        old_size = tag.size
+        rewritten_bytes = []
+
+        def get_padding(info):
+            # Never shrink the existing padding, as it means moving the audio data.
+            padding = info.padding if info.padding >= 0 else FilesEditor.TAG_PADDING
+            new_size = old_size - info.padding + padding
+            # The size includes the old tag as well.
+            rewritten_bytes.append(new_size if new_size == old_size else new_size + info.size - old_size)
+            return padding
+
+        tag.save(filename, padding=get_padding)
+        return rewritten_bytes[0]
+
+    def match_files(self, tracks_list):
+        """
+        Matches all the tracks to the files at once, and finds out which files are left unmatched.
+
+        :param tracks_list: The tracks to match.
+        """
+        matches = match_tracks(tracks_list, self.index, self.fuzzy_threshold)
+        self._matches = {id(tracks_list[position]): filename for position, filename in matches.items()}
+        matched_files = set(matches.values())
+        self.unmatched_files = sorted(filename for filename in self.index.files if filename not in matched_files)
+
+    def check_files(self, tracks_list):
+        """
+        Checks which of the matched files are already up to date (reading only their tags).
+
+        :param tracks_list: The matched tracks.
+        """
+        for track in tracks_list:
+            filename = self._matches.get(id(track))
+            if filename:
+                self._up_to_date[id(track)] = self._is_up_to_date(track, filename, self._read_tag(filename))
+        if self.verbose:
+            logger.info('{} of {} tracks are already up to date.'.format(sum(self._up_to_date.values()),
+                                                                        len(tracks_list)))
 
     def edit_tracks(self, tracks_list=None):
         """
@@ -193,8 +490,15 @@ class FilesEditor(object):
         success_list = []
         if not tracks_list:
             tracks_list = self.album.tracks_list
+        self.match_files(tracks_list)
+        if self.incremental:
+            self.check_files(tracks_list)
+        # Only the matched tracks which aren't up to date need lyrics.
+        self.prefetch_lyrics([track for track in tracks_list
+                              if id(track) in self._matches and not self._up_to_date.get(id(track))])
         for track in tracks_list:
             results = self.edit_track(track)
+            self.results.append(results)
             if not results.success:
                 failed_list.append(results)
                 if self.verbose:
@@ -1,6 +1,14 @@
+import hashlib
 import os
 import re
 
+import mutagen
+
+from .normalization import get_name_tokens, get_name_trigrams
+
+# The track number at the beginning of a file's name (ignored by fuzzy matching, as titles don't have it).
+TRACK_NUMBER_RE = re.compile(r'^\W*\d+\b')
+
 
 class PathException(Exception):
     """
@@ -24,18 +32,6 @@ def get_mime_type(filename):
     return None
 
 
-def normalize_name(filename):
-    """
-    normalizes the file name by stripping spaces, converting to lower case,
-    and removing non-letter characters (which don't work well with the '\b' option in re).
-
-    :param filename: The file's name.
-    :return: The normalized filename.
-    """
-    simple_string = re.sub('[^0-9a-zA-Z]', ' ', filename).lower()
-    return ' '.join(filter(lambda x: len(x) > 0, simple_string.split(' ')))
-
-
 def get_album(path, album_argument=None):
     """
     Figure out the album's name from the path, or use the given argument.
@@ -70,3 +66,257 @@ def get_artist(path, artist_argument=None):
     if artist == '':
         raise PathException('Path does not include artist name')
     return artist
+
+
+def find_album_paths(library_path, extension='.mp3'):
+    """
+    Walks the library and finds all the album directories in it.
+    An album directory is any directory in the format '...\\<Artist>\\<Album>' which holds files
+    with the given extension.
+
+    :param library_path: The library's root path.
+    :param extension: The extension of the tracks' files.
+    :return: A sorted list of the album directories' paths.
+    """
+    album_paths = []
+    for dir_path, _, file_names in os.walk(library_path):
+        # Albums are always nested inside an artist directory.
+        if len(os.path.relpath(dir_path, library_path).split(os.path.sep)) < 2:
+            continue
+        if any(os.path.splitext(file_name)[1].lower() == extension for file_name in file_names):
+            album_paths.append(dir_path)
+    album_paths.sort()
+    return album_paths
+
+
+def scan_library(library_path, extension='.mp3'):
+    """
+    Scans the library (with a single os.scandir pass) and finds all the album directories and files in it.
+    An album directory is any directory in the format '...\\<Artist>\\<Album>' which holds files
+    with the given extension.
+
+    :param library_path: The library's root path.
+    :param extension: The extension of the tracks' files.
+    :return: A dictionary of the album directories' paths, and the size and modification time (in nanoseconds)
+    of every file in them, by the files' paths.
+    """
+    albums = {}
+    directories = [(library_path, 0)]
+    while directories:
+        directory, depth = directories.pop()
+        files = {}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    directories.append((entry.path, depth + 1))
+                elif depth >= 2 and os.path.splitext(entry.name)[1].lower() == extension:
+                    stat = entry.stat()
+                    files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        if files:
+            albums[directory] = files
+    return albums
+
+
+def scan_directory(path, extension='.mp3'):
+    """
+    Scans a single directory (not recursively) for files with the given extension.
+
+    :param path: The directory's path.
+    :param extension: The extension of the files.
+    :return: The size and modification time (in nanoseconds) of every file, by the files' paths
+    (empty if the directory doesn't exist).
+    """
+    files = {}
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if os.path.splitext(entry.name)[1].lower() == extension and entry.is_file():
+                    stat = entry.stat()
+                    files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+    except FileNotFoundError:
+        pass
+    return files
+
+
+def get_tag_digest(filename):
+    """
+    Hashes the file's raw ID3v2 tag (without parsing it).
+
+    :param filename: The file's name.
+    :return: The tag's hash hex string, or None if the file has no tag.
+    """
+    with open(filename, 'rb') as mp3_file:
+        header = mp3_file.read(10)
+        if len(header) < 10 or not header.startswith(b'ID3'):
+            return None
+        # The tag's size is a 'synchsafe' integer (7 bits in every byte).
+        size = 0
+        for byte in header[6:10]:
+            size = (size << 7) | (byte & 0x7f)
+        return hashlib.sha1(header + mp3_file.read(size)).hexdigest()
+
+
+class DirectoryIndex(object):
+    """
+    An index of the files in a single directory, built with a single listing of the directory.
+    Keeps every file's normalized name tokens, and an inverted index of the tokens to the files holding them.
+    """
+
+    def __init__(self, path, extension='.mp3'):
+        """
+        Lists the directory and indexes its files.
+
+        :param path: The directory's path.
+        :param extension: The extension of the files to index.
+        """
+        self.path = path
+        self.extension = extension
+        # The normalized name tokens, by file path.
+        self._files = {}
+        # The file paths, by normalized name token.
+        self._tokens = {}
+        # The names' trigrams (without the track numbers) by file path, and the file paths by trigram.
+        self._trigrams = {}
+        self._trigram_files = {}
+        # The files' lengths in seconds (read on first use), by file path.
+        self._durations = {}
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if not entry.name.startswith('.') and os.path.splitext(entry.name)[1].lower() == extension:
+                    self.add(entry.path)
+
+    @property
+    def files(self):
+        """
+        :return: The indexed file paths.
+        """
+        return list(self._files)
+
+    def add(self, file_path):
+        """
+        Adds the file to the index.
+
+        :param file_path: The file's path.
+        """
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        tokens = get_name_tokens(name)
+        self._files[file_path] = tokens
+        for token in tokens:
+            self._tokens.setdefault(token, set()).add(file_path)
+        trigrams = get_name_trigrams(TRACK_NUMBER_RE.sub('', name) or name)
+        self._trigrams[file_path] = trigrams
+        for trigram in trigrams:
+            self._trigram_files.setdefault(trigram, set()).add(file_path)
+
+    def remove(self, file_path):
+        """
+        Removes the file from the index.
+
+        :param file_path: The file's path.
+        """
+        for token in self._files.pop(file_path, ()):
+            self._tokens[token].discard(file_path)
+            if not self._tokens[token]:
+                del self._tokens[token]
+        for trigram in self._trigrams.pop(file_path, ()):
+            self._trigram_files[trigram].discard(file_path)
+            if not self._trigram_files[trigram]:
+                del self._trigram_files[trigram]
+        self._durations.pop(file_path, None)
+
+    def rename(self, old_path, new_path):
+        """
+        Updates the index after the file was renamed.
+
+        :param old_path: The file's old path.
+        :param new_path: The file's new path.
+        """
+        duration = self._durations.get(old_path)
+        self.remove(old_path)
+        self.add(new_path)
+        if duration is not None:
+            self._durations[new_path] = duration
+
+    def get_tokens(self, file_path):
+        """
+        :param file_path: The file's path.
+        :return: The file's normalized name tokens.
+        """
+        return self._files[file_path]
+
+    def get_duration(self, file_path):
+        """
+        Reads the file's length with mutagen (once, on first use).
+
+        :param file_path: The file's path.
+        :return: The file's length in seconds, or None if it can't be read.
+        """
+        if file_path not in self._durations:
+            try:
+                audio = mutagen.File(file_path)
+                self._durations[file_path] = audio.info.length if audio is not None else None
+            except (mutagen.MutagenError, OSError):
+                self._durations[file_path] = None
+        return self._durations[file_path]
+
+    def get_files(self, token):
+        """
+        :param token: A normalized name token.
+        :return: The paths of the files holding the token.
+        """
+        return self._tokens.get(token, set())
+
+    def contains(self, file_path, tokens):
+        """
+        Checks if the file's normalized name contains the given tokens, one after another.
+
+        :param file_path: The file's path.
+        :param tokens: The normalized name tokens.
+        :return: True if the tokens were found, False otherwise.
+        """
+        file_tokens = self._files[file_path]
+        return any(file_tokens[index:index + len(tokens)] == tokens
+                   for index in range(len(file_tokens) - len(tokens) + 1))
+
+    def find(self, name):
+        """
+        Finds the files whose normalized names contain the given normalized name as whole words.
+
+        :param name: The name to look for.
+        :return: The matching file paths, shortest first.
+        """
+        tokens = get_name_tokens(name)
+        if tokens == ('',):
+            # An empty name matches every file with a non-empty name.
+            candidates = [file_path for file_path, file_tokens in self._files.items() if file_tokens != ('',)]
+            tokens = ()
+        else:
+            # Only the files holding the rarest token might hold all of them.
+            candidates = min((self._tokens.get(token, set()) for token in tokens), key=len)
+        matches = [file_path for file_path in candidates if self.contains(file_path, tokens)]
+        # Ties are broken by the path itself, so results don't depend on the listing order.
+        matches.sort(key=lambda file_path: (len(file_path), file_path))
+        return matches
+
+    def find_similar(self, name, threshold):
+        """
+        Finds the files whose names are similar to the given name, by their shared character trigrams
+        (the Dice coefficient). Tolerates typos, and ignores track numbers, bracketed notes and featured artists.
+
+        :param name: The name to look for.
+        :param threshold: The minimal similarity (between 0 and 1) of a matching file.
+        :return: The similarities of the matching files, by their paths.
+        """
+        trigrams = get_name_trigrams(name)
+        if not trigrams:
+            return {}
+        shared_counts = {}
+        for trigram in trigrams:
+            for file_path in self._trigram_files.get(trigram, ()):
+                shared_counts[file_path] = shared_counts.get(file_path, 0) + 1
+        similarities = {}
+        for file_path, shared_count in shared_counts.items():
+            similarity = 2 * shared_count / (len(trigrams) + len(self._trigrams[file_path]))
+            if similarity >= threshold:
+                similarities[file_path] = similarity
+        return similarities
@@ -1,3 +1,7 @@
+from mp3organizer.editor import FilesEditor
+from mp3organizer.track_matcher import FUZZY_THRESHOLD
+
+
 class Arguments(object):
     """
     A dummy arguments class to run the organizer with.
@@ -25,3 +29,12 @@ class Arguments(object):
         self.verbose = True
         self.prompt = False
         self.web = True
+        self.lyrics_threads = FilesEditor.LYRICS_THREADS
+        self.lyrics_strategy = FilesEditor.SEQUENTIAL_STRATEGY
+        self.lyrics_order = FilesEditor.FIXED_ORDER
+        self.cache_directory = None
+        self.incremental = False
+        self.fuzzy_threshold = FUZZY_THRESHOLD
+        self.pool_size = None
+        self.timeout = None
+        self.workers = 1
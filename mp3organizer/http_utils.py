@@ -0,0 +1,632 @@
+import asyncio
+import gzip
+import http.client
+import os
+import random
+import ssl
+import threading
+import time
+import urllib.error
+import urllib.parse
+import weakref
+import zlib
+
+DEFAULT_TIMEOUT = 20
+# The maximal number of idle connections kept open to every host.
+DEFAULT_POOL_SIZE = 4
+MAX_REDIRECTS = 5
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+USER_AGENT = 'Python-urllib/3'
+# The default number of requests per second sent to every host (and the number of requests sent in a burst).
+DEFAULT_RATE = 5.0
+DEFAULT_BURST = 5
+# The responses of hosts which are overloaded (or limit the clients' requests rate).
+RETRY_CODES = (429, 503)
+MAX_RETRIES = 4
+# The time (in seconds) to wait before the first retry (doubled on every retry).
+BACKOFF_BASE = 1.0
+MAX_BACKOFF = 60.0
+# The size of the chunks streamed bodies are read in.
+STREAM_CHUNK_SIZE = 16 * 1024
+
+_ssl_context = None
+_timeout = DEFAULT_TIMEOUT
+_pool_size = DEFAULT_POOL_SIZE
+# The connection pools, by scheme, host and port.
+_pools = {}
+_pools_lock = threading.Lock()
+# The idle asynchronous connections of every event loop, by scheme, host and port.
+_async_connections = weakref.WeakKeyDictionary()
+# The requests rate of the hosts which don't use the default rate, by host.
+_host_rates = {}
+# The share of the requests rates this process may use (when several processes send requests).
+_rate_share = 1.0
+# The rate limiters, by host.
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+class RateLimiter(object):
+    """
+    A token bucket limiting the requests rate to a single host.
+    The rate is halved whenever the host says it's overloaded, and slowly restored after successful requests.
+    """
+
+    def __init__(self, rate, burst=DEFAULT_BURST):
+        """
+        Initializes the rate limiter with a full bucket.
+
+        :param rate: The maximal number of requests per second.
+        :param burst: The maximal number of requests sent at once.
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Takes a token for the next request.
+
+        :return: The time (in seconds) to wait before sending the request.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._tokens + (now - self._last_time) * self.rate, self.burst)
+            self._last_time = now
+            self._tokens -= 1
+            return max(-self._tokens / self.rate, 0)
+
+    def slow_down(self):
+        """
+        Halves the rate (down to a request every 10 seconds), after the host said it's overloaded.
+        """
+        with self._lock:
+            self.rate = max(self.rate / 2, min(self.max_rate, 0.1))
+
+    def speed_up(self):
+        """
+        Restores a tenth of the maximal rate, after a successful request.
+        """
+        with self._lock:
+            self.rate = min(self.rate + self.max_rate / 10, self.max_rate)
+
+
+class ConnectionPool(object):
+    """
+    Keeps the idle persistent connections to a single host, so requests don't open new connections.
+    """
+
+    def __init__(self, scheme, host, port, max_size):
+        """
+        Initializes the pool (connections are only opened when needed).
+
+        :param scheme: The URL scheme ('http' or 'https').
+        :param host: The host's name.
+        :param port: The host's port.
+        :param max_size: The maximal number of idle connections to keep.
+        """
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.max_size = max_size
+        self._idle_connections = []
+        self._lock = threading.Lock()
+
+    def get(self, timeout):
+        """
+        Takes an idle connection from the pool, or opens a new one.
+
+        :param timeout: The timeout (in seconds) for the connection's operations.
+        :return: The connection, and whether or not it was used before.
+        """
+        with self._lock:
+            connection = self._idle_connections.pop() if self._idle_connections else None
+        if connection is None:
+            if self.scheme == 'https':
+                connection = http.client.HTTPSConnection(self.host, self.port, timeout=timeout,
+                                                         context=_get_ssl_context())
+            else:
+                connection = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+            return connection, False
+        connection.timeout = timeout
+        if connection.sock:
+            connection.sock.settimeout(timeout)
+        return connection, True
+
+    def put(self, connection):
+        """
+        Returns the connection to the pool (or closes it, if the pool is full).
+
+        :param connection: The connection.
+        """
+        with self._lock:
+            if len(self._idle_connections) < self.max_size:
+                self._idle_connections.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        """
+        Closes all the idle connections.
+        """
+        with self._lock:
+            connections, self._idle_connections = self._idle_connections, []
+        for connection in connections:
+            connection.close()
+
+
+def configure(pool_size=None, timeout=None, rate_share=None):
+    """
+    Changes the connections settings of all the following requests.
+
+    :param pool_size: The maximal number of idle connections kept open to every host.
+    :param timeout: The default timeout (in seconds) for requests.
+    :param rate_share: The share of the hosts' requests rates this process may use
+    (for example, a half when two processes send requests at the same time).
+    """
+    global _pool_size, _timeout, _rate_share
+    if pool_size is not None:
+        _pool_size = pool_size
+        with _pools_lock:
+            for pool in _pools.values():
+                pool.max_size = pool_size
+    if timeout is not None:
+        _timeout = timeout
+    if rate_share is not None:
+        _rate_share = rate_share
+        with _rate_limiters_lock:
+            _rate_limiters.clear()
+
+
+def set_host_rate(host, rate):
+    """
+    Limits the requests rate to the given host.
+
+    :param host: The host's name.
+    :param rate: The maximal number of requests per second.
+    """
+    _host_rates[host] = rate
+    with _rate_limiters_lock:
+        _rate_limiters.pop(host, None)
+
+
+def _get_rate_limiter(url):
+    """
+    Returns the rate limiter of the URL's host.
+
+    :param url: The URL.
+    :return: The rate limiter.
+    """
+    host = urllib.parse.urlsplit(url).hostname
+    with _rate_limiters_lock:
+        if host not in _rate_limiters:
+            _rate_limiters[host] = RateLimiter(_host_rates.get(host, DEFAULT_RATE) * _rate_share)
+        return _rate_limiters[host]
+
+
+def _get_retry_delay(response_headers, retry):
+    """
+    Calculates the time to wait before retrying a request the host refused.
+    Uses the host's Retry-After header if given, and an exponential backoff (with some jitter) otherwise.
+
+    :param response_headers: A dictionary of the (lower case) response headers.
+    :param retry: The number of the retry (starting from 0).
+    :return: The time (in seconds) to wait.
+    """
+    retry_after = response_headers.get('retry-after', '')
+    if retry_after.isdigit():
+        return min(float(retry_after), MAX_BACKOFF)
+    return min(BACKOFF_BASE * 2 ** retry, MAX_BACKOFF) * random.uniform(0.5, 1.0)
+
+
+def close_connections():
+    """
+    Closes all the idle connections.
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
+
+
+def fetch(url, data=None, headers=None, timeout=None, consumer=None):
+    """
+    Sends a request to the given URL (over a pooled persistent connection), and returns the response's body.
+    A POST request is sent if data is given, and a GET request otherwise.
+    Requests are sent within the host's rate limit, and retried (with exponential backoff) while the host
+    says it's overloaded.
+    If a consumer is given, the successful response's body is passed to it in chunks while it's read (instead of
+    being returned), and the rest of the body isn't read once the consumer returns True.
+
+    :param url: The URL to fetch.
+    :param data: The request's body.
+    :param headers: A dictionary of extra request headers.
+    :param timeout: The timeout (in seconds) for the request (the configured timeout if None).
+    :param consumer: A function receiving the (decompressed) body's chunks, and returning True when it needs
+    no more of them.
+    :return: The response's (decompressed) body (None if a consumer is given).
+    :raises: urllib.error.HTTPError for error responses, and IOError if the URL is unreachable.
+    """
+    timeout = timeout or _timeout
+    for _ in range(MAX_REDIRECTS + 1):
+        rate_limiter = _get_rate_limiter(url)
+        for retry in range(MAX_RETRIES + 1):
+            time.sleep(rate_limiter.reserve())
+            status, reason, response_headers, body = _request(url, data, headers, timeout, consumer)
+            if status not in RETRY_CODES:
+                rate_limiter.speed_up()
+                break
+            rate_limiter.slow_down()
+            if retry < MAX_RETRIES:
+                time.sleep(_get_retry_delay(response_headers, retry))
+        if status in REDIRECT_CODES and 'location' in response_headers:
+            url = urllib.parse.urljoin(url, response_headers['location'])
+            # Just like urllib, turn the redirected POST requests into GET requests.
+            if status in (301, 302, 303):
+                data = None
+            continue
+        if status >= 400:
+            raise urllib.error.HTTPError(url, status, reason, response_headers, None)
+        if consumer:
+            return None
+        return _decode_body(body, response_headers.get('content-encoding'))
+    raise urllib.error.URLError('Too many redirections: {}'.format(url))
+
+
+def _request(url, data, headers, timeout, consumer=None):
+    """
+    Sends a single request over a pooled connection.
+    A request which failed over a reused connection (which the server might have closed) before the response
+    arrived is sent again over a new connection.
+
+    :param url: The URL to fetch.
+    :param data: The request's body.
+    :param headers: A dictionary of extra request headers.
+    :param timeout: The timeout (in seconds) for the request.
+    :param consumer: A function receiving the successful response's (decompressed) body in chunks.
+    :return: The status code, the reason, a dictionary of the (lower case) response headers and the raw body
+    (None if it was passed to the consumer).
+    """
+    url_parts = urllib.parse.urlsplit(url)
+    pool = _get_pool(url_parts)
+    path = url_parts.path or '/'
+    if url_parts.query:
+        path += '?' + url_parts.query
+    request_headers = {'User-Agent': USER_AGENT}
+    if data is not None:
+        request_headers['Content-Type'] = 'application/x-www-form-urlencoded'
+    request_headers.update(headers or {})
+    while True:
+        connection, reused = pool.get(timeout)
+        response = None
+        try:
+            connection.request('GET' if data is None else 'POST', path, body=data, headers=request_headers)
+            response = connection.getresponse()
+            if consumer and 200 <= response.status < 300:
+                body = None
+                complete = _stream_body(response.read, consumer, response.getheader('content-encoding'))
+            else:
+                body = response.read()
+                complete = True
+        except (http.client.HTTPException, OSError) as ex:
+            connection.close()
+            if reused and response is None and not isinstance(ex, TimeoutError):
+                continue
+            if isinstance(ex, http.client.HTTPException):
+                raise urllib.error.URLError(ex)
+            raise
+        if response.will_close or not complete:
+            # The rest of a body which wasn't read would be taken for the next response.
+            connection.close()
+        else:
+            pool.put(connection)
+        return response.status, response.reason, {name.lower(): value for name, value in response.getheaders()}, \
+            body
+
+
+def _stream_body(read, consumer, content_encoding):
+    """
+    Passes the response's (decompressed) body to the consumer in chunks, until it's read or the consumer is done.
+
+    :param read: A function reading up to the given number of the body's bytes.
+    :param consumer: A function receiving the body's chunks, and returning True when it needs no more of them.
+    :param content_encoding: The response's Content-Encoding header.
+    :return: True if the whole body was read, False if the consumer stopped reading it.
+    """
+    decompressor = _get_decompressor(content_encoding)
+    while True:
+        chunk = read(STREAM_CHUNK_SIZE)
+        if not chunk:
+            return True
+        if decompressor:
+            chunk = decompressor.decompress(chunk)
+        if consumer(chunk):
+            return False
+
+
+def _get_decompressor(content_encoding):
+    """
+    Creates an incremental decompressor for the response's body, if needed.
+
+    :param content_encoding: The response's Content-Encoding header.
+    :return: The decompressor, or None if the body isn't compressed.
+    """
+    if content_encoding and 'gzip' in content_encoding.lower():
+        return zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    return None
+
+
+def _get_pool(url_parts):
+    """
+    Returns the connection pool of the URL's host.
+
+    :param url_parts: The split URL.
+    :return: The connection pool.
+    """
+    is_https = url_parts.scheme == 'https'
+    key = (url_parts.scheme, url_parts.hostname, url_parts.port or (443 if is_https else 80))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(key[0], key[1], key[2], _pool_size)
+        return _pools[key]
+
+
+def _reset_pools():
+    """
+    Forgets the connections and rate limiters inherited from the parent process (they belong to the parent).
+    """
+    global _pools_lock, _rate_limiters_lock
+    _pools.clear()
+    _pools_lock = threading.Lock()
+    _rate_limiters.clear()
+    _rate_limiters_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_pools)
+
+
+async def fetch_async(url, data=None, headers=None, timeout=None, consumer=None):
+    """
+    The asynchronous version of fetch.
+    Sends a request to the given URL (over a pooled persistent connection), and returns the response's body.
+    A POST request is sent if data is given, and a GET request otherwise.
+    Requests are sent within the host's rate limit, and retried (with exponential backoff) while the host
+    says it's overloaded.
+    If a consumer is given, the successful response's body is passed to it in chunks while it's read (instead of
+    being returned), and the rest of the body isn't read once the consumer returns True.
+
+    :param url: The URL to fetch.
+    :param data: The request's body.
+    :param headers: A dictionary of extra request headers.
+    :param timeout: The timeout (in seconds) for the whole request, including redirects
+    (the configured timeout if None).
+    :param consumer: A function receiving the (decompressed) body's chunks, and returning True when it needs
+    no more of them.
+    :return: The response's (decompressed) body (None if a consumer is given).
+    :raises: urllib.error.HTTPError for error responses, and IOError if the URL is unreachable.
+    """
+    return await asyncio.wait_for(_fetch_async(url, data, headers, consumer), timeout or _timeout)
+
+
+async def _fetch_async(url, data, headers, consumer=None):
+    """
+    Sends the request and follows redirections.
+
+    :param url: The URL to fetch.
+    :param data: The request's body.
+    :param headers: A dictionary of extra request headers.
+    :param consumer: A function receiving the successful response's (decompressed) body in chunks.
+    :return: The response's (decompressed) body (None if it was passed to the consumer).
+    """
+    for _ in range(MAX_REDIRECTS + 1):
+        rate_limiter = _get_rate_limiter(url)
+        for retry in range(MAX_RETRIES + 1):
+            await asyncio.sleep(rate_limiter.reserve())
+            status, reason, response_headers, body = await _request_async(url, data, headers, consumer)
+            if status not in RETRY_CODES:
+                rate_limiter.speed_up()
+                break
+            rate_limiter.slow_down()
+            if retry < MAX_RETRIES:
+                await asyncio.sleep(_get_retry_delay(response_headers, retry))
+        if status in REDIRECT_CODES and 'location' in response_headers:
+            url = urllib.parse.urljoin(url, response_headers['location'])
+            # Just like urllib, turn the redirected POST requests into GET requests.
+            if status in (301, 302, 303):
+                data = None
+            continue
+        if status >= 400:
+            raise urllib.error.HTTPError(url, status, reason, response_headers, None)
+        if consumer:
+            return None
+        return _decode_body(body, response_headers.get('content-encoding'))
+    raise urllib.error.URLError('Too many redirections: {}'.format(url))
+
+
+async def _request_async(url, data, headers, consumer=None):
+    """
+    Sends a single HTTP/1.1 request over a pooled connection of the current event loop.
+    A request which failed over a reused connection (which the server might have closed) before the response
+    arrived is sent again over a new connection.
+
+    :param url: The URL to fetch.
+    :param data: The request's body.
+    :param headers: A dictionary of extra request headers.
+    :param consumer: A function receiving the successful response's (decompressed) body in chunks.
+    :return: The status code, the reason, a dictionary of the (lower case) response headers and the raw body
+    (None if it was passed to the consumer).
+    """
+    url_parts = urllib.parse.urlsplit(url)
+    is_https = url_parts.scheme == 'https'
+    port = url_parts.port or (443 if is_https else 80)
+    loop_connections = _async_connections.setdefault(asyncio.get_running_loop(), {})
+    idle_connections = loop_connections.setdefault((url_parts.scheme, url_parts.hostname, port), [])
+    while True:
+        reader, writer = idle_connections.pop() if idle_connections else (None, None)
+        reused = reader is not None
+        if reused and reader.at_eof():
+            writer.close()
+            continue
+        if not reused:
+            reader, writer = await asyncio.open_connection(url_parts.hostname, port,
+                                                           ssl=_get_ssl_context() if is_https else None)
+        try:
+            writer.write(_create_request(url_parts, data, headers))
+            await writer.drain()
+            status, reason, response_headers, keep_alive = await _read_response_head(reader)
+        except (OSError, EOFError):
+            writer.close()
+            if reused:
+                continue
+            raise
+        except BaseException:
+            writer.close()
+            raise
+        try:
+            body, complete = await _read_response_body(reader, response_headers,
+                                                       consumer if 200 <= status < 300 else None)
+        except BaseException:
+            writer.close()
+            raise
+        # The body ends when the connection is closed, unless its length is known.
+        delimited = 'content-length' in response_headers or \
+            'chunked' in response_headers.get('transfer-encoding', '').lower()
+        keep_alive = keep_alive and complete and delimited
+        if keep_alive and len(idle_connections) < _pool_size:
+            idle_connections.append((reader, writer))
+        else:
+            writer.close()
+        return status, reason, response_headers, body
+
+
+def _create_request(url_parts, data, headers):
+    """
+    Creates the raw HTTP request.
+
+    :param url_parts: The split URL to fetch.
+    :param data: The request's body.
+    :param headers: A dictionary of extra request headers.
+    :return: The request's bytes.
+    """
+    path = url_parts.path or '/'
+    if url_parts.query:
+        path += '?' + url_parts.query
+    request_headers = {'Host': url_parts.netloc, 'User-Agent': USER_AGENT}
+    if data is not None:
+        request_headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        request_headers['Content-Length'] = str(len(data))
+    request_headers.update(headers or {})
+    request_lines = ['{} {} HTTP/1.1'.format('GET' if data is None else 'POST', path)]
+    request_lines.extend('{}: {}'.format(name, value) for name, value in request_headers.items())
+    return '\r\n'.join(request_lines).encode('latin-1') + b'\r\n\r\n' + (data or b'')
+
+
+async def _read_response_head(reader):
+    """
+    Reads the status line and the headers of an HTTP response from the stream.
+
+    :param reader: The connection's stream reader.
+    :return: The status code, the reason, a dictionary of the (lower case) response headers and whether or not
+    the server allows reusing the connection.
+    """
+    status_line = (await reader.readline()).decode('latin-1').rstrip('\r\n').split(' ', 2)
+    if len(status_line) < 2 or not status_line[0].startswith('HTTP/') or not status_line[1].isdigit():
+        raise urllib.error.URLError('Malformed status line: {}'.format(' '.join(status_line)))
+    status = int(status_line[1])
+    reason = status_line[2] if len(status_line) > 2 else ''
+    response_headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        response_headers[name.strip().lower()] = value.strip()
+    connection_header = response_headers.get('connection', '').lower()
+    keep_alive = 'close' not in connection_header and \
+        (status_line[0] != 'HTTP/1.0' or 'keep-alive' in connection_header)
+    return status, reason, response_headers, keep_alive
+
+
+async def _read_response_body(reader, response_headers, consumer=None):
+    """
+    Reads the body of an HTTP response from the stream.
+
+    :param reader: The connection's stream reader.
+    :param response_headers: A dictionary of the (lower case) response headers.
+    :param consumer: A function receiving the (decompressed) body in chunks (the body is returned if None).
+    :return: The raw body (None if it was passed to the consumer), and whether or not the whole body was read.
+    """
+    chunks = _iter_body(reader, response_headers)
+    if not consumer:
+        return b''.join([chunk async for chunk in chunks]), True
+    decompressor = _get_decompressor(response_headers.get('content-encoding'))
+    async for chunk in chunks:
+        if decompressor:
+            chunk = decompressor.decompress(chunk)
+        if consumer(chunk):
+            await chunks.aclose()
+            return None, False
+    return None, True
+
+
+async def _iter_body(reader, response_headers):
+    """
+    Reads the raw body of an HTTP response from the stream, in chunks of up to STREAM_CHUNK_SIZE bytes.
+
+    :param reader: The connection's stream reader.
+    :param response_headers: A dictionary of the (lower case) response headers.
+    :return: Yields the body's chunks.
+    """
+    if 'chunked' in response_headers.get('transfer-encoding', '').lower():
+        while True:
+            chunk_size = int((await reader.readline()).split(b';', 1)[0].strip() or b'0', 16)
+            if chunk_size == 0:
+                break
+            while chunk_size:
+                chunk = await reader.readexactly(min(chunk_size, STREAM_CHUNK_SIZE))
+                chunk_size -= len(chunk)
+                yield chunk
+            await reader.readline()
+        # Skip the trailer headers.
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+    elif 'content-length' in response_headers:
+        remaining = int(response_headers['content-length'])
+        while remaining:
+            chunk = await reader.readexactly(min(remaining, STREAM_CHUNK_SIZE))
+            remaining -= len(chunk)
+            yield chunk
+    else:
+        # The body ends when the connection is closed.
+        while True:
+            chunk = await reader.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def _decode_body(body, content_encoding):
+    """
+    Decompresses the response's body, if needed.
+
+    :param body: The raw body.
+    :param content_encoding: The response's Content-Encoding header.
+    :return: The decompressed body.
+    """
+    if content_encoding and 'gzip' in content_encoding.lower():
+        return gzip.decompress(body)
+    return body
+
+
+def _get_ssl_context():
+    """
+    Returns the SSL context shared by all HTTPS connections.
+    """
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = ssl.create_default_context()
+    return _ssl_context
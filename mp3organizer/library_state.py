@@ -0,0 +1,124 @@
+import sqlite3
+import threading
+import time
+
+import logbook
+
+logger = logbook.Logger('LibraryState')
+
+
+class FileState(object):
+    """
+    A POPO class to hold the state of a single organized file.
+    Contains the following information:
+    Path, Size, Modification Time, Tag Digest, Client and Lyrics Source.
+    """
+
+    def __init__(self, path, size, mtime, tag_digest=None, client=None, lyrics_source=None):
+        """
+        Initializes the file state object.
+
+        :param path: The file's path.
+        :param size: The file's size (in bytes).
+        :param mtime: The file's modification time (in nanoseconds).
+        :param tag_digest: The hash of the file's raw ID3 tag.
+        :param client: The name of the client which found the file's album.
+        :param lyrics_source: The name of the grabber which found the file's lyrics.
+        """
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.tag_digest = tag_digest
+        self.client = client
+        self.lyrics_source = lyrics_source
+
+
+class LibraryState(object):
+    """
+    A persistent record of the files the organizer already processed, by their album directories.
+    Lets batch runs find the albums which are new or changed since they were last organized.
+    """
+
+    def __init__(self, path):
+        """
+        Opens the state database (creates it if needed).
+
+        :param path: The state database's path.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, album_path TEXT, '
+                                 'size INTEGER, mtime INTEGER, tag_digest TEXT, client TEXT, lyrics_source TEXT, '
+                                 'updated REAL)')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS files_album_path ON files (album_path)')
+        self._connection.commit()
+
+    def get_albums(self):
+        """
+        Reads the recorded size and modification time of all the files.
+
+        :return: A dictionary of the album directories' paths, and the size and modification time of every file
+        in them, by the files' paths.
+        """
+        albums = {}
+        with self._lock:
+            for path, album_path, size, mtime in self._connection.execute(
+                    'SELECT path, album_path, size, mtime FROM files'):
+                albums.setdefault(album_path, {})[path] = (size, mtime)
+        return albums
+
+    def get_file(self, path):
+        """
+        Reads the recorded state of a single file.
+
+        :param path: The file's path.
+        :return: The file's state, or None if it wasn't recorded.
+        """
+        with self._lock:
+            row = self._connection.execute('SELECT path, size, mtime, tag_digest, client, lyrics_source '
+                                           'FROM files WHERE path = ?', (path,)).fetchone()
+        return FileState(*row) if row else None
+
+    def find_changed_albums(self, library_albums):
+        """
+        Compares the scanned library against the recorded state.
+
+        :param library_albums: The scanned album directories, and the size and modification time of their files
+        (see file_utils.scan_library).
+        :return: A sorted list of the album directories which are new or changed since they were recorded.
+        """
+        recorded_albums = self.get_albums()
+        changed_albums = [album_path for album_path, files in library_albums.items()
+                          if recorded_albums.get(album_path) != files]
+        changed_albums.sort()
+        logger.debug('{} of {} albums are new or changed.'.format(len(changed_albums), len(library_albums)))
+        return changed_albums
+
+    def set_album(self, album_path, files_states):
+        """
+        Records the state of all the files in the album directory (replacing the previous record).
+        Missing clients and lyrics sources keep their previously recorded values.
+
+        :param album_path: The album directory's path.
+        :param files_states: The files' states.
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute('DELETE FROM files WHERE album_path = ? AND path NOT IN ({})'.format(
+                ', '.join('?' * len(files_states))), [album_path] + [state.path for state in files_states])
+            self._connection.executemany(
+                'INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (path) DO UPDATE SET '
+                'album_path = excluded.album_path, size = excluded.size, mtime = excluded.mtime, '
+                'tag_digest = excluded.tag_digest, client = COALESCE(excluded.client, client), '
+                'lyrics_source = COALESCE(excluded.lyrics_source, lyrics_source), updated = excluded.updated',
+                [(state.path, album_path, state.size, state.mtime, state.tag_digest, state.client,
+                  state.lyrics_source, now) for state in files_states])
+            self._connection.commit()
+
+    def close(self):
+        """
+        Closes the state database.
+        """
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,74 @@
+import sqlite3
+import threading
+import time
+
+from mp3organizer.normalization import normalize_key
+
+
+class ArtistsCache(object):
+    """
+    A persistent cache of the artists' URL slugs in every lyrics website, keyed by the grabber's name and the
+    normalized artist name.
+    Keeps both resolved slugs and artists the websites don't have (each with its own TTL).
+    """
+
+    # The time (in seconds) to keep resolved slugs for.
+    DEFAULT_TTL = 60 * 24 * 60 * 60
+    # The time (in seconds) to keep artists which weren't found for.
+    DEFAULT_NEGATIVE_TTL = 7 * 24 * 60 * 60
+
+    def __init__(self, path, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL):
+        """
+        Opens the cache database (creates it if needed).
+
+        :param path: The cache database's path.
+        :param ttl: The time (in seconds) to keep resolved slugs for.
+        :param negative_ttl: The time (in seconds) to keep artists which weren't found for.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute('CREATE TABLE IF NOT EXISTS artists (grabber TEXT, artist TEXT, slug TEXT, '
+                                 'created REAL, PRIMARY KEY (grabber, artist))')
+        self._connection.commit()
+
+    def get(self, grabber, artist):
+        """
+        Looks for the artist's slug in the cache.
+
+        :param grabber: The grabber's name.
+        :param artist: The artist's name.
+        :return: Whether or not the artist was found in the cache, and its slug (None if the website doesn't have it).
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute('SELECT slug, created FROM artists WHERE grabber = ? AND artist = ?',
+                                           (grabber, normalize_key(artist))).fetchone()
+        if row is None:
+            return False, None
+        slug, created = row
+        if now - created > (self.ttl if slug is not None else self.negative_ttl):
+            return False, None
+        return True, slug
+
+    def set(self, grabber, artist, slug):
+        """
+        Saves the artist's slug in the cache.
+
+        :param grabber: The grabber's name.
+        :param artist: The artist's name.
+        :param slug: The artist's slug, or None if the website doesn't have it.
+        """
+        with self._lock:
+            self._connection.execute('INSERT OR REPLACE INTO artists VALUES (?, ?, ?, ?)',
+                                     (grabber, normalize_key(artist), slug, time.time()))
+            self._connection.commit()
+
+    def close(self):
+        """
+        Closes the cache database.
+        """
+        with self._lock:
+            self._connection.close()
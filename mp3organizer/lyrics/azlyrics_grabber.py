@@ -1,9 +1,10 @@
-import re
+import functools
 
 import logbook
 
-from .lyrics_utils import encode, fetch_url, extract_text
+from .lyrics_utils import encode
 from .base import Grabber
+from mp3organizer.normalization import CACHE_SIZE, create_alphanumeric_table
 
 logger = logbook.Logger('AZLyricsGrabber')
 
@@ -14,44 +15,76 @@ class AZLyricsGrabber(Grabber):
     """
 
     AZLYRICS_URL_PATTERN = 'http://www.azlyrics.com/lyrics/{}/{}.html'
+    # The artists' pages are listed by their first letter (or '19' for digits).
+    ARTIST_URL_PATTERN = 'http://www.azlyrics.com/{}/{}.html'
+    # The artists' pages list the tracks of all their albums.
+    INDEX_LINK_PATTERN = r'<a href="(?P<url>(?:\.\.)?/lyrics/{}/[^"/]+\.html)"[^>]*>(?P<title>[^<]+)</a>'
+    LYRICS_START_TAG = '<!-- Usage of azlyrics.com content by any third-party lyrics provider is prohibited by our ' \
+                       'licensing agreement. Sorry about that. -->'
+    # Removes every character which isn't an ASCII letter or digit.
+    AZLYRICS_TABLE = create_alphanumeric_table(None)
 
     @staticmethod
     def get_name():
         return 'AZ Lyrics'
 
-    def find_lyrics(self, track, artist, album=None):
+    def _get_artist_slugs(self, artist):
         """
-        Searches "AZ Lyrics" for the lyrics.
+        Creates the artist's possible slugs in "AZ Lyrics", which usually drops a leading "The".
 
-        :param track: The track's title.
         :param artist: The artist's name.
+        :returns: The artist's possible slugs, the most likely first.
+        """
+        artist_slug = self._encode(artist)
+        words = artist.split(None, 1)
+        if len(words) > 1 and words[0].lower() == 'the':
+            short_slug = self._encode(words[1])
+            if short_slug:
+                return [short_slug, artist_slug]
+        return [artist_slug]
+
+    def _get_artist_url(self, artist_slug):
+        """
+        Creates the URL of the artist's page in "AZ Lyrics".
+
+        :param artist_slug: The artist's slug.
+        :returns: The artist page's URL.
+        """
+        letter = artist_slug[:1] if artist_slug[:1].isalpha() else '19'
+        return AZLyricsGrabber.ARTIST_URL_PATTERN.format(letter, artist_slug)
+
+    def _get_url(self, track, artist_slug, album=None):
+        """
+        Creates the URL of the track's lyrics page in "AZ Lyrics".
+
+        :param track: The track's title.
+        :param artist_slug: The artist's slug.
         :param album: The album's name.
-        :returns: The track's lyrics, or None.
+        :returns: The lyrics page's URL.
         """
-        url = AZLyricsGrabber.AZLYRICS_URL_PATTERN.format(self._encode(artist, is_artist=True), self._encode(track))
-        html = fetch_url(url, self.verbose)
-        if not html:
-            return
+        return AZLyricsGrabber.AZLYRICS_URL_PATTERN.format(artist_slug, self._encode(track))
 
-        lyrics = extract_text(html, '<!-- Usage of azlyrics.com content by any third-party lyrics provider is '
-                                    'prohibited by our licensing agreement. Sorry about that. -->', self.verbose)
+    def _parse_lyrics(self, lyrics):
+        """
+        Checks the lyrics extracted from the track's lyrics page in "AZ Lyrics".
+
+        :param lyrics: The extracted lyrics (None if they weren't found).
+        :returns: The track's lyrics, or None.
+        """
         if not lyrics and self.verbose:
             logger.debug('Couldn\'t find lyrics.')
         return lyrics
 
     @staticmethod
-    def _encode(string, is_artist=False):
+    @functools.lru_cache(maxsize=CACHE_SIZE)
+    def _encode(string):
         """
         Encoding function specifically for 'AZ Lyrics'.
 
         :param string: The string to encode.
-        :param is_artist: If True, "The" will be omitted.
         :return: The encoded string.
         """
-        string = re.sub('[^a-zA-Z0-9]', '', string).lower()
-        if is_artist and string.startswith('the'):
-            string = string[3:]
-        return encode(string)
+        return encode(string.translate(AZLyricsGrabber.AZLYRICS_TABLE))
 
     def __repr__(self):
         """
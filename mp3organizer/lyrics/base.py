@@ -1,23 +1,54 @@
+import html
+import re
+import threading
+import urllib.parse
+
+import logbook
+
+from .lyrics_utils import fetch_text, fetch_text_async, fetch_page, fetch_page_async, page_exists, \
+    page_exists_async, PageNotFoundException
+from mp3organizer.normalization import normalize_key, NOISE_RE
+
+logger = logbook.Logger('Grabber')
+
+
 class Grabber(object):
     """
     Supplies simple functions for finding lyrics.
     """
 
     MAX_RESULTS = 1
+    # The tag the lyrics' <DIV> tag starts after, in the lyrics pages.
+    LYRICS_START_TAG = None
+    # The URL pattern of the artists' pages (formatted with the artist's slug), which tells a missing artist apart
+    # from a missing track. None if the website has no such pages.
+    ARTIST_URL_PATTERN = None
+    # The pattern of the tracks' links in the index pages (formatted with the escaped artist's slug),
+    # with 'url' and 'title' groups. None if the website has no index pages.
+    INDEX_LINK_PATTERN = None
 
-    def __init__(self, verbose=True):
+    def __init__(self, verbose=True, artists_cache=None):
         """
         Initializes the lyrics grabber.
 
         :param verbose: Whether or not to print output.
+        :param artists_cache: The persistent cache of the artists' slugs (None to keep them for the current run only).
         """
         self.verbose = verbose
+        self.artists_cache = artists_cache
+        # The resolved artists' slugs (None for artists the website doesn't have), by normalized artist name.
+        self._artist_slugs = {}
+        # The tracks' URLs listed in every index page (None for missing pages), by the index page's URL.
+        self._indexes = {}
+        # The locks of the artists being resolved and the index pages being fetched (so they're fetched once).
+        self._locks = {}
+        self._lock = threading.Lock()
 
     @staticmethod
     def get_name():
         return 'Unknown'
 
-    def find_lyrics(self, track, artist, album):
+    def find_lyrics(self, track, artist, album=None):
         """
         Searches website for the track and returns its lyrics.
 
@@ -26,6 +57,382 @@ class Grabber(object):
         :param album: The album's name.
         :returns: The tracks' lyrics, or None.
         """
+        found, artist_slug = self._get_artist_slug(artist)
+        if not found:
+            artist_slugs = self._get_artist_slugs(artist)
+            if len(artist_slugs) == 1 and self.ARTIST_URL_PATTERN is None:
+                # There's nothing to learn about the artist.
+                artist_slug = artist_slugs[0]
+            else:
+                with self._get_lock(normalize_key(artist or '')):
+                    # Another track might have resolved the artist meanwhile.
+                    found, artist_slug = self._get_artist_slug(artist)
+                    if not found:
+                        return self._resolve_artist(track, artist, album, artist_slugs)
+        if artist_slug is None:
+            if self.verbose:
+                logger.debug('{} doesn\'t have the artist "{}".'.format(self, artist))
+            return None
+        return self._fetch_lyrics(track, artist_slug, album)
+
+    async def find_lyrics_async(self, track, artist, album=None):
+        """
+        The asynchronous version of find_lyrics.
+        Searches website for the track and returns its lyrics.
+
+        :param track: The track's title.
+        :param artist: The artist's name.
+        :param album: The album's name.
+        :returns: The tracks' lyrics, or None.
+        """
+        found, artist_slug = self._get_artist_slug(artist)
+        if not found:
+            artist_slugs = self._get_artist_slugs(artist)
+            if len(artist_slugs) > 1 or self.ARTIST_URL_PATTERN is not None:
+                return await self._resolve_artist_async(track, artist, album, artist_slugs)
+            artist_slug = artist_slugs[0]
+        if artist_slug is None:
+            if self.verbose:
+                logger.debug('{} doesn\'t have the artist "{}".'.format(self, artist))
+            return None
+        return await self._fetch_lyrics_async(track, artist_slug, album)
+
+    def _fetch_lyrics(self, track, artist_slug, album=None):
+        """
+        Fetches the track's lyrics page (as listed in the album's index page, if there's one).
+
+        :param track: The track's title.
+        :param artist_slug: The artist's slug.
+        :param album: The album's name.
+        :returns: The tracks' lyrics, or None.
+        """
+        url = self._get_track_url(track, self._get_index(artist_slug, album), artist_slug, album)
+        if url is None:
+            return self._parse_lyrics(None)
+        try:
+            lyrics = fetch_text(url, self.LYRICS_START_TAG, self.verbose)
+        except PageNotFoundException:
+            lyrics = None
+        return self._parse_lyrics(lyrics)
+
+    async def _fetch_lyrics_async(self, track, artist_slug, album=None):
+        """
+        The asynchronous version of _fetch_lyrics.
+        Fetches the track's lyrics page (as listed in the album's index page, if there's one).
+
+        :param track: The track's title.
+        :param artist_slug: The artist's slug.
+        :param album: The album's name.
+        :returns: The tracks' lyrics, or None.
+        """
+        url = self._get_track_url(track, await self._get_index_async(artist_slug, album), artist_slug, album)
+        if url is None:
+            return self._parse_lyrics(None)
+        try:
+            lyrics = await fetch_text_async(url, self.LYRICS_START_TAG, self.verbose)
+        except PageNotFoundException:
+            lyrics = None
+        return self._parse_lyrics(lyrics)
+
+    def _get_track_url(self, track, index, artist_slug, album=None):
+        """
+        Finds the URL of the track's lyrics page in the index, or guesses it if there's no index (or if the title
+        has no key to look up).
+
+        :param track: The track's title.
+        :param index: The tracks' URLs listed in the album's index page (None or empty if there's no index).
+        :param artist_slug: The artist's slug.
+        :param album: The album's name.
+        :returns: The lyrics page's URL, or None if the index doesn't list the track.
+        """
+        key = self._get_index_key(track)
+        if not index or not key:
+            # Titles without any letters or digits can't be looked up in the index.
+            return self._get_url(track, artist_slug, album)
+        url = index.get(key) or index.get(self._get_index_key(NOISE_RE.sub(' ', track)))
+        if url is None and self.verbose:
+            logger.debug('{} doesn\'t list the track "{}".'.format(self, track))
+        return url
+
+    def _resolve_artist(self, track, artist, album, artist_slugs):
+        """
+        Tries the album's index page and then the track's page with each of the artist's possible slugs,
+        and remembers the first slug which works. If none of the pages exist, checks the artist's pages to tell
+        whether the track or the artist is missing.
+
+        :param track: The track's title.
+        :param artist: The artist's name.
+        :param album: The album's name.
+        :param artist_slugs: The artist's possible slugs, the most likely first.
+        :returns: The tracks' lyrics, or None.
+        """
+        for artist_slug in artist_slugs:
+            # An existing index page tells the artist's slug right away.
+            index = self._get_index(artist_slug, album)
+            if index is not None:
+                self._set_artist_slug(artist, artist_slug)
+                return self._fetch_lyrics(track, artist_slug, album)
+        for artist_slug in artist_slugs:
+            try:
+                lyrics = fetch_text(self._get_url(track, artist_slug, album), self.LYRICS_START_TAG, self.verbose)
+            except PageNotFoundException:
+                continue
+            # The track's page exists, so the slug is right.
+            self._set_artist_slug(artist, artist_slug)
+            return self._parse_lyrics(lyrics)
+        for artist_slug in artist_slugs:
+            artist_url = self._get_artist_url(artist_slug)
+            if artist_url is None:
+                break
+            if artist_url in self._indexes:
+                # The artist's page is its index page, which was already fetched.
+                if self._indexes[artist_url] is not None:
+                    self._set_artist_slug(artist, artist_slug)
+                    break
+                continue
+            try:
+                if page_exists(artist_url):
+                    self._set_artist_slug(artist, artist_slug)
+                    break
+            except IOError:
+                break
+        else:
+            self._set_artist_slug(artist, None)
+        return self._parse_lyrics(None)
+
+    async def _resolve_artist_async(self, track, artist, album, artist_slugs):
+        """
+        The asynchronous version of _resolve_artist.
+        Tries the album's index page and then the track's page with each of the artist's possible slugs,
+        and remembers the first slug which works. If none of the pages exist, checks the artist's pages to tell
+        whether the track or the artist is missing.
+
+        :param track: The track's title.
+        :param artist: The artist's name.
+        :param album: The album's name.
+        :param artist_slugs: The artist's possible slugs, the most likely first.
+        :returns: The tracks' lyrics, or None.
+        """
+        for artist_slug in artist_slugs:
+            # An existing index page tells the artist's slug right away.
+            index = await self._get_index_async(artist_slug, album)
+            if index is not None:
+                self._set_artist_slug(artist, artist_slug)
+                return await self._fetch_lyrics_async(track, artist_slug, album)
+        for artist_slug in artist_slugs:
+            try:
+                lyrics = await fetch_text_async(self._get_url(track, artist_slug, album), self.LYRICS_START_TAG,
+                                                self.verbose)
+            except PageNotFoundException:
+                continue
+            # The track's page exists, so the slug is right.
+            self._set_artist_slug(artist, artist_slug)
+            return self._parse_lyrics(lyrics)
+        for artist_slug in artist_slugs:
+            artist_url = self._get_artist_url(artist_slug)
+            if artist_url is None:
+                break
+            if artist_url in self._indexes:
+                # The artist's page is its index page, which was already fetched.
+                if self._indexes[artist_url] is not None:
+                    self._set_artist_slug(artist, artist_slug)
+                    break
+                continue
+            try:
+                if await page_exists_async(artist_url):
+                    self._set_artist_slug(artist, artist_slug)
+                    break
+            except IOError:
+                break
+        else:
+            self._set_artist_slug(artist, None)
+        return self._parse_lyrics(None)
+
+    def is_artist_missing(self, artist):
+        """
+        Checks if the website is already known not to have the artist (so its tracks can be skipped).
+
+        :param artist: The artist's name.
+        :return: True if the website doesn't have the artist, False if it does or if it's unknown.
+        """
+        found, artist_slug = self._get_artist_slug(artist)
+        return found and artist_slug is None
+
+    def _get_artist_slug(self, artist):
+        """
+        Looks for the artist's resolved slug (in memory, and then in the artists cache).
+
+        :param artist: The artist's name.
+        :return: Whether or not the artist was resolved, and its slug (None if the website doesn't have it).
+        """
+        key = normalize_key(artist or '')
+        with self._lock:
+            if key in self._artist_slugs:
+                return True, self._artist_slugs[key]
+        if self.artists_cache is None:
+            return False, None
+        found, artist_slug = self.artists_cache.get(self.get_name(), artist or '')
+        if found:
+            with self._lock:
+                self._artist_slugs[key] = artist_slug
+        return found, artist_slug
+
+    def _set_artist_slug(self, artist, artist_slug):
+        """
+        Remembers the artist's resolved slug (in memory, and in the artists cache).
+
+        :param artist: The artist's name.
+        :param artist_slug: The artist's slug, or None if the website doesn't have the artist.
+        """
+        if self.verbose:
+            logger.debug('Resolved the artist "{}" in {}: {}.'.format(artist, self, artist_slug))
+        with self._lock:
+            self._artist_slugs[normalize_key(artist or '')] = artist_slug
+        if self.artists_cache is not None:
+            self.artists_cache.set(self.get_name(), artist or '', artist_slug)
+
+    def _get_lock(self, key):
+        """
+        :param key: The normalized artist name, or the index page's URL.
+        :return: The lock held while resolving the artist, or fetching the index page.
+        """
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _get_artist_slugs(self, artist):
+        """
+        Creates the artist's possible slugs (the artist's part of the lyrics pages' URLs).
+
+        :param artist: The artist's name.
+        :returns: The artist's possible slugs, the most likely first.
+        """
+        raise NotImplementedError('Grabber didn\'t implement this method.')
+
+    def _get_artist_url(self, artist_slug):
+        """
+        Creates the URL of the artist's page.
+
+        :param artist_slug: The artist's slug.
+        :returns: The artist page's URL, or None if the website has no artists' pages.
+        """
+        if self.ARTIST_URL_PATTERN is None:
+            return None
+        return self.ARTIST_URL_PATTERN.format(artist_slug)
+
+    def _get_index(self, artist_slug, album=None):
+        """
+        Fetches the album's index page (once), and finds the tracks' URLs listed in it.
+
+        :param artist_slug: The artist's slug.
+        :param album: The album's name.
+        :returns: The tracks' URLs by their index keys, or None if the index page is missing
+        (or if the website has no index pages).
+        """
+        index_url = self._get_index_url(artist_slug, album)
+        if index_url is None:
+            return None
+        with self._lock:
+            if index_url in self._indexes:
+                return self._indexes[index_url]
+        with self._get_lock(index_url):
+            # Another track might have fetched the index page meanwhile.
+            with self._lock:
+                if index_url in self._indexes:
+                    return self._indexes[index_url]
+            try:
+                page = fetch_page(index_url, self.verbose)
+            except PageNotFoundException:
+                index = None
+            else:
+                index = self._parse_index(page, index_url, artist_slug)
+            with self._lock:
+                self._indexes[index_url] = index
+            return index
+
+    async def _get_index_async(self, artist_slug, album=None):
+        """
+        The asynchronous version of _get_index.
+        Fetches the album's index page (once), and finds the tracks' URLs listed in it.
+
+        :param artist_slug: The artist's slug.
+        :param album: The album's name.
+        :returns: The tracks' URLs by their index keys, or None if the index page is missing
+        (or if the website has no index pages).
+        """
+        index_url = self._get_index_url(artist_slug, album)
+        if index_url is None:
+            return None
+        with self._lock:
+            if index_url in self._indexes:
+                return self._indexes[index_url]
+        try:
+            page = await fetch_page_async(index_url, self.verbose)
+        except PageNotFoundException:
+            index = None
+        else:
+            index = self._parse_index(page, index_url, artist_slug)
+        with self._lock:
+            self._indexes[index_url] = index
+        return index
+
+    def _parse_index(self, page, index_url, artist_slug):
+        """
+        Finds the tracks' URLs listed in the index page.
+
+        :param page: The index page.
+        :param index_url: The index page's URL (relative links are resolved against it).
+        :param artist_slug: The artist's slug (only the artist's tracks are listed).
+        :returns: The tracks' URLs by their index keys (the first link of every track).
+        """
+        index = {}
+        for match in re.finditer(self.INDEX_LINK_PATTERN.format(re.escape(artist_slug)), page):
+            key = self._get_index_key(html.unescape(match.group('title')))
+            if key:
+                index.setdefault(key, urllib.parse.urljoin(index_url, match.group('url')))
+        if not index and self.verbose:
+            logger.debug('No tracks were found in the index page: {}'.format(index_url))
+        return index
+
+    def _get_index_url(self, artist_slug, album=None):
+        """
+        Creates the URL of the page listing the album's tracks (the artist's page, by default).
+
+        :param artist_slug: The artist's slug.
+        :param album: The album's name.
+        :returns: The index page's URL, or None if the website has no index pages.
+        """
+        if self.INDEX_LINK_PATTERN is None:
+            return None
+        return self._get_artist_url(artist_slug)
+
+    @staticmethod
+    def _get_index_key(track):
+        """
+        Creates the key of the track in the index pages (ignoring case, spaces and punctuation, in any script).
+
+        :param track: The track's title.
+        :returns: The track's key (empty if the title has no letters or digits).
+        """
+        return normalize_key(track).replace(' ', '')
+
+    def _get_url(self, track, artist_slug, album=None):
+        """
+        Creates the URL of the track's lyrics page.
+
+        :param track: The track's title.
+        :param artist_slug: The artist's slug.
+        :param album: The album's name.
+        :returns: The lyrics page's URL.
+        """
+        raise NotImplementedError('Grabber didn\'t implement this method.')
+
+    def _parse_lyrics(self, lyrics):
+        """
+        Checks the lyrics extracted from the track's lyrics page.
+
+        :param lyrics: The extracted lyrics (None if they weren't found).
+        :returns: The tracks' lyrics, or None.
+        """
         raise NotImplementedError('Grabber didn\'t implement this method.')
 
     def __repr__(self):
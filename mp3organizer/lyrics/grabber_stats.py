@@ -0,0 +1,142 @@
+import sqlite3
+import threading
+
+import logbook
+
+from mp3organizer.normalization import normalize_key
+
+logger = logbook.Logger('GrabberStats')
+
+
+class GrabberStats(object):
+    """
+    A persistent record of every lyrics grabber's attempts, hits and latency, overall and by artist.
+    Orders the grabbers by their expected hits per second, which minimizes the expected time until the lyrics are found
+    when the grabbers are tried one after another.
+    """
+
+    # The artist key of the overall statistics.
+    OVERALL = ''
+    # The minimal number of attempts for an artist, before its own statistics are trusted.
+    MIN_ARTIST_ATTEMPTS = 5
+    # The prior (pseudo) attempts, hits and duration (in seconds) every grabber starts with,
+    # so grabbers with little data are neither dropped nor trusted too soon.
+    PRIOR_ATTEMPTS = 2
+    PRIOR_HITS = 1
+    PRIOR_DURATION = 2.0
+
+    def __init__(self, path):
+        """
+        Opens the statistics database (creates it if needed).
+
+        :param path: The statistics database's path (':memory:' to keep them for the current run only).
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute('CREATE TABLE IF NOT EXISTS stats (grabber TEXT, artist TEXT, attempts INTEGER, '
+                                 'hits INTEGER, duration REAL, PRIMARY KEY (grabber, artist))')
+        self._connection.commit()
+        # The attempts, hits and duration of every grabber (the recorded ones and the pending ones),
+        # by grabber and artist.
+        self._stats = {}
+        # The attempts, hits and duration which weren't saved yet, by grabber and artist.
+        self._pending = {}
+        self._load()
+
+    def _load(self):
+        """
+        Reads all the saved statistics (including the ones saved by other processes).
+        Must be called while holding the lock.
+        """
+        self._stats = {(grabber, artist): [attempts, hits, duration] for grabber, artist, attempts, hits, duration
+                       in self._connection.execute('SELECT grabber, artist, attempts, hits, duration FROM stats')}
+        for key, (attempts, hits, duration) in self._pending.items():
+            self._add(self._stats, key, attempts, hits, duration)
+
+    @staticmethod
+    def _add(stats, key, attempts, hits, duration):
+        """
+        Adds the given attempts to the statistics.
+
+        :param stats: The statistics to update.
+        :param key: The grabber's name and the artist's key.
+        :param attempts: The number of attempts.
+        :param hits: The number of attempts which found the lyrics.
+        :param duration: The total duration (in seconds) of the attempts.
+        """
+        values = stats.setdefault(key, [0, 0, 0.0])
+        values[0] += attempts
+        values[1] += hits
+        values[2] += duration
+
+    def record(self, grabber, artist, found, duration):
+        """
+        Records a single lyrics lookup (kept in memory until the statistics are saved).
+
+        :param grabber: The grabber's name.
+        :param artist: The artist's name.
+        :param found: Whether or not the lyrics were found.
+        :param duration: The lookup's duration (in seconds).
+        """
+        hits = 1 if found else 0
+        with self._lock:
+            for key in {(grabber, GrabberStats.OVERALL), (grabber, normalize_key(artist or ''))}:
+                self._add(self._stats, key, 1, hits, duration)
+                self._add(self._pending, key, 1, hits, duration)
+
+    def get_score(self, grabber, artist):
+        """
+        Estimates the grabber's hits per second for the given artist (or overall, if the artist's statistics are too
+        few).
+
+        :param grabber: The grabber's name.
+        :param artist: The artist's name.
+        :return: The expected hits per second.
+        """
+        with self._lock:
+            attempts, hits, duration = self._stats.get((grabber, normalize_key(artist or '')), (0, 0, 0.0))
+            if attempts < GrabberStats.MIN_ARTIST_ATTEMPTS:
+                attempts, hits, duration = self._stats.get((grabber, GrabberStats.OVERALL), (0, 0, 0.0))
+        hit_rate = (hits + GrabberStats.PRIOR_HITS) / (attempts + GrabberStats.PRIOR_ATTEMPTS)
+        latency = (duration + GrabberStats.PRIOR_DURATION) / (attempts + GrabberStats.PRIOR_ATTEMPTS)
+        return hit_rate / latency
+
+    def sort(self, grabbers_list, artist):
+        """
+        Orders the grabbers by their expected hits per second (the best first).
+        Grabbers with the same scores keep their original order.
+
+        :param grabbers_list: The grabbers to order.
+        :param artist: The artist's name.
+        :return: The ordered grabbers list.
+        """
+        scores = {grabber.get_name(): self.get_score(grabber.get_name(), artist) for grabber in grabbers_list}
+        return sorted(grabbers_list, key=lambda grabber: -scores[grabber.get_name()])
+
+    def flush(self):
+        """
+        Saves the pending statistics, and reads the ones saved by other processes meanwhile.
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            self._connection.executemany(
+                'INSERT INTO stats VALUES (?, ?, ?, ?, ?) ON CONFLICT (grabber, artist) DO UPDATE SET '
+                'attempts = attempts + excluded.attempts, hits = hits + excluded.hits, '
+                'duration = duration + excluded.duration',
+                [key + tuple(values) for key, values in self._pending.items()])
+            self._connection.commit()
+            logger.debug('Saved the statistics of {} lookups.'.format(
+                sum(attempts for (_, artist), (attempts, _, _) in self._pending.items()
+                    if artist == GrabberStats.OVERALL)))
+            self._pending = {}
+            self._load()
+
+    def close(self):
+        """
+        Saves the pending statistics and closes the statistics database.
+        """
+        self.flush()
+        with self._lock:
+            self._connection.close()
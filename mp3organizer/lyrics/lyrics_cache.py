@@ -0,0 +1,135 @@
+import sqlite3
+import threading
+import time
+
+import logbook
+
+from mp3organizer.normalization import normalize_key
+
+logger = logbook.Logger('LyricsCache')
+
+
+class LyricsCache(object):
+    """
+    A persistent lyrics cache, keyed by the normalized artist and track names.
+    Keeps both found lyrics and lyrics which weren't found (each with its own TTL),
+    and evicts the least recently used lyrics once the cache grows too big.
+    """
+
+    # The time (in seconds) to keep found lyrics for.
+    DEFAULT_TTL = 60 * 24 * 60 * 60
+    # The time (in seconds) to keep lyrics which weren't found for.
+    DEFAULT_NEGATIVE_TTL = 24 * 60 * 60
+    # The maximal size (in bytes) of all the cached lyrics.
+    DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+    def __init__(self, path, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL, max_size=DEFAULT_MAX_SIZE):
+        """
+        Opens the cache database (creates it if needed).
+
+        :param path: The cache database's path.
+        :param ttl: The time (in seconds) to keep found lyrics for.
+        :param negative_ttl: The time (in seconds) to keep lyrics which weren't found for.
+        :param max_size: The maximal size (in bytes) of all the cached lyrics.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute('CREATE TABLE IF NOT EXISTS lyrics (key TEXT PRIMARY KEY, lyrics TEXT, '
+                                 'size INTEGER, created REAL, accessed REAL)')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS lyrics_accessed ON lyrics (accessed)')
+        self._connection.commit()
+        self._size = self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM lyrics').fetchone()[0]
+
+    @staticmethod
+    def _get_key(track, artist):
+        """
+        Creates the cache key of the given track.
+
+        :param track: The track's title.
+        :param artist: The artist's name.
+        :return: The cache key.
+        """
+        return '{}|{}'.format(normalize_key(artist or ''), normalize_key(track))
+
+    def get(self, track, artist):
+        """
+        Looks for the track's lyrics in the cache.
+
+        :param track: The track's title.
+        :param artist: The artist's name.
+        :return: Whether or not the track was found in the cache, and its lyrics (None if they weren't found).
+        """
+        key = self._get_key(track, artist)
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute('SELECT lyrics, created FROM lyrics WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return False, None
+            lyrics, created = row
+            if now - created > (self.ttl if lyrics is not None else self.negative_ttl):
+                self._delete([key])
+                self._connection.commit()
+                return False, None
+            self._connection.execute('UPDATE lyrics SET accessed = ? WHERE key = ?', (now, key))
+            self._connection.commit()
+        return True, lyrics
+
+    def set(self, track, artist, lyrics):
+        """
+        Saves the track's lyrics in the cache.
+
+        :param track: The track's title.
+        :param artist: The artist's name.
+        :param lyrics: The track's lyrics, or None if they weren't found.
+        """
+        key = self._get_key(track, artist)
+        size = len(key) + len(lyrics.encode('UTF-8') if lyrics else b'')
+        now = time.time()
+        with self._lock:
+            self._delete([key])
+            self._connection.execute('INSERT INTO lyrics VALUES (?, ?, ?, ?, ?)', (key, lyrics, size, now, now))
+            self._size += size
+            if self._size > self.max_size:
+                # Other processes might have changed the cache as well.
+                self._size = self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM lyrics').fetchone()[0]
+                self._evict()
+            self._connection.commit()
+
+    def _delete(self, keys):
+        """
+        Deletes the given keys from the cache.
+        Must be called while holding the lock.
+
+        :param keys: The keys to delete.
+        """
+        for key in keys:
+            row = self._connection.execute('SELECT size FROM lyrics WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                self._connection.execute('DELETE FROM lyrics WHERE key = ?', (key,))
+                self._size -= row[0]
+
+    def _evict(self):
+        """
+        Deletes the least recently used lyrics until the cache is small enough.
+        Must be called while holding the lock.
+        """
+        evicted_keys = []
+        evicted_size = 0
+        for key, size in self._connection.execute('SELECT key, size FROM lyrics ORDER BY accessed'):
+            if self._size - evicted_size <= self.max_size:
+                break
+            evicted_keys.append(key)
+            evicted_size += size
+        self._delete(evicted_keys)
+        logger.debug('Evicted {} lyrics from the cache.'.format(len(evicted_keys)))
+
+    def close(self):
+        """
+        Closes the cache database.
+        """
+        with self._lock:
+            self._connection.close()
@@ -1,91 +1,221 @@
-import urllib.request
+import asyncio
+import codecs
+import functools
 import urllib.parse
 import urllib.error
 import re
+import threading
+import weakref
 
 import logbook
 
+from mp3organizer.http_utils import fetch, fetch_async
+from mp3organizer.normalization import CACHE_SIZE
+
 logger = logbook.Logger('LyricsUtils')
 
 DIV_RE = re.compile(r'<(/?)div>?')
-COMMENT_RE = re.compile(r'<!--.*-->', re.S)
-TAG_RE = re.compile(r'<[^>]*>')
-BREAK_RE = re.compile(r'<br\s*/?>')
+# The longest prefix of a DIV tag which doesn't match DIV_RE yet ('</div').
+DIV_PREFIX_LENGTH = 5
+# Splits the lyrics' HTML into comments, line breaks, other tags, entities, whitespaces and text.
+STRIP_RE = re.compile(r'(?P<comment><!--.*?-->)|(?P<break><br\s*/?>)|(?P<tag><[^>]*>)|'
+                      r'(?P<entity>&nbsp;|&#(?P<code>\d+);)|(?P<space>\s+)|(?P<text>[^<&\s]+|[<&])', re.S)
+LINE_EDGE_SPACES_RE = re.compile(r' *\n *')
 URL_CHARACTERS = {
     '\u2018': '\'', '\u2019': '\'', '\u201c': '"',
     '\u201d': '"', '\u2010': '-', '\u2011': '-',
     '\u2012': '-', '\u2013': '-', '\u2014': '-',
     '\u2015': '-', '\u2016': '-', '\u2026': '...'
 }
+URL_TABLE = str.maketrans(URL_CHARACTERS)
+# The maximal number of concurrent requests to a single lyrics website.
+MAX_REQUESTS_PER_HOST = 2
+# The HTTP status codes of pages which don't exist.
+NOT_FOUND_CODES = (404, 410)
 
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+# The asynchronous hosts' semaphores, for each event loop.
+_async_host_semaphores = weakref.WeakKeyDictionary()
 
-def extract_text(html, start_tag, verbose=True):
+
+class PageNotFoundException(Exception):
+    """
+    Raised when a lyrics website doesn't have the requested page.
+    """
+    pass
+
+
+class TextExtractor(object):
+    """
+    Extracts the text from a <DIV> tag in an HTML page, starting after a given tag, while the page is being read.
+    Only the text of the DIV tag is kept, so the rest of the page is never held in memory.
+    """
+
+    def __init__(self, start_tag):
         """
-        Extract the text from a <DIV> tag in the HTML starting with 'starttag'. Returns None if parsing fails.
+        Initializes the extractor.
 
-        :param html: The HTML to extract the lyrics from.
         :param start_tag: The tag to start extraction after.
-        :return: The extracted lyrics.
         """
-        # Strip off the leading text before opening tag.
-        try:
-            _, html = html.split(start_tag, 1)
-        except ValueError:
+        self.start_tag = start_tag
+        self.done = False
+        self._decoder = codecs.getincrementaldecoder('UTF-8')(errors='replace')
+        self._started = False
+        # The text which wasn't parsed yet (the end of a start tag or a DIV tag, split between chunks).
+        self._buffer = ''
+        self._level = 0
+        self._parts = []
+
+    def feed(self, data):
+        """
+        Parses the next chunk of the page.
+
+        :param data: The chunk's text (or its UTF-8 encoded bytes).
+        :return: True if the DIV tag ended (so the rest of the page isn't needed), False otherwise.
+        """
+        if self.done:
+            return True
+        if isinstance(data, bytes):
+            data = self._decoder.decode(data)
+        self._buffer += data
+        self._parse(final=False)
+        return self.done
+
+    def get_text(self, verbose=True):
+        """
+        Finishes parsing the page, and returns the extracted text.
+
+        :param verbose: Whether or not to print output.
+        :return: The extracted (and stripped) text, or None if parsing failed.
+        """
+        if not self.done:
+            self._buffer += self._decoder.decode(b'', final=True)
+            self._parse(final=True)
+        if not self._started:
             if verbose:
-                logger.debug('Couldn\'t find start tag - {}.'.format(start_tag))
+                logger.debug('Couldn\'t find start tag - {}.'.format(self.start_tag))
             return
+        if not self.done:
+            if verbose:
+                logger.error('No closing tag found!')
+            return
+        return strip_lyrics(''.join(self._parts))
 
+    def _parse(self, final):
+        """
+        Parses the buffered text.
+
+        :param final: Whether or not the page ended.
+        """
+        if not self._started:
+            # Strip off the leading text before opening tag.
+            index = self._buffer.find(self.start_tag)
+            if index == -1:
+                # Keep just enough text to find a start tag split between chunks.
+                self._buffer = self._buffer[max(len(self._buffer) - len(self.start_tag) + 1, 0):]
+                return
+            self._buffer = self._buffer[index + len(self.start_tag):]
+            self._started = True
+        end = len(self._buffer)
+        if not final:
+            # A DIV tag split between chunks is parsed along with the next chunk.
+            tag_index = self._buffer.rfind('<', max(end - DIV_PREFIX_LENGTH, 0))
+            if tag_index != -1:
+                end = tag_index
         # Walk through balanced DIV tags.
-        level = 0
-        parts = []
         pos = 0
-        for match in DIV_RE.finditer(html):
+        for match in DIV_RE.finditer(self._buffer, 0, end):
             # Closing tag.
             if match.group(1):
-                level -= 1
-                if level == 0:
+                self._level -= 1
+                if self._level == 0:
                     pos = match.end()
             # Opening tag.
             else:
-                if level == 0:
-                    parts.append(html[pos:match.start()])
-                level += 1
-
-            if level == -1:
-                parts.append(html[pos:match.start()])
-                break
-        else:
-            if verbose:
-                logger.error('No closing tag found!')
-            return
-        lyrics = ''.join(parts)
-        return strip_lyrics(lyrics)
+                if self._level == 0:
+                    self._parts.append(self._buffer[pos:match.start()])
+                self._level += 1
+
+            if self._level == -1:
+                self._parts.append(self._buffer[pos:match.start()])
+                self._buffer = ''
+                self.done = True
+                return
+        if self._level == 0:
+            self._parts.append(self._buffer[pos:end])
+        self._buffer = self._buffer[end:]
+
+
+def extract_text(html, start_tag, verbose=True):
+    """
+    Extract the text from a <DIV> tag in the HTML starting with 'starttag'. Returns None if parsing fails.
+
+    :param html: The HTML to extract the lyrics from.
+    :param start_tag: The tag to start extraction after.
+    :return: The extracted lyrics.
+    """
+    extractor = TextExtractor(start_tag)
+    extractor.feed(html)
+    return extractor.get_text(verbose)
 
 
 def strip_lyrics(lyrics, whitespace_collapse=True):
     """
-    Clean up HTML from an extracted lyrics string.
-    For example, <BR> tags are replaced with newlines.
+    Clean up HTML from an extracted lyrics string (in a single pass over it).
+    For example, <BR> tags are replaced with newlines, and the spaces around newlines are removed.
 
     :param lyrics: The lyrics to strip.
     :param whitespace_collapse: Whether or not to collapse whitespaces.
     :return: The stripped lyrics.
     """
-    lyrics = COMMENT_RE.sub('', lyrics)
-    lyrics = unescape(lyrics)
+    parts = []
+    # The whitespaces since the last text, which are only kept between texts in the same line.
+    whitespace = ''
+    for match in STRIP_RE.finditer(lyrics):
+        kind = match.lastgroup
+        if kind == 'break':
+            parts.append(_trim_whitespace(whitespace, whitespace_collapse, line_end=True))
+            parts.append('\n')
+            whitespace = ''
+            continue
+        if kind in ('comment', 'tag'):
+            continue
+        text = match.group()
+        if kind == 'entity':
+            text = ' ' if match.group('code') is None else chr(int(match.group('code')))
+        if text.isspace():
+            whitespace += text
+            continue
+        if whitespace:
+            parts.append(_trim_whitespace(whitespace, whitespace_collapse,
+                                          line_start=not parts or parts[-1].endswith('\n')))
+            whitespace = ''
+        parts.append(text)
+    return ''.join(parts).strip()
+
+
+def _trim_whitespace(whitespace, whitespace_collapse, line_start=False, line_end=False):
+    """
+    Removes the spaces at the start and the end of lines from the whitespaces between texts.
+
+    :param whitespace: The whitespaces.
+    :param whitespace_collapse: Whether or not to collapse whitespaces.
+    :param line_start: Whether or not the whitespaces start a line.
+    :param line_end: Whether or not the whitespaces end a line.
+    :return: The trimmed whitespaces.
+    """
     if whitespace_collapse:
-        lyrics = re.sub(r'\s+', ' ', lyrics)
-    # <BR> newlines.
-    lyrics = BREAK_RE.sub('\n', lyrics)
-    lyrics = re.sub(r'\n +', '\n', lyrics)
-    lyrics = re.sub(r' +\n', '\n', lyrics)
-    # Strip remaining HTML tags.
-    lyrics = TAG_RE.sub('', lyrics)
-    lyrics = lyrics.replace('\r', '\n')
-    lyrics = lyrics.strip()
-    return lyrics
+        return '' if line_start or line_end else ' '
+    whitespace = LINE_EDGE_SPACES_RE.sub('\n', whitespace.replace('\r', '\n'))
+    if line_start:
+        whitespace = whitespace.lstrip(' ')
+    if line_end:
+        whitespace = whitespace.rstrip(' ')
+    return whitespace
 
 
+@functools.lru_cache(maxsize=CACHE_SIZE)
 def encode(string):
     """
     Encode the string for inclusion in a URL.
@@ -93,37 +223,175 @@ def encode(string):
     :param string: The string to encode.
     :return: The encoded string.
     """
-    for char, replace in URL_CHARACTERS.items():
-        string = string.replace(char, replace)
-    return urllib.parse.quote(string)
+    # All the replaced characters are non-ASCII, so ASCII strings can skip the translation.
+    return urllib.parse.quote(string if string.isascii() else string.translate(URL_TABLE))
 
 
-def unescape(text):
+def fetch_text(url, start_tag, verbose=True):
     """
-    Resolves &#xxx; HTML entities (and some others).
+    Retrieve the text from a <DIV> tag starting with 'start_tag' at a given URL, reading the page only until
+    the DIV tag ends. Returns None if parsing fails.
 
-    :param text: The text to unescape.
-    :return: The unescaped text.
+    :param url: The URL to fetch.
+    :param start_tag: The tag to start extraction after.
+    :return: The extracted text, or None.
+    :raises: PageNotFoundException if the page doesn't exist, and IOError if the source is unreachable.
     """
-    out = text.replace('&nbsp;', ' ')
-    out = re.sub(r'&#(\d+);', lambda x: chr(int(x.group(1))), out)
-    return out
+    extractor = TextExtractor(start_tag)
+    try:
+        with _get_host_semaphore(url):
+            fetch(url, consumer=extractor.feed)
+    except urllib.error.HTTPError as ex:
+        if ex.code in NOT_FOUND_CODES:
+            raise PageNotFoundException(url)
+        if verbose:
+            logger.debug('failed to fetch: {}'.format(url))
+        raise
+    except IOError:
+        if verbose:
+            logger.exception('failed to fetch: {}'.format(url))
+        raise
+    return extractor.get_text(verbose)
 
 
-def fetch_url(url, verbose=True):
+async def fetch_text_async(url, start_tag, verbose=True):
     """
-    Retrieve the content at a given URL, or return None if the source is unreachable.
+    The asynchronous version of fetch_text.
+    Retrieve the text from a <DIV> tag starting with 'start_tag' at a given URL, reading the page only until
+    the DIV tag ends. Returns None if parsing fails.
 
     :param url: The URL to fetch.
-    :return: The content of this URL, or None.
+    :param start_tag: The tag to start extraction after.
+    :return: The extracted text, or None.
+    :raises: PageNotFoundException if the page doesn't exist, and IOError if the source is unreachable.
     """
+    extractor = TextExtractor(start_tag)
     try:
-        return urllib.request.urlopen(url).read().decode('UTF-8', errors='replace')
-    except urllib.error.HTTPError:
+        async with _get_async_host_semaphore(url):
+            await fetch_async(url, consumer=extractor.feed)
+    except urllib.error.HTTPError as ex:
+        if ex.code in NOT_FOUND_CODES:
+            raise PageNotFoundException(url)
         if verbose:
             logger.debug('failed to fetch: {}'.format(url))
-        return None
+        raise
     except IOError:
         if verbose:
             logger.exception('failed to fetch: {}'.format(url))
-        return None
+        raise
+    return extractor.get_text(verbose)
+
+
+def fetch_page(url, verbose=True):
+    """
+    Retrieve the whole page at a given URL.
+
+    :param url: The URL to fetch.
+    :return: The page's text.
+    :raises: PageNotFoundException if the page doesn't exist, and IOError if the source is unreachable.
+    """
+    try:
+        with _get_host_semaphore(url):
+            page = fetch(url)
+    except urllib.error.HTTPError as ex:
+        if ex.code in NOT_FOUND_CODES:
+            raise PageNotFoundException(url)
+        if verbose:
+            logger.debug('failed to fetch: {}'.format(url))
+        raise
+    except IOError:
+        if verbose:
+            logger.exception('failed to fetch: {}'.format(url))
+        raise
+    return page.decode('UTF-8', errors='replace')
+
+
+async def fetch_page_async(url, verbose=True):
+    """
+    The asynchronous version of fetch_page.
+    Retrieve the whole page at a given URL.
+
+    :param url: The URL to fetch.
+    :return: The page's text.
+    :raises: PageNotFoundException if the page doesn't exist, and IOError if the source is unreachable.
+    """
+    try:
+        async with _get_async_host_semaphore(url):
+            page = await fetch_async(url)
+    except urllib.error.HTTPError as ex:
+        if ex.code in NOT_FOUND_CODES:
+            raise PageNotFoundException(url)
+        if verbose:
+            logger.debug('failed to fetch: {}'.format(url))
+        raise
+    except IOError:
+        if verbose:
+            logger.exception('failed to fetch: {}'.format(url))
+        raise
+    return page.decode('UTF-8', errors='replace')
+
+
+def page_exists(url):
+    """
+    Checks if the page exists, reading only the beginning of its body.
+
+    :param url: The page's URL.
+    :return: True if the page exists, False if it doesn't.
+    :raises: IOError if the source is unreachable (or the page's existence is unknown).
+    """
+    try:
+        with _get_host_semaphore(url):
+            fetch(url, consumer=lambda chunk: True)
+    except urllib.error.HTTPError as ex:
+        if ex.code in NOT_FOUND_CODES:
+            return False
+        raise
+    return True
+
+
+async def page_exists_async(url):
+    """
+    The asynchronous version of page_exists.
+    Checks if the page exists, reading only the beginning of its body.
+
+    :param url: The page's URL.
+    :return: True if the page exists, False if it doesn't.
+    :raises: IOError if the source is unreachable (or the page's existence is unknown).
+    """
+    try:
+        async with _get_async_host_semaphore(url):
+            await fetch_async(url, consumer=lambda chunk: True)
+    except urllib.error.HTTPError as ex:
+        if ex.code in NOT_FOUND_CODES:
+            return False
+        raise
+    return True
+
+
+def _get_host_semaphore(url):
+    """
+    Returns the semaphore limiting the concurrent requests to the URL's host.
+
+    :param url: The URL to fetch.
+    :return: The host's semaphore.
+    """
+    host = urllib.parse.urlsplit(url).netloc.lower()
+    with _host_semaphores_lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(MAX_REQUESTS_PER_HOST)
+        return _host_semaphores[host]
+
+
+def _get_async_host_semaphore(url):
+    """
+    Returns the asynchronous semaphore limiting the concurrent requests to the URL's host,
+    in the running event loop.
+
+    :param url: The URL to fetch.
+    :return: The host's semaphore.
+    """
+    host = urllib.parse.urlsplit(url).netloc.lower()
+    loop_semaphores = _async_host_semaphores.setdefault(asyncio.get_running_loop(), {})
+    if host not in loop_semaphores:
+        loop_semaphores[host] = asyncio.BoundedSemaphore(MAX_REQUESTS_PER_HOST)
+    return loop_semaphores[host]
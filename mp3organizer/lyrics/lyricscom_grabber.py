@@ -1,9 +1,11 @@
+import functools
 import re
 
 import logbook
 
-from .lyrics_utils import encode, fetch_url, extract_text
+from .lyrics_utils import encode
 from .base import Grabber
+from mp3organizer.normalization import CACHE_SIZE, TranslationTable
 
 logger = logbook.Logger('LyricsComGrabber')
 
@@ -15,28 +17,45 @@ class LyricscomGrabber(Grabber):
 
     LYRICSCOM_URL_PATTERN = 'http://www.lyrics.com/{}-lyrics-{}.html'
     LYRICSCOM_NOT_FOUND = ('Sorry, we do not have the lyric', 'Submit Lyrics')
+    LYRICS_START_TAG = '<div id="lyrics" class="SCREENONLY" itemprop="description">'
+    WHITESPACE_RE = re.compile(r'\s+')
+    # Removes every character which isn't a word character, a whitespace or a hyphen.
+    LYRICSCOM_TABLE = TranslationTable(lambda char: char if char.isalnum() or char.isspace() or char in '_-' else None)
 
     @staticmethod
     def get_name():
         return 'Lyrics.com'
 
-    def find_lyrics(self, track, artist, album=None):
+    def _get_artist_slugs(self, artist):
         """
-        Searches "lyrics.com" for the lyrics.
+        Creates the artist's possible slugs in "lyrics.com".
 
-        :param track: The track's title.
         :param artist: The artist's name.
+        :returns: The artist's possible slugs.
+        """
+        return [self._encode(artist)]
+
+    def _get_url(self, track, artist_slug, album=None):
+        """
+        Creates the URL of the track's lyrics page in "lyrics.com".
+
+        :param track: The track's title.
+        :param artist_slug: The artist's slug.
         :param album: The album's name.
-        :returns: The track's lyrics, or None.
+        :returns: The lyrics page's URL.
         """
-        url = LyricscomGrabber.LYRICSCOM_URL_PATTERN.format(self._encode(track), self._encode(artist))
-        html = fetch_url(url, self.verbose)
-        if not html:
-            return
+        return LyricscomGrabber.LYRICSCOM_URL_PATTERN.format(self._encode(track), artist_slug)
+
+    def _parse_lyrics(self, lyrics):
+        """
+        Checks the lyrics extracted from the track's lyrics page in "lyrics.com".
 
-        lyrics = extract_text(html, '<div id="lyrics" class="SCREENONLY" itemprop="description">', self.verbose)
-        if not lyrics and self.verbose:
-            logger.debug('Couldn\'t find lyrics.')
+        :param lyrics: The extracted lyrics (None if they weren't found).
+        :returns: The track's lyrics, or None.
+        """
+        if not lyrics:
+            if self.verbose:
+                logger.debug('Couldn\'t find lyrics.')
             return
         for not_found_str in LyricscomGrabber.LYRICSCOM_NOT_FOUND:
             if not_found_str in lyrics:
@@ -51,6 +70,7 @@ class LyricscomGrabber(Grabber):
             logger.error('Something went wrong when splitting the parts.')
 
     @staticmethod
+    @functools.lru_cache(maxsize=CACHE_SIZE)
     def _encode(string):
         """
         Encoding function specifically for 'Lyrics.com'.
@@ -58,8 +78,7 @@ class LyricscomGrabber(Grabber):
         :param string: The string to encode.
         :return: The encoded string.
         """
-        string = re.sub(r'[^\w\s-]', '', string)
-        string = re.sub(r'\s+', '-', string)
+        string = LyricscomGrabber.WHITESPACE_RE.sub('-', string.translate(LyricscomGrabber.LYRICSCOM_TABLE))
         return encode(string).lower()
 
     def __repr__(self):
@@ -1,9 +1,11 @@
+import functools
 import re
 
 import logbook
 
-from .lyrics_utils import encode, fetch_url, extract_text
+from .lyrics_utils import encode
 from .base import Grabber
+from mp3organizer.normalization import CACHE_SIZE
 
 logger = logbook.Logger('LyricsWikiGrabber')
 
@@ -14,32 +16,52 @@ class LyricswikiGrabber(Grabber):
     """
 
     LYRICSWIKI_URL_PATTERN = 'http://lyrics.wikia.com/{}:{}'
+    ARTIST_URL_PATTERN = 'http://lyrics.wikia.com/{}'
+    LYRICS_START_TAG = '<div class=\'lyricbox\'>'
+    WHITESPACE_RE = re.compile(r'\s+')
+    LYRICSWIKI_TABLE = str.maketrans({'<': 'Less_Than', '>': 'Greater_Than', '#': 'Number_',
+                                      '[': '(', '{': '(', ']': ')', '}': ')'})
 
     @staticmethod
     def get_name():
         return 'Lyrics Wiki'
 
-    def find_lyrics(self, track, artist, album=None):
+    def _get_artist_slugs(self, artist):
         """
-        Searches "Lyrics Wiki" for the lyrics.
+        Creates the artist's possible slugs in "Lyrics Wiki", whose canonical pages capitalize every word.
 
-        :param track: The track's title.
         :param artist: The artist's name.
+        :returns: The artist's possible slugs, the most likely first.
+        """
+        artist_slug = self._encode(artist)
+        canonical_slug = self._encode(' '.join(word[:1].upper() + word[1:] for word in artist.split()))
+        return [artist_slug] if canonical_slug == artist_slug else [artist_slug, canonical_slug]
+
+    def _get_url(self, track, artist_slug, album=None):
+        """
+        Creates the URL of the track's lyrics page in "Lyrics Wiki".
+
+        :param track: The track's title.
+        :param artist_slug: The artist's slug.
         :param album: The album's name.
-        :returns: The track's lyrics, or None.
+        :returns: The lyrics page's URL.
+        """
+        return LyricswikiGrabber.LYRICSWIKI_URL_PATTERN.format(artist_slug, self._encode(track))
+
+    def _parse_lyrics(self, lyrics):
         """
-        url = LyricswikiGrabber.LYRICSWIKI_URL_PATTERN.format(self._encode(artist), self._encode(track))
-        html = fetch_url(url, self.verbose)
-        if not html:
-            return
+        Checks the lyrics extracted from the track's lyrics page in "Lyrics Wiki".
 
-        lyrics = extract_text(html, '<div class=\'lyricbox\'>', self.verbose)
+        :param lyrics: The extracted lyrics (None if they weren't found).
+        :returns: The track's lyrics, or None.
+        """
         if lyrics and 'Unfortunately, we are not licensed' not in lyrics:
             return lyrics
         if self.verbose:
             logger.debug('Couldn\'t find lyrics.')
 
     @staticmethod
+    @functools.lru_cache(maxsize=CACHE_SIZE)
     def _encode(string):
         """
         Encoding function specifically for 'Lyrics Wiki'.
@@ -47,12 +69,7 @@ class LyricswikiGrabber(Grabber):
         :param string: The string to encode.
         :return: The encoded string.
         """
-        string = re.sub(r'\s+', '_', string)
-        string = string.replace('<', 'Less_Than')
-        string = string.replace('>', 'Greater_Than')
-        string = string.replace('#', 'Number_')
-        string = re.sub(r'[\[\{]', '(', string)
-        string = re.sub(r'[\]\}]', ')', string)
+        string = LyricswikiGrabber.WHITESPACE_RE.sub('_', string).translate(LyricswikiGrabber.LYRICSWIKI_TABLE)
         return encode(string)
 
     def __repr__(self):
@@ -1,9 +1,10 @@
-import re
+import functools
 
 import logbook
 
-from .lyrics_utils import encode, fetch_url, extract_text
+from .lyrics_utils import encode
 from .base import Grabber
+from mp3organizer.normalization import CACHE_SIZE, create_alphanumeric_table
 
 logger = logbook.Logger('SongLyricsGrabber')
 
@@ -14,29 +15,49 @@ class SongLyricsGrabber(Grabber):
     """
 
     SONGLYRICS_URL_PATTERN = 'http://www.songlyrics.com/{}/{}-lyrics/'
+    ARTIST_URL_PATTERN = 'http://www.songlyrics.com/{}-lyrics/'
+    # The artists' pages list the tracks of all their albums.
+    INDEX_LINK_PATTERN = r'<a href="(?P<url>(?:https?://www\.songlyrics\.com)?/{}/[^"/]+-lyrics/)"[^>]*>' \
+                         r'(?P<title>[^<]+)</a>'
     SONGLYRICS_NOT_FOUND = ('We do not have the lyrics', 'Sorry, we have no')
+    LYRICS_START_TAG = '<div id="songLyricsDiv-outer">'
+    # Replaces every character which isn't an ASCII letter or digit with a hyphen.
+    SONGLYRICS_TABLE = create_alphanumeric_table('-')
 
     @staticmethod
     def get_name():
         return 'Song Lyrics'
 
-    def find_lyrics(self, track, artist, album=None):
+    def _get_artist_slugs(self, artist):
         """
-        Searches "Song Lyrics" for the lyrics.
+        Creates the artist's possible slugs in "Song Lyrics".
 
-        :param track: The track's title.
         :param artist: The artist's name.
+        :returns: The artist's possible slugs.
+        """
+        return [self._encode(artist)]
+
+    def _get_url(self, track, artist_slug, album=None):
+        """
+        Creates the URL of the track's lyrics page in "Song Lyrics".
+
+        :param track: The track's title.
+        :param artist_slug: The artist's slug.
         :param album: The album's name.
-        :returns: The track's lyrics, or None.
+        :returns: The lyrics page's URL.
         """
-        url = SongLyricsGrabber.SONGLYRICS_URL_PATTERN.format(self._encode(artist), self._encode(track))
-        html = fetch_url(url, self.verbose)
-        if not html:
-            return
+        return SongLyricsGrabber.SONGLYRICS_URL_PATTERN.format(artist_slug, self._encode(track))
+
+    def _parse_lyrics(self, lyrics):
+        """
+        Checks the lyrics extracted from the track's lyrics page in "Song Lyrics".
 
-        lyrics = extract_text(html, '<div id="songLyricsDiv-outer">', self.verbose)
-        if not lyrics and self.verbose:
-            logger.debug('Couldn\'t find lyrics.')
+        :param lyrics: The extracted lyrics (None if they weren't found).
+        :returns: The track's lyrics, or None.
+        """
+        if not lyrics:
+            if self.verbose:
+                logger.debug('Couldn\'t find lyrics.')
             return
         for not_found_str in SongLyricsGrabber.SONGLYRICS_NOT_FOUND:
             if not_found_str in lyrics:
@@ -46,6 +67,7 @@ class SongLyricsGrabber(Grabber):
         return lyrics
 
     @staticmethod
+    @functools.lru_cache(maxsize=CACHE_SIZE)
     def _encode(string):
         """
         Encoding function specifically for "Song Lyrics".
@@ -53,7 +75,7 @@ class SongLyricsGrabber(Grabber):
         :param string: The string to encode.
         :return: The encoded string.
         """
-        string = re.sub('[^a-zA-Z0-9]', '-', string).lower()
+        string = string.translate(SongLyricsGrabber.SONGLYRICS_TABLE)
         if string.endswith('-'):
             string = string[:-1]
         return encode(string)
@@ -0,0 +1,103 @@
+import functools
+import re
+import string
+import unicodedata
+
+# The maximal number of memoized results of every normalization function (enough for a large library's files).
+CACHE_SIZE = 32768
+ASCII_ALPHANUMERIC = frozenset(string.ascii_letters + string.digits)
+# Parts of names which are often missing on one side (bracketed notes like "(Remastered)", and featured artists).
+NOISE_RE = re.compile(r'\([^)]*\)|\[[^\]]*\]|\b(?:feat|ft|featuring)\b.*', re.I)
+
+
+class TranslationTable(dict):
+    """
+    A str.translate table which maps every character by the given function, the first time it's seen.
+    Lets a single translate call replace whole character classes (including every unicode character),
+    without listing all of them in advance.
+    """
+
+    def __init__(self, function, mapping=None):
+        """
+        Initializes the table.
+
+        :param function: Maps a character to its replacement string (or to None, to remove it).
+        :param mapping: The characters whose replacements are known in advance.
+        """
+        super().__init__({ord(char): value for char, value in (mapping or {}).items()})
+        self.function = function
+
+    def __missing__(self, key):
+        """
+        Maps the character, and remembers its replacement.
+
+        :param key: The character's ordinal.
+        :return: The character's replacement.
+        """
+        value = self.function(chr(key))
+        self[key] = value
+        return value
+
+
+def create_alphanumeric_table(replacement):
+    """
+    Creates a translation table keeping only ASCII letters (in lower case) and digits.
+
+    :param replacement: The replacement of every other character (None to remove them).
+    :return: The translation table.
+    """
+    return TranslationTable(lambda char: char.lower() if char in ASCII_ALPHANUMERIC else replacement)
+
+
+# Turns every character which isn't an ASCII letter or digit into a space, and letters to lower case.
+NAME_TABLE = create_alphanumeric_table(' ')
+# Turns every character which isn't a letter or a digit (of any script) into a space.
+KEY_TABLE = TranslationTable(lambda char: char if char.isalnum() else ' ')
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def normalize_name(name):
+    """
+    Normalizes the name by stripping spaces, converting to lower case,
+    and removing non-letter characters (which don't work well with the '\b' option in re).
+
+    :param name: The name (a file's name, a title etc.).
+    :return: The normalized name.
+    """
+    return ' '.join(name.translate(NAME_TABLE).split())
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def normalize_key(name):
+    """
+    Normalizes the name like normalize_name, but keeps the letters and digits of every script (case folded),
+    so names written in other scripts don't collide. ASCII names are normalized just like normalize_name does.
+
+    :param name: The name (an artist's name, a title etc.).
+    :return: The normalized name, to be used as a key.
+    """
+    return ' '.join(unicodedata.normalize('NFKC', name).casefold().translate(KEY_TABLE).split())
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def get_name_tokens(name):
+    """
+    Splits the normalized name into words.
+
+    :param name: The name (a file's name, a title etc.).
+    :return: A tuple of the normalized name's words (a single empty word if there are none).
+    """
+    return tuple(normalize_name(name).split(' '))
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def get_name_trigrams(name):
+    """
+    Splits the normalized name into overlapping character trigrams (for fuzzy matching).
+    Bracketed notes and featured artists are ignored, unless nothing else is left.
+
+    :param name: The name (a file's name, a title etc.).
+    :return: A frozen set of the name's trigrams (words are padded with spaces, so short words have trigrams too).
+    """
+    text = ' {} '.format(normalize_name(NOISE_RE.sub(' ', name)) or normalize_name(name))
+    return frozenset(text[index:index + 3] for index in range(len(text) - 2))
@@ -1,27 +1,59 @@
-import glob
+import copy
+import math
+import multiprocessing
 import os
 import sys
+import time
 from argparse import ArgumentParser
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait, as_completed
 
 import logbook
+from logbook.queues import MultiProcessingHandler, MultiProcessingSubscriber
 
 from mp3organizer.clients.amazon.amazon_client import AmazonClient
 from mp3organizer.clients.gracenote.gracenote_client import GracenoteClient
-from mp3organizer.file_utils import get_artist, get_album, PathException
+from mp3organizer.clients.artwork_store import ArtworkStore
+from mp3organizer.clients.metadata_cache import MetadataCache
+from mp3organizer.file_utils import get_artist, get_album, find_album_paths, scan_library, scan_directory, \
+    get_tag_digest, PathException
 from mp3organizer.lyrics.lyricscom_grabber import LyricscomGrabber
 from mp3organizer.lyrics.lyricswiki_grabber import LyricswikiGrabber
 from mp3organizer.lyrics.azlyrics_grabber import AZLyricsGrabber
 from mp3organizer.lyrics.songlyrics_grabber import SongLyricsGrabber
+from mp3organizer.lyrics.lyrics_cache import LyricsCache
+from mp3organizer.lyrics.grabber_stats import GrabberStats
+from mp3organizer.lyrics.artists_cache import ArtistsCache
 from mp3organizer.editor import FilesEditor
+from mp3organizer.track_matcher import FUZZY_THRESHOLD
+from mp3organizer import http_utils
+from mp3organizer.library_state import LibraryState, FileState
+from mp3organizer.watcher import create_watcher, Debouncer
 
 LOG_FILE_NAME = 'mp3organizer.log'
+LYRICS_CACHE_FILE_NAME = 'lyrics.db'
+METADATA_CACHE_FILE_NAME = 'metadata.db'
+ARTWORK_STORE_DIRECTORY_NAME = 'artwork'
+LIBRARY_STATE_FILE_NAME = 'library.db'
+GRABBER_STATS_FILE_NAME = 'grabbers.db'
+ARTISTS_CACHE_FILE_NAME = 'artists.db'
 # The ordered clients list.
 CLIENTS_LIST = [AmazonClient, GracenoteClient]
 # The ordered grabbers list.
 GRABBERS_LIST = [AZLyricsGrabber, LyricswikiGrabber, LyricscomGrabber, SongLyricsGrabber]
+# The number of albums queued for each pipeline worker.
+PIPELINE_QUEUE_FACTOR = 2
+# The maximal number of albums the preferred client searches for at once, in library batch mode.
+PREFETCH_BATCH_SIZE = 10
+# The maximal time (in seconds) to wait for library changes at once, while watching.
+WATCH_TIMEOUT = 60
 
 logger = logbook.Logger('MP3Organizer')
 
+# The state of a pipeline worker process, created once by its initializer.
+_worker_args = None
+_worker_resources = None
+
 
 def _get_log_handlers(logs_directory_path=None):
     """
@@ -47,103 +79,535 @@ class OrganizerException(Exception):
     pass
 
 
-def organize(args):
+class SharedResources(object):
     """
-    Start working on with the given parameters, after validating them.
+    A POPO class to hold the objects shared by all the albums organized in a single process.
+    Contains the following information:
+    Clients, Lyrics Grabbers, Lyrics Cache, Library State and Grabber Statistics.
+    """
+
+    def __init__(self, clients, grabbers, lyrics_cache=None, library_state=None, grabber_stats=None):
+        """
+        Initializes the shared resources object.
+
+        :param clients: The ordered clients list.
+        :param grabbers: The ordered lyrics grabbers list.
+        :param lyrics_cache: The lyrics cache (None if not used).
+        :param library_state: The record of the organized files (None if not used).
+        :param grabber_stats: The lyrics grabbers' statistics (None if not used).
+        """
+        self.clients = clients
+        self.grabbers = grabbers
+        self.lyrics_cache = lyrics_cache
+        self.library_state = library_state
+        self.grabber_stats = grabber_stats
+
+
+def _validate_arguments(args):
+    """
+    Validates the arguments shared by all the running modes.
 
     :param args: The parsed user parameters.
-    :return: The failed tracks list (empty if succeeded).
     """
-    # Validate and fix arguments.
     if args.client and not args.client.lower() in \
             [c.get_name().lower() for c in CLIENTS_LIST]:
         raise OrganizerException('Invalid client')
     if args.grabber and not args.grabber.lower() in \
             [g.get_name().lower() for g in GRABBERS_LIST]:
         raise OrganizerException('Invalid lyrics website')
-    if not args.path or not os.path.exists(args.path):
-        raise PathException('Invalid path')
     if args.image_path and not os.path.exists(args.image_path):
         raise PathException('Invalid images path')
+
+
+def organize(args):
+    """
+    Start working on with the given parameters, after validating them.
+
+    :param args: The parsed user parameters.
+    :return: The failed tracks list (empty if succeeded).
+    """
+    # Validate and fix arguments.
+    _validate_arguments(args)
+    if not args.path or not os.path.exists(args.path):
+        raise PathException('Invalid path')
     if args.path.endswith(os.path.sep):
         args.path = os.path.dirname(args.path)
     args.album = get_album(args.path, args.album)
     args.artist = get_artist(args.path, args.artist)
+    _, failed_list = _organize_album(args)
+    if failed_list is not None and args.verbose:
+        logger.info('Finished!')
+    return failed_list
+
+
+def organize_library(args):
+    """
+    Organizes every album in the library, using a single set of shared resources (clients, grabbers etc.).
+    The library path must be in the format '...\\<Library>', holding '<Artist>\\<Album>' directories.
+    When more than one worker is requested, the albums are spread over a pool of processes.
+    When scanning, only the albums which are new or changed since they were last organized are organized.
+
+    :param args: The parsed user parameters.
+    :return: A dictionary of the album paths and their failed tracks lists (None if the album wasn't found).
+    """
+    _validate_arguments(args)
+    if not args.library or not os.path.isdir(args.library):
+        raise PathException('Invalid library path')
+    if args.workers < 1:
+        raise OrganizerException('Invalid number of workers')
+    if args.workers > 1 and args.prompt:
+        raise OrganizerException('Multiple workers can only run in automatic mode')
+    if args.scan:
+        if not args.cache_directory:
+            raise OrganizerException('Scanning the library requires a cache directory')
+        if not os.path.exists(args.cache_directory):
+            os.makedirs(args.cache_directory)
+        library_state = LibraryState(os.path.join(args.cache_directory, LIBRARY_STATE_FILE_NAME))
+        album_paths = library_state.find_changed_albums(scan_library(args.library))
+        library_state.close()
+        if args.verbose:
+            logger.info('Found {} new or changed albums in library "{}".'.format(len(album_paths), args.library))
+    else:
+        album_paths = find_album_paths(args.library)
+        if args.verbose:
+            logger.info('Found {} albums in library "{}".'.format(len(album_paths), args.library))
+    if args.workers > 1:
+        albums_results = _organize_albums_parallel(args, album_paths)
+    else:
+        albums_results = _organize_albums(args, album_paths)
+    library_results = OrderedDict((album_path, None) for album_path in album_paths)
+    organized_albums = 0
+    organized_tracks = 0
+    failed_tracks = 0
+    start_time = time.time()
+    for album_path, album, failed_list in albums_results:
+        library_results[album_path] = failed_list
+        if album:
+            organized_albums += 1
+            organized_tracks += len(album.tracks_list)
+            failed_tracks += len(failed_list)
+    elapsed_time = max(time.time() - start_time, 1e-6)
+    if args.verbose:
+        for album_path, failed_list in library_results.items():
+            if failed_list is None:
+                logger.info('{}: Album wasn\'t organized.'.format(album_path))
+            elif failed_list:
+                logger.info('{}: {} failed tracks: {}'.format(album_path, len(failed_list), failed_list))
+            else:
+                logger.info('{}: Succeeded.'.format(album_path))
+        logger.info('Organized {} of {} albums ({} tracks, {} failed) in {:.1f} seconds '
+                    '({:.2f} albums/s, {:.2f} tracks/s).'.format(
+                        organized_albums, len(album_paths), organized_tracks, failed_tracks, elapsed_time,
+                        organized_albums / elapsed_time, organized_tracks / elapsed_time))
+    return library_results
+
+
+def watch_library(args, watcher=None):
+    """
+    Watches the library, and organizes every album once it's added or changed (and stopped changing for a while).
+    Runs until interrupted.
+
+    :param args: The parsed user parameters.
+    :param watcher: The library watcher to use. Created from the arguments if None.
+    """
+    _validate_arguments(args)
+    if not args.library or not os.path.isdir(args.library):
+        raise PathException('Invalid library path')
+    if args.workers < 1:
+        raise OrganizerException('Invalid number of workers')
+    if args.prompt:
+        raise OrganizerException('The library can only be watched in automatic mode')
+    if watcher is None:
+        watcher = create_watcher(args.library)
+    debouncer = Debouncer()
+    # The resources (or the worker processes) are created once, and used for all the changes.
+    resources = _get_shared_resources(args) if args.workers == 1 else None
+    pool = WorkersPool(args) if args.workers > 1 else None
+    # The files of the organized albums, right after they were organized (so their own changes are ignored).
+    organized_albums = {}
+    if args.verbose:
+        logger.info('Watching library "{}".'.format(args.library))
+    try:
+        while True:
+            timeout = debouncer.get_timeout()
+            debouncer.add(watcher.get_changes(WATCH_TIMEOUT if timeout is None else timeout))
+            album_paths = []
+            for directory in debouncer.pop_ready():
+                # Albums are always nested inside an artist directory.
+                if len(os.path.relpath(directory, args.library).split(os.path.sep)) < 2:
+                    continue
+                files = scan_directory(directory)
+                if files and files != organized_albums.get(directory):
+                    album_paths.append(directory)
+            if not album_paths:
+                continue
+            if pool is not None:
+                albums_results = pool.organize(album_paths)
+            else:
+                albums_results = ((album_path,) + _organize_library_album(args, album_path, resources)
+                                  for album_path in album_paths)
+            for album_path, album, failed_list in albums_results:
+                organized_albums[album_path] = scan_directory(album_path)
+                if args.verbose:
+                    if album is None:
+                        logger.info('{}: Album wasn\'t organized.'.format(album_path))
+                    elif failed_list:
+                        logger.info('{}: {} failed tracks: {}'.format(album_path, len(failed_list), failed_list))
+                    else:
+                        logger.info('{}: Succeeded.'.format(album_path))
+    except KeyboardInterrupt:
+        if args.verbose:
+            logger.info('Stopped watching library "{}".'.format(args.library))
+    finally:
+        watcher.close()
+        if pool is not None:
+            pool.close()
+
+
+def _organize_albums(args, album_paths):
+    """
+    Organizes the given albums one after another, in the current process.
+
+    :param args: The running parameters.
+    :param album_paths: The paths of the albums to organize.
+    :return: Yields the album path, the album data and the failed tracks list of each album.
+    """
+    resources = _get_shared_resources(args)
+    for batch in _split_batches(album_paths):
+        yield from _organize_albums_batch(args, batch, resources)
+
+
+def _organize_albums_parallel(args, album_paths):
+    """
+    Organizes the given albums using a pool of worker processes, which is closed once they're all organized.
+
+    :param args: The running parameters.
+    :param album_paths: The paths of the albums to organize.
+    :return: Yields the album path, the album data and the failed tracks list of each album (by batches' completion
+    order).
+    """
+    pool = WorkersPool(args)
+    try:
+        yield from pool.organize(album_paths)
+    finally:
+        pool.close()
+
+
+class WorkersPool(object):
+    """
+    A pool of worker processes which organize albums, and whose log records are dispatched to the handlers
+    of the current process. The workers (and their shared resources) are kept until the pool is closed,
+    so they can organize several groups of albums (like the library's changes, while watching it).
+    """
+
+    def __init__(self, args):
+        """
+        Starts the worker processes, and the dispatching of their log records.
+
+        :param args: The running parameters.
+        """
+        self.args = args
+        self._log_queue = multiprocessing.Queue(-1)
+        self._subscriber = MultiProcessingSubscriber(self._log_queue)
+        self._controller = self._subscriber.dispatch_in_background()
+        self._executor = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                             initargs=(args, self._log_queue))
+
+    def organize(self, album_paths):
+        """
+        Organizes the given albums. Only a bounded number of albums is queued at any time.
+
+        :param album_paths: The paths of the albums to organize.
+        :return: Yields the album path, the album data and the failed tracks list of each album (by batches'
+        completion order).
+        """
+        max_pending = self.args.workers * PIPELINE_QUEUE_FACTOR
+        pending = set()
+        for batch in _split_batches(album_paths, self.args.workers):
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+            pending.add(self._executor.submit(_organize_albums_job, batch))
+        for future in as_completed(pending):
+            yield from future.result()
+
+    def close(self):
+        """
+        Waits for the workers to finish, and stops them.
+        """
+        try:
+            self._executor.shutdown()
+        finally:
+            self._controller.stop()
+            # Dispatch the records which arrived after the background thread was stopped.
+            while self._subscriber.dispatch_once(timeout=0):
+                pass
+
+
+def _init_worker(args, log_queue):
+    """
+    Initializes a pipeline worker process.
+    Creates the worker's shared resources, and sends all of its log records to the main process.
+
+    :param args: The running parameters.
+    :param log_queue: The queue to send log records through.
+    """
+    global _worker_args, _worker_resources
+    MultiProcessingHandler(log_queue).push_application()
+    _worker_args = args
+    _worker_resources = _get_shared_resources(args)
+
+
+def _organize_albums_job(album_paths):
+    """
+    Organizes a batch of albums inside a pipeline worker process.
+
+    :param album_paths: The albums' paths.
+    :return: A list of the album path, the album data and the failed tracks list of each album.
+    """
+    return list(_organize_albums_batch(_worker_args, album_paths, _worker_resources))
+
+
+def _split_batches(album_paths, workers=1):
+    """
+    Splits the albums into batches, which are searched for together.
+    The batches are small enough for all the workers to get some of the albums.
+
+    :param album_paths: The albums' paths.
+    :param workers: The number of workers the batches are spread over.
+    :return: Yields lists of up to PREFETCH_BATCH_SIZE album paths.
+    """
+    batch_size = max(min(PREFETCH_BATCH_SIZE, math.ceil(len(album_paths) / workers)), 1)
+    for index in range(0, len(album_paths), batch_size):
+        yield album_paths[index:index + batch_size]
+
+
+def _organize_albums_batch(args, album_paths, resources):
+    """
+    Organizes a batch of albums, after searching the preferred client for all of them at once.
+    The prefetched results which weren't used are discarded once the batch is organized.
+
+    :param args: The running parameters.
+    :param album_paths: The albums' paths.
+    :param resources: The shared resources to use.
+    :return: Yields the album path, the album data and the failed tracks list of each album.
+    """
+    _prefetch_albums(args, album_paths, resources.clients)
+    try:
+        for album_path in album_paths:
+            album, failed_list = _organize_library_album(args, album_path, resources)
+            yield album_path, album, failed_list
+    finally:
+        for client in resources.clients:
+            client.clear_prefetched_albums()
+
+
+def _prefetch_albums(args, album_paths, clients):
+    """
+    Searches the preferred client for the albums ahead of time (if it supports batched searches).
+    The other clients are only used when the preferred one fails (or when the albums are cached),
+    so searching them ahead of time would mostly be wasted.
+
+    :param args: The running parameters.
+    :param album_paths: The albums' paths.
+    :param clients: The ordered clients list.
+    """
+    if not clients or not clients[0].BATCHED_SEARCHES:
+        return
+    client = clients[0]
+    try:
+        if not client.is_connected():
+            client.connect()
+        client.prefetch_albums([(get_album(album_path), get_artist(album_path)) for album_path in album_paths])
+    except Exception as ex:
+        # The albums will be searched one by one.
+        if args.verbose:
+            logger.debug('Failed prefetching albums from {}: {}'.format(client, ex))
+
+
+def _organize_library_album(args, album_path, resources):
+    """
+    Organizes a single album from the library, figuring out its name and artist from its path.
+
+    :param args: The running parameters.
+    :param album_path: The album's path.
+    :param resources: The shared resources to use.
+    :return: The album data (None if not found) and its failed tracks list (None if not found).
+    """
+    album_args = copy.copy(args)
+    album_args.path = album_path
+    album_args.album = get_album(album_path)
+    album_args.artist = get_artist(album_path)
+    if args.verbose:
+        logger.info('Organizing album "{} - {}".'.format(album_args.artist, album_args.album))
+    try:
+        return _organize_album(album_args, resources)
+    except Exception as ex:
+        logger.error('Failed organizing "{}": {}'.format(album_path, ex))
+        return None, None
+
+
+def _organize_album(args, resources=None):
+    """
+    Organizes a single album, whose path, name and artist were already validated.
+
+    :param args: The running parameters.
+    :param resources: The shared resources to use. Created from the arguments if None.
+    :return: The album data (None if not found) and its failed tracks list (None if not found).
+    """
+    if resources is None:
+        resources = _get_shared_resources(args)
     # Get tracks list from client.
-    album = get_album_data(args)
+    album = get_album_data(args, resources.clients)
     if not album:
         if args.verbose:
             logger.info('No album was found. Exiting...')
-        return
+        return None, None
     # Edit the files.
-    failed_list = edit_files(args, album)
+    failed_list = edit_files(args, album, resources)
     if len(failed_list) > 0 and args.verbose:
         logger.info('Failed tracks are: {}'.format(failed_list))
-    if args.verbose:
-        logger.info('Finished!')
-    return failed_list
+    return album, failed_list
 
 
-def edit_files(args, album):
+def _get_shared_resources(args):
     """
-    Edits all the files according to the album data.
+    Creates the resources shared by all the albums organized in the current process.
 
     :param args: The running parameters.
-    :param album: The album data, received earlier from the client.
-    :return: The failed tracks list (empty if succeeded).
+    :return: The shared resources.
     """
+    # The processes share the hosts' requests rates.
+    http_utils.configure(args.pool_size, args.timeout, 1.0 / args.workers)
+    lyrics_cache = None
+    metadata_cache = None
+    artwork_store = None
+    library_state = None
+    grabber_stats = None
+    artists_cache = None
+    if args.cache_directory:
+        if not os.path.exists(args.cache_directory):
+            os.makedirs(args.cache_directory)
+        lyrics_cache = LyricsCache(os.path.join(args.cache_directory, LYRICS_CACHE_FILE_NAME))
+        metadata_cache = MetadataCache(os.path.join(args.cache_directory, METADATA_CACHE_FILE_NAME))
+        artwork_store = ArtworkStore(os.path.join(args.cache_directory, ARTWORK_STORE_DIRECTORY_NAME))
+        library_state = LibraryState(os.path.join(args.cache_directory, LIBRARY_STATE_FILE_NAME))
+        grabber_stats = GrabberStats(os.path.join(args.cache_directory, GRABBER_STATS_FILE_NAME))
+        artists_cache = ArtistsCache(os.path.join(args.cache_directory, ARTISTS_CACHE_FILE_NAME))
+    elif args.lyrics_order == FilesEditor.ADAPTIVE_ORDER:
+        # The statistics are only kept for the current run.
+        grabber_stats = GrabberStats(':memory:')
+    return SharedResources(_get_clients(args, metadata_cache, artwork_store), _get_grabbers(args, artists_cache),
+                           lyrics_cache, library_state, grabber_stats)
+
+
+def _get_clients(args, metadata_cache=None, artwork_store=None):
+    """
+    Creates the clients list, ordered by the user's preference.
+
+    :param args: The running parameters.
+    :param metadata_cache: The albums cache the clients should use.
+    :param artwork_store: The artworks store the clients should use.
+    :return: The ordered list of clients.
+    """
+    clients = list(CLIENTS_LIST)
+    # If user supplied a specific client, put it first on the list.
+    if args.client:
+        for index, client_class in enumerate(clients):
+            if client_class.get_name().lower() == args.client.lower():
+                clients.insert(0, clients.pop(index))
+                break
+    return [client_class(artwork_folder=args.image_path, verbose=args.verbose, metadata_cache=metadata_cache,
+                         artwork_store=artwork_store) for client_class in clients]
+
+
+def _get_grabbers(args, artists_cache=None):
+    """
+    Creates the lyrics grabbers list, ordered by the user's preference.
+
+    :param args: The running parameters.
+    :param artists_cache: The artists' slugs cache the grabbers should use.
+    :return: The ordered list of lyrics grabbers.
+    """
+    grabbers = list(GRABBERS_LIST)
     # If user supplied a specific lyrics website, put it first on the list.
-    grabbers = GRABBERS_LIST
     if args.grabber:
         for index, grabber_class in enumerate(grabbers):
             if grabber_class.get_name().lower() == args.grabber.lower():
-                grabber_index = index
-                grabbers.insert(0, grabbers.pop(grabber_index))
+                grabbers.insert(0, grabbers.pop(index))
                 break
+    return [grabber_class(verbose=args.verbose, artists_cache=artists_cache) for grabber_class in grabbers]
+
 
-    editor = FilesEditor(args.path, album, grabbers, args.prompt,
-                         args.web, args.verbose)
+def edit_files(args, album, resources=None):
+    """
+    Edits all the files according to the album data.
+
+    :param args: The running parameters.
+    :param album: The album data, received earlier from the client.
+    :param resources: The shared resources to use. Created from the arguments if None.
+    :return: The failed tracks list (empty if succeeded).
+    """
+    if resources is None:
+        resources = _get_shared_resources(args)
+    editor = FilesEditor(args.path, album, resources.grabbers, args.prompt,
+                         args.web, args.verbose, args.lyrics_threads, args.lyrics_strategy,
+                         resources.lyrics_cache, args.incremental, args.fuzzy_threshold,
+                         resources.grabber_stats, args.lyrics_order)
     failed_list = editor.edit_tracks()
-    # Check for missed files.
-    if args.verbose:
-        logger.debug('Checking for missed files...')
-    mp3_files = glob.glob(os.path.join(args.path, '*.mp3'))
-    tracks = map(str, album.tracks_list)
-    for mp3_file in mp3_files:
-        mp3_name = os.path.splitext(os.path.basename(mp3_file))[0]
-        if mp3_name not in tracks:
-            failed_list.append(mp3_name)
-            if args.verbose:
-                logger.info('File "{}" was not edited.'.format(mp3_file))
+    if resources.grabber_stats:
+        resources.grabber_stats.flush()
+    # Report the files no track was matched to.
+    for mp3_file in editor.unmatched_files:
+        failed_list.append(os.path.splitext(os.path.basename(mp3_file))[0])
+        if args.verbose:
+            logger.info('File "{}" was not edited.'.format(mp3_file))
+    if resources.library_state:
+        _record_album(args.path, album, editor, resources.library_state)
     return failed_list
 
 
-def get_album_data(args):
+def _record_album(album_path, album, editor, library_state):
+    """
+    Records the state of all the album's files, after they were edited.
+
+    :param album_path: The album's path.
+    :param album: The album data.
+    :param editor: The editor which edited the album's files.
+    :param library_state: The record of the organized files.
+    """
+    lyrics_sources = {results.filename: results.lyrics_source for results in editor.results if results.filename}
+    files_states = []
+    for filename in editor.index.files:
+        stat = os.stat(filename)
+        files_states.append(FileState(filename, stat.st_size, stat.st_mtime_ns, get_tag_digest(filename),
+                                      album.source, lyrics_sources.get(filename)))
+    library_state.set_album(album_path, files_states)
+
+
+def get_album_data(args, clients=None):
     """
     Retrieves the album data using the available clients.
     Will try each client by their order until succeeded.
 
     :param args: The running parameters.
+    :param clients: The ordered clients list to use. Created from the arguments if None.
     :returns: The album data.
     """
-    clients = CLIENTS_LIST
-    # If user supplied a specific client, put it first on the list.
-    if args.client:
-        for index, client_class in enumerate(clients):
-            if client_class.get_name().lower() == args.client.lower():
-                client_index = index
-                clients.insert(0, clients.pop(client_index))
-                break
+    if clients is None:
+        clients = _get_clients(args)
     # Try every client in the list, until succeeded.
-    for client_class in clients:
-        client = client_class(artwork_folder=args.image_path, verbose=args.verbose)
+    for client in clients:
         if args.verbose:
             logger.debug('Checking {} for album data.'.format(client))
         try:
-            client.connect()
+            if not client.is_connected():
+                client.connect()
             result = client.find_album(args.album, args.artist,
                                        prompt=args.prompt, web=args.web)
             if result:
+                result.source = client.get_name()
                 # Add genre received from user and return the album data.
                 if args.genre:
                     result.genre = args.genre
@@ -161,6 +625,7 @@ def get_arguments():
     Gets arguments from the user.
 
     path - The path of the album to organize.
+    library - The path of a library of albums to organize (conflicts with path).
     clients menu - Prints the available clients menu (conflicts with path).
     lyrics menu - Prints the available lyrics website menu (conflicts with path).
     album - The album's name (makes the search for lyrics and info easier).
@@ -172,10 +637,16 @@ def get_arguments():
     quiet - If true, no log messages will be displayed on the screen.
     automatic - If true, user will not be prompted to approve album correctness.
     web - If true, a new tab in the browser will pop up with the album's information.
+    workers - The number of processes to organize the library with.
+    lyrics threads - The number of tracks to look for lyrics for at the same time.
+    lyrics strategy - Whether to try the lyrics websites one after another, or all at once.
+    cache directory - The directory to keep the caches in.
     """
     parser = ArgumentParser(description='Organize an MP3 files directory')
     required_group = parser.add_mutually_exclusive_group(required=True)
     required_group.add_argument('-p', '--path', dest='path', help='The album\'s path')
+    required_group.add_argument('-r', '--library', dest='library',
+                                help='The library\'s path, holding "<Artist>/<Album>" directories')
     required_group.add_argument('-cm', '--clients-menu', action='store_true', dest='clients_menu',
                                 default=False, help='The available clients menu')
     required_group.add_argument('-lm', '--lyrics-menu', action='store_true', dest='lyrics_menu',
@@ -200,6 +671,35 @@ def get_arguments():
                         help='Don\'t open a new browser tab with the album\'s information')
     parser.add_argument('-d', '--logs-directory', dest='logs_directory',
                         help='The directory to save log files in.')
+    parser.add_argument('-j', '--workers', dest='workers', type=int, default=1,
+                        help='The number of processes to organize the library with (requires --automatic)')
+    parser.add_argument('-n', '--lyrics-threads', dest='lyrics_threads', type=int,
+                        default=FilesEditor.LYRICS_THREADS,
+                        help='The number of tracks to look for lyrics for at the same time')
+    parser.add_argument('-s', '--lyrics-strategy', dest='lyrics_strategy', choices=FilesEditor.LYRICS_STRATEGIES,
+                        default=FilesEditor.SEQUENTIAL_STRATEGY,
+                        help='Whether to try the lyrics websites one after another, or all at once')
+    parser.add_argument('-o', '--lyrics-order', dest='lyrics_order', choices=FilesEditor.LYRICS_ORDERS,
+                        default=FilesEditor.FIXED_ORDER,
+                        help='Whether to try the lyrics websites in the given order, or by their past hit rates and '
+                             'response times (kept in the cache directory, if given)')
+    parser.add_argument('-x', '--cache-directory', dest='cache_directory',
+                        help='The directory to keep the caches in (no caching if not given)')
+    parser.add_argument('-u', '--incremental', action='store_true', dest='incremental', default=False,
+                        help='Skip the tracks whose files are already up to date')
+    parser.add_argument('-f', '--fuzzy-threshold', dest='fuzzy_threshold', type=float, default=FUZZY_THRESHOLD,
+                        help='The minimal similarity (0 to 1) of a file\'s name to a track\'s title for fuzzy '
+                             'matches (default: {}, above 1 disables them)'.format(FUZZY_THRESHOLD))
+    parser.add_argument('-m', '--scan', action='store_true', dest='scan', default=False,
+                        help='Organize only the library\'s new or changed albums (requires a cache directory)')
+    parser.add_argument('-e', '--watch', action='store_true', dest='watch', default=False,
+                        help='Keep watching the library, and organize albums as they are added')
+    parser.add_argument('-k', '--pool-size', dest='pool_size', type=int,
+                        help='The number of idle connections to keep open to every host (default: {})'.format(
+                            http_utils.DEFAULT_POOL_SIZE))
+    parser.add_argument('-z', '--timeout', dest='timeout', type=int,
+                        help='The timeout (in seconds) for web requests (default: {})'.format(
+                            http_utils.DEFAULT_TIMEOUT))
     return parser.parse_args()
 
 
@@ -208,6 +708,7 @@ def main():
     Organizes the MP3 album in the given path.
     Should be called with the album's path as an argument.
     Path must be in the format '...\<Artist Name>\<Album Name>'
+    When called with a library path instead, organizes every album in it (or keeps watching it for new albums).
     """
     # Get arguments from the user.
     args = get_arguments()
@@ -228,6 +729,10 @@ def main():
               'or without one to use default order.')
         return
     with logbook.NestedSetup(_get_log_handlers(args.logs_directory)).applicationbound():
+        if args.library and args.watch:
+            return watch_library(args)
+        if args.library:
+            return organize_library(args)
         return organize(args)
 
 
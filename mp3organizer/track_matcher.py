@@ -0,0 +1,199 @@
+import math
+
+from .normalization import get_name_tokens
+
+# The minimal share of a track's title (weighted by the rarity of its words) a file's name must hold,
+# when it doesn't hold the whole title but starts with the track's number.
+MIN_TITLE_COVERAGE = 0.5
+# The bonus of a file holding the whole title, as whole words one after another.
+EXACT_TITLE_BONUS = 0.5
+# The bonus of a file whose name starts with the track's number.
+NUMBER_BONUS = 0.5
+# The bonus of a file as long as the track (shrinking to nothing when their lengths are DURATION_TOLERANCE apart).
+DURATION_BONUS = 0.25
+# The difference (in seconds) between a file's length and a track's length, above which the file gets no bonus.
+DURATION_TOLERANCE = 10
+# The penalty of every word in a file's name which isn't a part of the title (so shorter names win ties).
+EXTRA_TOKEN_PENALTY = 0.01
+# The minimal similarity (by shared character trigrams) of a file's name to a track's title, for fuzzy matches.
+FUZZY_THRESHOLD = 0.6
+# The weight of the similarity of fuzzy matches (so they never beat a match holding the title's words).
+FUZZY_WEIGHT = 0.5
+
+
+def match_tracks(tracks_list, index, fuzzy_threshold=FUZZY_THRESHOLD):
+    """
+    Matches the album's tracks to the files in the album's directory.
+    Scores only the pairs of tracks and files sharing words (by their titles' coverage, whole titles, track numbers
+    and lengths) or similar enough names (by their shared character trigrams), and finds the best matching of all
+    the tracks together (so a file is never given to one track when another track fits it better).
+
+    :param tracks_list: The album's tracks.
+    :param index: The album directory's files index.
+    :param fuzzy_threshold: The minimal similarity (between 0 and 1) of fuzzy matches (None disables them).
+    :return: The matched file paths, by the tracks' positions in the list.
+    """
+    scores = [_score_files(track, index, fuzzy_threshold) for track in tracks_list]
+    matches = {}
+    for track_positions, file_paths in _get_components(scores):
+        matrix = [[scores[position].get(file_path, 0) for file_path in file_paths] for position in track_positions]
+        for row, column in _solve_assignment(matrix):
+            if file_paths[column] in scores[track_positions[row]]:
+                matches[track_positions[row]] = file_paths[column]
+    return matches
+
+
+def _score_files(track, index, fuzzy_threshold=None):
+    """
+    Scores the files which might hold the given track.
+
+    :param track: The track's data.
+    :param index: The album directory's files index.
+    :param fuzzy_threshold: The minimal similarity of fuzzy matches (None disables them).
+    :return: The scores (higher is better) of the possible files, by their paths.
+    """
+    title_tokens = get_name_tokens(track.title)
+    if title_tokens == ('',):
+        return {}
+    files_count = len(index.files)
+    # Rare words say more about a file than common ones (like 'the' or 'live').
+    weights = {token: math.log((files_count + 1) / (len(index.get_files(token)) + 1)) + 1 for token in title_tokens}
+    total_weight = sum(weights[token] for token in title_tokens)
+    number = int(track.number) if track.number.isdigit() else None
+    candidates = set()
+    for token in weights:
+        candidates.update(index.get_files(token))
+    scores = {}
+    for file_path in candidates:
+        file_tokens = index.get_tokens(file_path)
+        file_token_set = set(file_tokens)
+        coverage = sum(weights[token] for token in title_tokens if token in file_token_set) / total_weight
+        exact_title = index.contains(file_path, title_tokens)
+        number_prefix = number is not None and file_tokens[0].isdigit() and int(file_tokens[0]) == number
+        # Partial titles are only trusted along with the track's number.
+        if not exact_title and not (number_prefix and coverage >= MIN_TITLE_COVERAGE):
+            continue
+        score = coverage
+        extra_tokens = len(file_token_set.difference(weights))
+        if exact_title:
+            score += EXACT_TITLE_BONUS
+        if number_prefix:
+            score += NUMBER_BONUS
+            extra_tokens -= 1
+        score += _get_duration_bonus(track, index, file_path)
+        scores[file_path] = score - EXTRA_TOKEN_PENALTY * max(extra_tokens, 0)
+    if fuzzy_threshold is not None:
+        # Typos and different notes keep the title's words apart, but most of its trigrams are still there.
+        for file_path, similarity in index.find_similar(track.title, fuzzy_threshold).items():
+            if file_path in scores:
+                continue
+            file_tokens = index.get_tokens(file_path)
+            if not file_tokens[0].isdigit():
+                scores[file_path] = FUZZY_WEIGHT * similarity + _get_duration_bonus(track, index, file_path)
+            elif number is not None and int(file_tokens[0]) == number:
+                scores[file_path] = FUZZY_WEIGHT * similarity + NUMBER_BONUS + \
+                    _get_duration_bonus(track, index, file_path)
+            # Otherwise, the file holds another track's number.
+    return scores
+
+
+def _get_duration_bonus(track, index, file_path):
+    """
+    Scores the file by how close its length is to the track's length (telling apart files with similar names,
+    like a live version and a studio version of the same track).
+
+    :param track: The track's data.
+    :param index: The album directory's files index.
+    :param file_path: The file's path.
+    :return: The file's bonus (nothing if either length is unknown).
+    """
+    # Tracks which were cached before their lengths were kept don't have them.
+    duration = getattr(track, 'duration', None)
+    if not duration:
+        return 0
+    file_duration = index.get_duration(file_path)
+    if file_duration is None:
+        return 0
+    return DURATION_BONUS * max(1 - abs(file_duration - duration) / DURATION_TOLERANCE, 0)
+
+
+def _get_components(scores):
+    """
+    Splits the scored pairs into groups of tracks and files which don't compete with other groups.
+
+    :param scores: The files' scores of every track.
+    :return: The connected components, as pairs of track positions and file paths lists.
+    """
+    parents = {}
+
+    def find(node):
+        while parents[node] != node:
+            parents[node] = parents[parents[node]]
+            node = parents[node]
+        return node
+
+    for position, track_scores in enumerate(scores):
+        parents.setdefault(position, position)
+        for file_path in track_scores:
+            parents.setdefault(file_path, file_path)
+            parents[find(file_path)] = find(position)
+    components = {}
+    for position, track_scores in enumerate(scores):
+        if track_scores:
+            components.setdefault(find(position), ([], set()))[0].append(position)
+            components[find(position)][1].update(track_scores)
+    return [(track_positions, sorted(file_paths)) for track_positions, file_paths in components.values()]
+
+
+def _solve_assignment(matrix):
+    """
+    Finds the assignment of rows to columns with the maximal total score (the Hungarian algorithm).
+
+    :param matrix: The scores matrix (a list of rows).
+    :return: The assigned (row, column) pairs.
+    """
+    rows = len(matrix)
+    columns = len(matrix[0])
+    if rows > columns:
+        transposed = [[matrix[row][column] for row in range(rows)] for column in range(columns)]
+        return [(row, column) for column, row in _solve_assignment(transposed)]
+    # Minimize the negative scores, using 1-based potentials (row 0 and column 0 are dummies).
+    row_potentials = [0] * (rows + 1)
+    column_potentials = [0] * (columns + 1)
+    column_rows = [0] * (columns + 1)
+    previous_columns = [0] * (columns + 1)
+    for row in range(1, rows + 1):
+        column_rows[0] = row
+        current_column = 0
+        min_values = [math.inf] * (columns + 1)
+        used = [False] * (columns + 1)
+        while True:
+            used[current_column] = True
+            current_row = column_rows[current_column]
+            delta = math.inf
+            next_column = 0
+            row_scores = matrix[current_row - 1]
+            for column in range(1, columns + 1):
+                if not used[column]:
+                    value = -row_scores[column - 1] - row_potentials[current_row] - column_potentials[column]
+                    if value < min_values[column]:
+                        min_values[column] = value
+                        previous_columns[column] = current_column
+                    if min_values[column] < delta:
+                        delta = min_values[column]
+                        next_column = column
+            for column in range(columns + 1):
+                if used[column]:
+                    row_potentials[column_rows[column]] += delta
+                    column_potentials[column] -= delta
+                else:
+                    min_values[column] -= delta
+            current_column = next_column
+            if column_rows[current_column] == 0:
+                break
+        # Flip the augmenting path.
+        while current_column:
+            previous_column = previous_columns[current_column]
+            column_rows[current_column] = column_rows[previous_column]
+            current_column = previous_column
+    return [(column_rows[column] - 1, column - 1) for column in range(1, columns + 1) if column_rows[column]]
@@ -0,0 +1,260 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+import logbook
+
+from .file_utils import scan_library
+
+logger = logbook.Logger('MP3OrganizerWatcher')
+
+# The time (in seconds) an album directory must stay unchanged before it's considered complete.
+DEBOUNCE_PERIOD = 5.0
+# The time (in seconds) between the polling watcher's scans.
+POLLING_INTERVAL = 2.0
+
+
+class WatcherException(Exception):
+    """
+    Raised when the library can't be watched.
+    """
+    pass
+
+
+class LibraryWatcher(object):
+    """
+    Watches the library for changes.
+    """
+
+    def __init__(self, library_path, extension='.mp3'):
+        """
+        Initializes the watcher.
+
+        :param library_path: The library's root path.
+        :param extension: The extension of the tracks' files.
+        """
+        self.library_path = library_path
+        self.extension = extension
+
+    def get_changes(self, timeout):
+        """
+        Waits for changes in the library.
+
+        :param timeout: The maximal time (in seconds) to wait for.
+        :return: The set of directories which were changed (empty if nothing changed in time).
+        """
+        raise NotImplementedError('Watcher didn\'t implement this method.')
+
+    def close(self):
+        """
+        Stops watching the library.
+        """
+        pass
+
+
+class InotifyWatcher(LibraryWatcher):
+    """
+    Watches the library using the Linux inotify API (called through ctypes).
+    Every directory in the library is watched, and new directories are watched as soon as they're created.
+    """
+
+    IN_MODIFY = 0x2
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_ISDIR = 0x40000000
+    WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    EVENT_HEADER = struct.Struct('iIII')
+    READ_SIZE = 64 * 1024
+
+    def __init__(self, library_path, extension='.mp3'):
+        """
+        Initializes inotify and watches all the directories in the library.
+
+        :param library_path: The library's root path.
+        :param extension: The extension of the tracks' files.
+        :raises: WatcherException if inotify isn't available.
+        """
+        super().__init__(library_path, extension)
+        if not sys.platform.startswith('linux'):
+            raise WatcherException('inotify is only available on Linux')
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise WatcherException('inotify_init1 failed: {}'.format(os.strerror(ctypes.get_errno())))
+        # The watched directories, by their watch descriptors.
+        self._directories = {}
+        self._watch_tree(library_path)
+
+    def _watch_tree(self, path):
+        """
+        Watches the directory and all the directories inside it.
+
+        :param path: The directory's path.
+        :return: The set of watched directories.
+        """
+        watched_directories = set()
+        directories = [path]
+        while directories:
+            directory = directories.pop()
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), InotifyWatcher.WATCH_MASK)
+            if wd < 0:
+                # The directory might have been removed already.
+                logger.debug('Couldn\'t watch "{}": {}'.format(directory, os.strerror(ctypes.get_errno())))
+                continue
+            self._directories[wd] = directory
+            watched_directories.add(directory)
+            try:
+                with os.scandir(directory) as entries:
+                    directories.extend(entry.path for entry in entries if entry.is_dir())
+            except OSError:
+                pass
+        return watched_directories
+
+    def get_changes(self, timeout):
+        """
+        Waits for changes in the library.
+
+        :param timeout: The maximal time (in seconds) to wait for.
+        :return: The set of directories which were changed (empty if nothing changed in time).
+        """
+        changes = set()
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return changes
+        try:
+            data = os.read(self._fd, InotifyWatcher.READ_SIZE)
+        except BlockingIOError:
+            return changes
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_length = InotifyWatcher.EVENT_HEADER.unpack_from(data, offset)
+            offset += InotifyWatcher.EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + name_length].rstrip(b'\0'))
+            offset += name_length
+            if mask & InotifyWatcher.IN_Q_OVERFLOW:
+                # Some events were lost, so every album might have changed.
+                logger.warning('Too many changes at once. Checking the whole library.')
+                changes.update(scan_library(self.library_path, self.extension))
+                continue
+            if mask & InotifyWatcher.IN_IGNORED:
+                self._directories.pop(wd, None)
+                continue
+            directory = self._directories.get(wd)
+            if directory is None:
+                continue
+            changes.add(directory)
+            if mask & InotifyWatcher.IN_ISDIR and mask & (InotifyWatcher.IN_CREATE | InotifyWatcher.IN_MOVED_TO):
+                # Files might have been added to the new directories before they were watched.
+                changes.update(self._watch_tree(os.path.join(directory, name)))
+        return changes
+
+    def close(self):
+        """
+        Stops watching the library.
+        """
+        os.close(self._fd)
+
+
+class PollingWatcher(LibraryWatcher):
+    """
+    Watches the library by scanning it periodically, and comparing the files' sizes and modification times.
+    """
+
+    def __init__(self, library_path, extension='.mp3', interval=POLLING_INTERVAL):
+        """
+        Initializes the watcher, and scans the library for the first time.
+
+        :param library_path: The library's root path.
+        :param extension: The extension of the tracks' files.
+        :param interval: The time (in seconds) between scans.
+        """
+        super().__init__(library_path, extension)
+        self.interval = interval
+        self._albums = scan_library(library_path, extension)
+
+    def get_changes(self, timeout):
+        """
+        Waits for changes in the library.
+
+        :param timeout: The maximal time (in seconds) to wait for.
+        :return: The set of directories which were changed (empty if nothing changed in time).
+        """
+        time.sleep(min(timeout, self.interval))
+        albums = scan_library(self.library_path, self.extension)
+        changes = {album_path for album_path, files in albums.items() if self._albums.get(album_path) != files}
+        self._albums = albums
+        return changes
+
+
+class Debouncer(object):
+    """
+    Holds the changed directories until they stop changing for a while.
+    """
+
+    def __init__(self, period=DEBOUNCE_PERIOD):
+        """
+        Initializes the debouncer.
+
+        :param period: The time (in seconds) a directory must stay unchanged before it's released.
+        """
+        self.period = period
+        # The time of the last change, by directory.
+        self._changes = {}
+
+    def add(self, directories, now=None):
+        """
+        Marks the directories as changed.
+
+        :param directories: The changed directories.
+        :param now: The time of the change (the current time if None).
+        """
+        now = time.time() if now is None else now
+        for directory in directories:
+            self._changes[directory] = now
+
+    def get_timeout(self, now=None):
+        """
+        :param now: The current time (the actual time if None).
+        :return: The time (in seconds) until the next directory is released, or None if no directory is held.
+        """
+        if not self._changes:
+            return None
+        now = time.time() if now is None else now
+        return max(min(self._changes.values()) + self.period - now, 0)
+
+    def pop_ready(self, now=None):
+        """
+        Releases the directories which stopped changing.
+
+        :param now: The current time (the actual time if None).
+        :return: A sorted list of the released directories.
+        """
+        now = time.time() if now is None else now
+        ready = sorted(directory for directory, changed in self._changes.items() if now - changed >= self.period)
+        for directory in ready:
+            del self._changes[directory]
+        return ready
+
+
+def create_watcher(library_path, extension='.mp3'):
+    """
+    Creates the best watcher available on the current platform (inotify, or polling otherwise).
+
+    :param library_path: The library's root path.
+    :param extension: The extension of the tracks' files.
+    :return: The watcher.
+    """
+    try:
+        return InotifyWatcher(library_path, extension)
+    except (WatcherException, AttributeError, OSError) as ex:
+        logger.info('Can\'t use inotify ({}). Polling the library instead.'.format(ex))
+        return PollingWatcher(library_path, extension)
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from mp3organizer.clients.artwork_store import ArtworkStore
+
+TEST_IMAGE = b'\xff\xd8\xff\xe0' + b'cover' * 100
+TEST_URL = 'http://images.example.com/cover.jpg'
+TEST_OTHER_URL = 'http://images.example.com/compilation/cover.jpg'
+
+
+@pytest.fixture
+def test_store(tmpdir):
+    return ArtworkStore(str(tmpdir.join('artwork')))
+
+
+def test_found(test_store):
+    assert test_store.get(TEST_URL) is None
+    image_path = test_store.put(TEST_IMAGE, TEST_URL)
+    assert test_store.get(TEST_URL) == TEST_IMAGE
+    assert os.path.splitext(image_path)[1] == '.jpg'
+    # Other stores on the same directory see the image as well.
+    assert ArtworkStore(test_store.path).get(TEST_URL) == TEST_IMAGE
+
+
+def test_deduplicated(test_store):
+    image_path = test_store.put(TEST_IMAGE, TEST_URL)
+    assert test_store.put(TEST_IMAGE, TEST_OTHER_URL) == image_path
+    assert test_store.get(TEST_OTHER_URL) == TEST_IMAGE
+    assert os.listdir(os.path.dirname(image_path)) == [os.path.basename(image_path)]
@@ -1,11 +1,44 @@
 import time
+import urllib.parse
+import xml.etree.ElementTree
 
 import pytest
 
+from mp3organizer.clients.base import Client
+from mp3organizer.clients.metadata_cache import MetadataCache
+from mp3organizer.clients.amazon import amazon_api
 from mp3organizer.clients.amazon.amazon_client import AmazonClient
+from mp3organizer.clients.amazon.amazon_exceptions import LookupException
+from mp3organizer.clients.gracenote import gracenote_api
+from mp3organizer.clients.gracenote.gracenote_api import GracenoteAPI
 from mp3organizer.clients.gracenote.gracenote_client import GracenoteClient, ConnectionException
 
-from .test_consts import TEST_ALBUM, TEST_INVALID_TITLE, TEST_TRACKS_LIST, TEST_ARTIST
+from mp3organizer.datatypes.album import Album
+from .test_consts import TEST_ALBUM, TEST_INVALID_TITLE, TEST_TRACKS_LIST, TEST_ARTIST, TEST_YEAR
+
+
+class DummyClient(Client):
+    """
+    A client which finds every album (without artwork), and counts its searches.
+    """
+
+    def __init__(self, artwork_folder=None, verbose=True, metadata_cache=None):
+        super().__init__(artwork_folder, verbose, metadata_cache)
+        self.searches = 0
+
+    @staticmethod
+    def get_name():
+        return 'Dummy'
+
+    def connect(self):
+        self._connected = True
+
+    def _search(self, album, artist=None):
+        self.searches += 1
+        return [album]
+
+    def _select_result(self, results, album, artist=None, prompt=True, web=True):
+        return Album(results[0], artist or TEST_ARTIST, year=TEST_YEAR, tracks_list=TEST_TRACKS_LIST), None
 
 
 def gracenote_test_client():
@@ -43,3 +76,153 @@ def test_album_and_artist(test_client):
     test_client.connect()
     album = test_client.find_album(TEST_ALBUM, TEST_ARTIST, prompt=False, web=False)
     assert album.tracks_list == TEST_TRACKS_LIST
+
+
+def test_metadata_cache(tmpdir):
+    metadata_cache = MetadataCache(str(tmpdir.join('metadata.db')))
+    for expected_searches in (1, 0):
+        test_client = DummyClient(metadata_cache=metadata_cache)
+        test_client.connect()
+        album = test_client.find_album(TEST_ALBUM, TEST_ARTIST, prompt=False, web=False)
+        assert album == Album(TEST_ALBUM, TEST_ARTIST, year=TEST_YEAR, tracks_list=TEST_TRACKS_LIST)
+        assert test_client.searches == expected_searches
+    # Other queries aren't affected.
+    assert test_client.find_album(TEST_INVALID_TITLE, TEST_ARTIST, prompt=False, web=False).name != album.name
+    assert test_client.searches == 1
+    metadata_cache.close()
+
+
+def test_metadata_cache_unicode_keys(tmpdir):
+    metadata_cache = MetadataCache(str(tmpdir.join('metadata.db')))
+    album = Album('Камнем по голове', 'Король и Шут')
+    metadata_cache.set('Amazon', album.name, album.artist, album)
+    # Names in other scripts don't collide.
+    assert metadata_cache.get('Amazon', 'Акустический альбом', album.artist) is None
+    assert metadata_cache.get('Amazon', album.name.upper(), album.artist)[0] == album
+    metadata_cache.close()
+
+
+def test_gracenote_batch(monkeypatch):
+    requests = []
+
+    def fake_fetch(url, data=None):
+        queries = xml.etree.ElementTree.fromstring(data).findall('QUERY')
+        requests.append([query.attrib['CMD'] for query in queries])
+        responses = []
+        for query in queries:
+            if query.attrib['CMD'] == 'ALBUM_FETCH':
+                responses.append('<RESPONSE STATUS="OK"><ALBUM><ARTIST_ORIGIN ORD="1" ID="1">Origin</ARTIST_ORIGIN>'
+                                 '</ALBUM></RESPONSE>')
+            elif query.find('TEXT[@TYPE="ALBUM_TITLE"]').text == TEST_INVALID_TITLE:
+                responses.append('<RESPONSE STATUS="NO_MATCH"/>')
+            else:
+                responses.append(
+                    '<RESPONSE STATUS="OK"><ALBUM><GN_ID>1</GN_ID><ARTIST>{}</ARTIST><TITLE>{}</TITLE>'
+                    '<TRACK><TRACK_NUM>1</TRACK_NUM><TITLE>Track</TITLE></TRACK></ALBUM></RESPONSE>'.format(
+                        query.find('TEXT[@TYPE="ARTIST"]').text, query.find('TEXT[@TYPE="ALBUM_TITLE"]').text))
+        return '<RESPONSES>{}</RESPONSES>'.format(''.join(responses))
+
+    monkeypatch.setattr(gracenote_api, 'fetch', fake_fetch)
+    queries = [('Album {}'.format(index), TEST_ARTIST) for index in range(GracenoteAPI.BATCH_SIZE + 1)]
+    queries.append((TEST_INVALID_TITLE, TEST_ARTIST))
+    test_client = GracenoteClient()
+    test_client.connect()
+    test_client.api.profile = GracenoteAPI.PROFILE_FULL
+    test_client.prefetch_albums(queries)
+    # Two searches requests, and two albums fetches requests for the results without OET.
+    assert [len(request) for request in requests] == [GracenoteAPI.BATCH_SIZE, 2, GracenoteAPI.BATCH_SIZE, 1]
+    results = test_client._search('Album 3', TEST_ARTIST)
+    assert results[0][GracenoteAPI.ALBUM_TITLE] == 'Album 3'
+    assert results[0][GracenoteAPI.ARTIST_ORIGIN]['1']['TEXT'] == 'Origin'
+    assert test_client._search(TEST_INVALID_TITLE, TEST_ARTIST) == []
+    assert len(requests) == 4
+
+
+def test_gracenote_profiles():
+    minimal_api = GracenoteAPI('1-2', 'user')
+    full_api = GracenoteAPI('1-2', 'user', profile=GracenoteAPI.PROFILE_FULL)
+    minimal_options = xml.etree.ElementTree.fromstring(minimal_api._create_search_query(TEST_ARTIST, TEST_ALBUM))
+    full_options = xml.etree.ElementTree.fromstring(full_api._create_search_query(TEST_ARTIST, TEST_ALBUM))
+    assert [option.find('VALUE').text for option in minimal_options.iter('OPTION')] == ['COVER']
+    assert len(list(full_options.iter('OPTION'))) == 2
+    # Only the full profile fetches the missing OET.
+    assert not minimal_api._is_missing_oet({})
+    assert full_api._is_missing_oet({})
+    with pytest.raises(ValueError):
+        GracenoteAPI('1-2', 'user', profile='everything')
+
+
+AMAZON_ITEM_XML = '<Item><ASIN>{asin}</ASIN><DetailPageURL>http://amazon.com/{asin}</DetailPageURL>' \
+                  '<LargeImage><URL>http://amazon.com/{asin}.jpg</URL></LargeImage><ItemAttributes>' \
+                  '<Artist>{artist}</Artist><Binding>Audio CD</Binding><ReleaseDate>{year}-01-01</ReleaseDate>' \
+                  '<Title>{album}</Title></ItemAttributes><Tracks><Disc Number="1">{tracks}</Disc></Tracks></Item>'
+
+
+def amazon_response(items, is_valid=True):
+    return '<ItemLookupResponse xmlns="http://webservices.amazon.com/AWSECommerceService/2013-08-01"><Items>' \
+           '<Request><IsValid>{}</IsValid><Errors><Error><Code>AWS.Error</Code><Message>Error</Message></Error>' \
+           '</Errors></Request>{}</Items></ItemLookupResponse>'.format(
+               'True' if is_valid else 'False', ''.join(items)).encode('UTF-8')
+
+
+def amazon_fetch(calls, chunk_size=64):
+    """
+    Creates a fake fetch, which streams a response of the requested items (and records the requests).
+    """
+    def fake_fetch(url, headers=None, timeout=None, consumer=None):
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)
+        if query['Operation'][0] == 'ItemSearch':
+            item_ids = ['ASIN{}'.format(index) for index in range(3)] if query['ItemPage'][0] == '1' else []
+        else:
+            item_ids = urllib.parse.unquote(query['ItemId'][0]).split(',')
+        calls.append((query['Operation'][0], item_ids))
+        response = amazon_response(AMAZON_ITEM_XML.format(
+            asin=item_id, artist=TEST_ARTIST, album=TEST_ALBUM, year=TEST_YEAR,
+            tracks=''.join('<Track Number="{}">{}</Track>'.format(track.number, track.title)
+                           for track in TEST_TRACKS_LIST)) for item_id in item_ids)
+        for index in range(0, len(response), chunk_size):
+            if consumer(response[index:index + chunk_size]):
+                break
+
+    return fake_fetch
+
+
+def test_amazon_parsing(monkeypatch):
+    calls = []
+    monkeypatch.setattr(amazon_api, 'fetch', amazon_fetch(calls))
+    test_client = AmazonClient()
+    test_client.connect()
+    products = test_client.api.get_item(','.join('ASIN{}'.format(index) for index in range(3)))
+    assert len(calls) == 1
+    assert [product.asin for product in products] == ['ASIN{}'.format(index) for index in range(3)]
+    assert products[0].large_image_url == 'http://amazon.com/ASIN0.jpg'
+    album, artwork_url = test_client._select_result(products, TEST_ALBUM, TEST_ARTIST, prompt=False, web=False)
+    assert album == Album(TEST_ALBUM, TEST_ARTIST, year=str(TEST_YEAR), tracks_list=TEST_TRACKS_LIST)
+    assert artwork_url == 'http://amazon.com/ASIN0.jpg'
+    # Large lookups are split into batches.
+    item_ids = ['ASIN{}'.format(index) for index in range(amazon_api.MAX_LOOKUP_ITEMS + 2)]
+    calls.clear()
+    products = test_client.api.get_item(item_ids)
+    assert [len(batch) for _, batch in calls] == [amazon_api.MAX_LOOKUP_ITEMS, 2]
+    assert [product.asin for product in products] == item_ids
+
+    def fake_error_fetch(url, headers=None, timeout=None, consumer=None):
+        consumer(amazon_response([], False))
+
+    monkeypatch.setattr(amazon_api, 'fetch', fake_error_fetch)
+    with pytest.raises(LookupException):
+        test_client.api.get_item('ASIN')
+
+
+def test_amazon_search(monkeypatch):
+    calls = []
+    monkeypatch.setattr(amazon_api, 'fetch', amazon_fetch(calls))
+    monkeypatch.setattr(Client, 'MAX_RESULTS', 3)
+    test_client = AmazonClient()
+    test_client.connect()
+    products = test_client._search(TEST_ALBUM, TEST_ARTIST)
+    # The search's candidates are looked up in a single request.
+    assert [operation for operation, _ in calls] == ['ItemSearch', 'ItemLookup']
+    assert calls[1][1] == ['ASIN{}'.format(index) for index in range(3)]
+    assert [product.asin for product in products] == calls[1][1]
+    assert products[0].large_image_url == 'http://amazon.com/ASIN0.jpg'
@@ -1,5 +1,6 @@
 import os
 import shutil
+import time
 
 import pytest
 
@@ -7,6 +8,9 @@ from mutagen.id3 import ID3
 
 from mp3organizer.organizer import GRABBERS_LIST
 from mp3organizer.editor import FilesEditor
+from mp3organizer.lyrics.base import Grabber
+from mp3organizer.lyrics.lyrics_cache import LyricsCache
+from mp3organizer.lyrics.grabber_stats import GrabberStats
 from mp3organizer.datatypes.album import Album
 from mp3organizer.datatypes.track import Track
 from .test_consts import TEST_PATH, TEST_FILES_DIRECTORY, TEST_FILE_AUDIO, TEST_FILE_COVER, TEST_BASE_PATH, \
@@ -14,6 +18,63 @@ from .test_consts import TEST_PATH, TEST_FILES_DIRECTORY, TEST_FILE_AUDIO, TEST_
     TEST_LYRICS_START2, TEST_LYRICS_END, TEST_LYRICS_END2, TEST_LYRICS_END3
 
 
+class DummyGrabber(Grabber):
+    """
+    A lyrics grabber which returns the track's title as its lyrics, and counts its calls.
+    """
+
+    def __init__(self, verbose=True):
+        super().__init__(verbose)
+        self.calls = []
+
+    def find_lyrics(self, track, artist, album=None):
+        self.calls.append(track)
+        return 'Lyrics of {}'.format(track)
+
+
+class SlowGrabber(Grabber):
+    """
+    A lyrics grabber which returns the given lyrics after the given delay.
+    """
+
+    def __init__(self, delay, lyrics, verbose=True):
+        super().__init__(verbose)
+        self.delay = delay
+        self.lyrics = lyrics
+
+    def find_lyrics(self, track, artist, album=None):
+        time.sleep(self.delay)
+        return self.lyrics
+
+
+class NamedGrabber(Grabber):
+    """
+    A lyrics grabber with the given name and lyrics, which counts its calls.
+    """
+
+    def __init__(self, name, lyrics, verbose=True):
+        super().__init__(verbose)
+        self.name = name
+        self.lyrics = lyrics
+        self.calls = 0
+
+    def get_name(self):
+        return self.name
+
+    def find_lyrics(self, track, artist, album=None):
+        self.calls += 1
+        return self.lyrics
+
+
+class FailingGrabber(Grabber):
+    """
+    A lyrics grabber which always fails (like an unreachable website).
+    """
+
+    def find_lyrics(self, track, artist, album=None):
+        raise IOError('Unreachable')
+
+
 @pytest.fixture
 def setup(request):
     """
@@ -97,3 +158,129 @@ def test_id3_tag(test_editor):
         lyrics[0].text.lower().startswith(TEST_LYRICS_START2)
     assert lyrics[0].text.lower().endswith(TEST_LYRICS_END) or lyrics[0].text.lower().endswith(TEST_LYRICS_END2) or \
         lyrics[0].text.lower().endswith(TEST_LYRICS_END3)
+
+
+@pytest.mark.usefixtures('setup')
+def test_prefetch_lyrics():
+    grabber = DummyGrabber()
+    editor = FilesEditor(TEST_PATH, Album(TEST_ALBUM, TEST_ARTIST, TEST_GENRE, TEST_YEAR,
+                                          tracks_list=TEST_TRACKS_LIST), [grabber], lyrics_threads=4)
+    editor.prefetch_lyrics(TEST_TRACKS_LIST)
+    assert sorted(grabber.calls) == sorted(track.title for track in TEST_TRACKS_LIST)
+    # The prefetched lyrics are used when editing.
+    os.rename(os.path.join(TEST_PATH, TEST_FILE_AUDIO),
+              os.path.join(TEST_PATH, 'Yellow.mp3'))
+    results = editor.edit_track(TEST_TRACK)
+    assert results.lyrics
+    assert len(grabber.calls) == len(TEST_TRACKS_LIST)
+    lyrics = ID3(os.path.join(TEST_PATH, str(TEST_TRACK) + '.mp3')).getall('USLT')
+    assert lyrics[0].text == 'Lyrics of {}'.format(TEST_TRACK.title)
+
+
+@pytest.mark.usefixtures('setup')
+def test_prefetch_matched_lyrics():
+    os.rename(os.path.join(TEST_PATH, TEST_FILE_AUDIO), os.path.join(TEST_PATH, 'Yellow.mp3'))
+    grabber = DummyGrabber()
+    tracks_list = [TEST_TRACK, Track(2, 'Missing')]
+    editor = FilesEditor(TEST_PATH, Album(TEST_ALBUM, TEST_ARTIST, TEST_GENRE, TEST_YEAR, tracks_list=tracks_list),
+                         [grabber])
+    editor.edit_tracks()
+    # Tracks without files don't need lyrics.
+    assert grabber.calls == [TEST_TRACK.title]
+
+
+@pytest.mark.parametrize('grabbers_list, expected_lyrics', [
+    ([SlowGrabber(0.2, 'First'), SlowGrabber(0, 'Second')], 'First'),
+    ([SlowGrabber(5, None), SlowGrabber(0, 'Second'), SlowGrabber(0.1, 'Third')], 'Second'),
+    ([SlowGrabber(0, None), SlowGrabber(0, None)], None)
+])
+def test_race_lyrics(grabbers_list, expected_lyrics):
+    editor = FilesEditor(TEST_PATH, Album(TEST_ALBUM, TEST_ARTIST), grabbers_list,
+                         lyrics_strategy=FilesEditor.RACE_STRATEGY)
+    start_time = time.time()
+    assert editor._get_lyrics(TEST_TRACK) == expected_lyrics
+    assert time.time() - start_time < 1
+
+
+def test_race_lyrics_losers():
+    grabber_stats = GrabberStats(':memory:')
+    grabbers_list = [SlowGrabber(0, 'First'), SlowGrabber(0.2, 'Late')]
+    editor = FilesEditor(TEST_PATH, Album(TEST_ALBUM, TEST_ARTIST), grabbers_list,
+                         lyrics_strategy=FilesEditor.RACE_STRATEGY, grabber_stats=grabber_stats)
+    assert editor._get_lyrics(TEST_TRACK) == 'First'
+    time.sleep(0.4)
+    # The grabbers which finished after the race was over aren't recorded.
+    assert grabber_stats._stats[(Grabber.get_name(), GrabberStats.OVERALL)][0] == 1
+    grabber_stats.close()
+
+
+def test_lyrics_cache(tmpdir):
+    lyrics_cache = LyricsCache(str(tmpdir.join('lyrics.db')))
+    for expected_calls in ([TEST_TRACK.title], []):
+        grabber = DummyGrabber()
+        editor = FilesEditor(TEST_PATH, Album(TEST_ALBUM, TEST_ARTIST), [grabber], lyrics_cache=lyrics_cache)
+        assert editor._get_lyrics(TEST_TRACK) == 'Lyrics of {}'.format(TEST_TRACK.title)
+        assert grabber.calls == expected_calls
+    lyrics_cache.close()
+
+
+def test_lyrics_cache_failures(tmpdir):
+    lyrics_cache = LyricsCache(str(tmpdir.join('lyrics.db')))
+    editor = FilesEditor(TEST_PATH, Album(TEST_ALBUM, TEST_ARTIST), [FailingGrabber(), NamedGrabber('Missing', None)],
+                         lyrics_cache=lyrics_cache)
+    assert editor._get_lyrics(TEST_TRACK) is None
+    # Failed lookups aren't cached as not found.
+    assert lyrics_cache.get(TEST_TRACK.title, TEST_ARTIST) == (False, None)
+    editor = FilesEditor(TEST_PATH, Album(TEST_ALBUM, TEST_ARTIST), [NamedGrabber('Missing', None)],
+                         lyrics_cache=lyrics_cache)
+    assert editor._get_lyrics(TEST_TRACK) is None
+    assert lyrics_cache.get(TEST_TRACK.title, TEST_ARTIST) == (True, None)
+    lyrics_cache.close()
+
+
+def test_adaptive_lyrics_order(tmpdir):
+    grabber_stats = GrabberStats(str(tmpdir.join('grabbers.db')))
+    missing_grabber = NamedGrabber('Missing', None)
+    found_grabber = NamedGrabber('Found', 'Lyrics')
+    editor = FilesEditor(TEST_PATH, Album(TEST_ALBUM, TEST_ARTIST), [missing_grabber, found_grabber],
+                         grabber_stats=grabber_stats, lyrics_order=FilesEditor.ADAPTIVE_ORDER)
+    for _ in range(3):
+        assert editor._get_lyrics(TEST_TRACK) == 'Lyrics'
+    # Only the first lookup tried the grabbers in their given order.
+    assert missing_grabber.calls == 1
+    assert found_grabber.calls == 3
+    grabber_stats.close()
+
+
+@pytest.mark.usefixtures('setup')
+def test_tag_rewrites():
+    os.rename(os.path.join(TEST_PATH, TEST_FILE_AUDIO), os.path.join(TEST_PATH, 'Yellow.mp3'))
+    album = Album(TEST_ALBUM, TEST_ARTIST, TEST_GENRE, TEST_YEAR, os.path.join(TEST_PATH, TEST_FILE_COVER),
+                  [TEST_TRACK])
+    test_file = os.path.join(TEST_PATH, str(TEST_TRACK) + '.mp3')
+    # The first edit grows the tag (and rewrites the file), and reserves padding for the next edits.
+    results = FilesEditor(TEST_PATH, album, [DummyGrabber()]).edit_track(TEST_TRACK)
+    assert results.success
+    assert results.rewritten_bytes == os.path.getsize(test_file)
+    for grabbers_list in ([], [DummyGrabber()]):
+        results = FilesEditor(TEST_PATH, album, grabbers_list).edit_track(TEST_TRACK)
+        assert results.success
+        assert results.rewritten_bytes == ID3(test_file).size
+        assert results.rewritten_bytes < os.path.getsize(test_file)
+
+
+@pytest.mark.usefixtures('setup')
+def test_incremental():
+    os.rename(os.path.join(TEST_PATH, TEST_FILE_AUDIO), os.path.join(TEST_PATH, 'Yellow.mp3'))
+    album = Album(TEST_ALBUM, TEST_ARTIST, TEST_GENRE, TEST_YEAR, os.path.join(TEST_PATH, TEST_FILE_COVER),
+                  [TEST_TRACK])
+    assert not FilesEditor(TEST_PATH, album, [DummyGrabber()], incremental=True).edit_tracks()
+    grabber = DummyGrabber()
+    editor = FilesEditor(TEST_PATH, album, [grabber], incremental=True)
+    results = editor.edit_track(TEST_TRACK)
+    assert results.success and results.skipped
+    assert not grabber.calls
+    # Changed albums are edited again.
+    album.year += 1
+    results = FilesEditor(TEST_PATH, album, [grabber], incremental=True).edit_track(TEST_TRACK)
+    assert results.success and not results.skipped
@@ -0,0 +1,162 @@
+import asyncio
+import gzip
+import threading
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from mp3organizer.http_utils import fetch, fetch_async, close_connections, set_host_rate, \
+    RateLimiter
+
+TEST_BODY = b'<html><body>Look at the stars</body></html>'
+LARGE_BODY = TEST_BODY * 10000
+
+
+class FakeRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves the test responses, by the request's path.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    connections = 0
+    busy_responses = 0
+
+    def setup(self):
+        super().setup()
+        FakeRequestHandler.connections += 1
+
+    def do_GET(self):
+        if self.path == '/plain':
+            self._send(200, TEST_BODY)
+        elif self.path == '/gzip':
+            self._send(200, gzip.compress(TEST_BODY), {'Content-Encoding': 'gzip'})
+        elif self.path == '/chunked':
+            self.send_response(200)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for index in range(0, len(TEST_BODY), 10):
+                chunk = TEST_BODY[index:index + 10]
+                self.wfile.write('{:x}\r\n'.format(len(chunk)).encode() + chunk + b'\r\n')
+            self.wfile.write(b'0\r\n\r\n')
+        elif self.path == '/close':
+            # Close the connection without telling the client.
+            self._send(200, TEST_BODY)
+            self.close_connection = True
+        elif self.path == '/busy':
+            # Every other request is refused.
+            FakeRequestHandler.busy_responses += 1
+            if FakeRequestHandler.busy_responses % 2:
+                self._send(503, b'Busy', {'Retry-After': '0'})
+            else:
+                self._send(200, TEST_BODY)
+        elif self.path == '/large':
+            self._send(200, LARGE_BODY)
+        elif self.path == '/redirect':
+            self._send(302, b'', {'Location': '/plain'})
+        else:
+            self._send(404, b'Not found')
+
+    def do_POST(self):
+        self._send(200, self.rfile.read(int(self.headers['Content-Length'])))
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server_url():
+    set_host_rate('127.0.0.1', 1000)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:{}'.format(server.server_address[1])
+    server.shutdown()
+
+
+@pytest.mark.parametrize('path', ['/plain', '/gzip', '/chunked', '/redirect'])
+def test_fetch(server_url, path):
+    assert fetch(server_url + path) == TEST_BODY
+    assert asyncio.run(fetch_async(server_url + path)) == TEST_BODY
+
+
+def test_fetch_post(server_url):
+    assert fetch(server_url + '/post', TEST_BODY) == TEST_BODY
+    assert asyncio.run(fetch_async(server_url + '/post', TEST_BODY)) == TEST_BODY
+
+
+def test_fetch_not_found(server_url):
+    with pytest.raises(urllib.error.HTTPError):
+        fetch(server_url + '/missing')
+    with pytest.raises(urllib.error.HTTPError):
+        asyncio.run(fetch_async(server_url + '/missing'))
+
+
+def test_connection_reuse(server_url):
+    close_connections()
+    connections = FakeRequestHandler.connections
+    for path in ('/plain', '/gzip', '/missing', '/chunked'):
+        try:
+            fetch(server_url + path)
+        except urllib.error.HTTPError:
+            pass
+    assert FakeRequestHandler.connections == connections + 1
+
+    async def fetch_all():
+        return [await fetch_async(server_url + path) for path in ('/plain', '/gzip', '/chunked', '/redirect')]
+    assert asyncio.run(fetch_all()) == [TEST_BODY] * 4
+    assert FakeRequestHandler.connections == connections + 2
+
+
+def test_closed_connection(server_url):
+    # Requests over connections the server closed are sent again over new connections.
+    assert fetch(server_url + '/close') == TEST_BODY
+    assert fetch(server_url + '/plain') == TEST_BODY
+
+    async def fetch_all():
+        return [await fetch_async(server_url + path) for path in ('/close', '/plain')]
+    assert asyncio.run(fetch_all()) == [TEST_BODY] * 2
+
+
+def test_retry(server_url):
+    assert fetch(server_url + '/busy') == TEST_BODY
+    assert asyncio.run(fetch_async(server_url + '/busy')) == TEST_BODY
+    assert FakeRequestHandler.busy_responses == 4
+
+
+def test_consumer(server_url):
+    chunks = []
+
+    def consumer(chunk):
+        chunks.append(chunk)
+        return True
+
+    # The body isn't read once the consumer stops it, and the connection isn't reused.
+    assert fetch(server_url + '/large', consumer=consumer) is None
+    assert asyncio.run(fetch_async(server_url + '/large', consumer=consumer)) is None
+    assert len(chunks) == 2 and all(0 < len(chunk) < len(LARGE_BODY) for chunk in chunks)
+    assert fetch(server_url + '/plain') == TEST_BODY
+    for path in ('/gzip', '/chunked'):
+        chunks = []
+        assert fetch(server_url + path, consumer=lambda chunk: chunks.append(chunk)) is None
+        assert asyncio.run(fetch_async(server_url + path, consumer=lambda chunk: chunks.append(chunk))) is None
+        assert b''.join(chunks) == TEST_BODY * 2
+
+
+def test_rate_limiter():
+    rate_limiter = RateLimiter(10, burst=2)
+    assert rate_limiter.reserve() == rate_limiter.reserve() == 0
+    assert rate_limiter.reserve() == pytest.approx(0.1, abs=0.01)
+    rate_limiter.slow_down()
+    assert rate_limiter.rate == 5
+    rate_limiter.speed_up()
+    rate_limiter.speed_up()
+    assert rate_limiter.rate == 7
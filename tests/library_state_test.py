@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from mp3organizer.file_utils import scan_library
+from mp3organizer.library_state import LibraryState, FileState
+from .test_consts import TEST_ARTIST, TEST_ALBUM
+
+
+@pytest.fixture
+def test_state(tmpdir):
+    state = LibraryState(str(tmpdir.join('library.db')))
+    yield state
+    state.close()
+
+
+def _record_library(state, library_albums, client=None):
+    for album_path, files in library_albums.items():
+        state.set_album(album_path, [FileState(path, size, mtime, client=client)
+                                     for path, (size, mtime) in files.items()])
+
+
+def test_scan_library(tmpdir):
+    album_path = tmpdir.join(TEST_ARTIST, TEST_ALBUM)
+    album_path.ensure('01 - Track.mp3').write('audio')
+    tmpdir.ensure(TEST_ARTIST, 'Empty Album', 'cover.jpg')
+    tmpdir.ensure(TEST_ARTIST, 'Loose Track.mp3')
+    library_albums = scan_library(str(tmpdir))
+    assert list(library_albums) == [str(album_path)]
+    assert library_albums[str(album_path)][str(album_path.join('01 - Track.mp3'))][0] == len('audio')
+
+
+def test_changed_albums(tmpdir, test_state):
+    track_path = tmpdir.join(TEST_ARTIST, TEST_ALBUM).ensure('01 - Track.mp3')
+    other_track_path = tmpdir.join(TEST_ARTIST, 'Other Album').ensure('01 - Track.mp3')
+    assert test_state.find_changed_albums(scan_library(str(tmpdir))) == sorted(
+        [str(track_path.dirpath()), str(other_track_path.dirpath())])
+    _record_library(test_state, scan_library(str(tmpdir)))
+    assert test_state.find_changed_albums(scan_library(str(tmpdir))) == []
+    # Changed and added files change their albums.
+    track_path.write('new audio')
+    other_track_path.dirpath().ensure('02 - Track.mp3')
+    assert test_state.find_changed_albums(scan_library(str(tmpdir))) == sorted(
+        [str(track_path.dirpath()), str(other_track_path.dirpath())])
+
+
+def test_set_album(tmpdir, test_state):
+    album_path = str(tmpdir.join(TEST_ARTIST, TEST_ALBUM))
+    track_path = os.path.join(album_path, '01 - Track.mp3')
+    test_state.set_album(album_path, [FileState(track_path, 1, 1, 'digest', 'Gracenote', 'AZLyrics'),
+                                      FileState(os.path.join(album_path, 'Removed.mp3'), 1, 1)])
+    test_state.set_album(album_path, [FileState(track_path, 2, 2, 'new digest')])
+    assert test_state.get_albums() == {album_path: {track_path: (2, 2)}}
+    # Unknown sources keep their recorded values.
+    file_state = test_state.get_file(track_path)
+    assert (file_state.tag_digest, file_state.client, file_state.lyrics_source) == \
+        ('new digest', 'Gracenote', 'AZLyrics')
@@ -0,0 +1,57 @@
+import pytest
+
+from mp3organizer.lyrics.lyrics_cache import LyricsCache
+from .test_consts import TEST_ARTIST, TEST_TRACK, TEST_INVALID_TITLE, TEST_LYRICS_START
+
+
+@pytest.fixture
+def test_cache(tmpdir):
+    cache = LyricsCache(str(tmpdir.join('lyrics.db')))
+    yield cache
+    cache.close()
+
+
+def test_found(test_cache):
+    test_cache.set(TEST_TRACK.title, TEST_ARTIST, TEST_LYRICS_START)
+    # Keys are normalized.
+    assert test_cache.get(TEST_TRACK.title.upper(), ' ' + TEST_ARTIST.lower()) == (True, TEST_LYRICS_START)
+
+
+def test_unicode_keys(test_cache):
+    test_cache.set('Прыгну со скалы', 'Король и Шут', TEST_LYRICS_START)
+    # Names in other scripts don't collide.
+    assert test_cache.get('Лесник', 'Король и Шут') == (False, None)
+    assert test_cache.get('ПРЫГНУ СО СКАЛЫ', 'король и шут') == (True, TEST_LYRICS_START)
+
+
+def test_not_found(test_cache):
+    assert test_cache.get(TEST_INVALID_TITLE, TEST_ARTIST) == (False, None)
+    test_cache.set(TEST_INVALID_TITLE, TEST_ARTIST, None)
+    assert test_cache.get(TEST_INVALID_TITLE, TEST_ARTIST) == (True, None)
+
+
+def test_expired(test_cache):
+    test_cache.negative_ttl = -1
+    test_cache.set(TEST_TRACK.title, TEST_ARTIST, TEST_LYRICS_START)
+    test_cache.set(TEST_INVALID_TITLE, TEST_ARTIST, None)
+    assert test_cache.get(TEST_TRACK.title, TEST_ARTIST) == (True, TEST_LYRICS_START)
+    assert test_cache.get(TEST_INVALID_TITLE, TEST_ARTIST) == (False, None)
+
+
+def test_persistent(tmpdir, test_cache):
+    test_cache.set(TEST_TRACK.title, TEST_ARTIST, TEST_LYRICS_START)
+    other_cache = LyricsCache(test_cache.path)
+    assert other_cache.get(TEST_TRACK.title, TEST_ARTIST) == (True, TEST_LYRICS_START)
+    other_cache.close()
+
+
+def test_eviction(test_cache):
+    test_cache.max_size = 1000
+    for index in range(20):
+        test_cache.set('Track {}'.format(index), TEST_ARTIST, 'x' * 100)
+        # Keep the first track recently used.
+        test_cache.get('Track 0', TEST_ARTIST)
+    assert test_cache.get('Track 0', TEST_ARTIST)[0]
+    assert test_cache.get('Track 19', TEST_ARTIST)[0]
+    assert not test_cache.get('Track 1', TEST_ARTIST)[0]
+    assert test_cache._size <= test_cache.max_size
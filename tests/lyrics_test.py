@@ -1,8 +1,14 @@
+import asyncio
+
 import pytest
 
+from mp3organizer.lyrics import base
+from mp3organizer.lyrics.artists_cache import ArtistsCache
 from mp3organizer.lyrics.azlyrics_grabber import AZLyricsGrabber
+from mp3organizer.lyrics.grabber_stats import GrabberStats
 from mp3organizer.lyrics.lyricscom_grabber import LyricscomGrabber
 from mp3organizer.lyrics.lyricswiki_grabber import LyricswikiGrabber
+from mp3organizer.lyrics.lyrics_utils import TextExtractor, PageNotFoundException, extract_text
 from mp3organizer.lyrics.songlyrics_grabber import SongLyricsGrabber
 from tests.test_consts import TEST_ARTIST, TEST_INVALID_TITLE, TEST_LYRICS_END, TEST_LYRICS_START, \
     TEST_TRACK, TEST_LYRICS_END2, TEST_LYRICS_START2, TEST_LYRICS_END3
@@ -31,6 +37,13 @@ def test_not_found(test_grabber):
     assert not lyrics
 
 
+@pytest.mark.parametrize('test_grabber', [azlyrics_test_grabber(), lyricscom_test_grabber(), lyricswiki_test_grabber(),
+                                          songlyrics_test_grabber()])
+def test_not_found_async(test_grabber):
+    lyrics = asyncio.run(test_grabber.find_lyrics_async(TEST_INVALID_TITLE, TEST_INVALID_TITLE))
+    assert not lyrics
+
+
 @pytest.mark.parametrize('test_grabber', [azlyrics_test_grabber(), lyricscom_test_grabber(), lyricswiki_test_grabber(),
                                           songlyrics_test_grabber()])
 def test_track_and_artist(test_grabber):
@@ -38,3 +51,129 @@ def test_track_and_artist(test_grabber):
     assert lyrics.lower().startswith(TEST_LYRICS_START) or lyrics.lower().startswith(TEST_LYRICS_START2)
     assert lyrics.lower().endswith(TEST_LYRICS_END) or lyrics.lower().endswith(TEST_LYRICS_END2) or \
         lyrics.lower().endswith(TEST_LYRICS_END3)
+
+
+def test_extract_text():
+    html = '<div>Menu</div><div class="lyrics"><!-- Lyrics -->\nLook at the stars,<br>\n  Look how they ' \
+           'shine&nbsp;for <i>you</i><div>Ad</div> &#39;Yellow&#39;</div><div>Footer</div>'
+    lyrics = extract_text(html, '<div class="lyrics">')
+    assert lyrics == 'Look at the stars,\nLook how they shine for you \'Yellow\''
+    assert extract_text(html, '<div class="missing">') is None
+    # Pages are parsed the same in chunks of any size, and stop being read after the lyrics.
+    data = html.encode('UTF-8')
+    for chunk_size in (1, 3, 8):
+        extractor = TextExtractor('<div class="lyrics">')
+        for index in range(0, len(data), chunk_size):
+            if extractor.feed(data[index:index + chunk_size]):
+                break
+        assert index < data.index(b'Footer')
+        assert extractor.get_text() == lyrics
+
+
+def test_grabber_stats(tmpdir):
+    grabbers_list = [AZLyricsGrabber(), SongLyricsGrabber()]
+    grabber_stats = GrabberStats(str(tmpdir.join('grabbers.db')))
+    # Without statistics, the given order is kept.
+    assert grabber_stats.sort(grabbers_list, TEST_ARTIST) == grabbers_list
+    for _ in range(GrabberStats.MIN_ARTIST_ATTEMPTS):
+        grabber_stats.record(AZLyricsGrabber.get_name(), TEST_ARTIST, False, 0.5)
+        grabber_stats.record(SongLyricsGrabber.get_name(), TEST_ARTIST, True, 0.5)
+        grabber_stats.record(AZLyricsGrabber.get_name(), 'Other Artist', True, 0.1)
+    grabber_stats.close()
+    # The statistics are kept, and the artist's own statistics are preferred.
+    grabber_stats = GrabberStats(str(tmpdir.join('grabbers.db')))
+    assert grabber_stats.sort(grabbers_list, TEST_ARTIST) == grabbers_list[::-1]
+    assert grabber_stats.sort(grabbers_list, 'Other Artist') == grabbers_list
+    grabber_stats.close()
+
+
+def test_grabber_stats_unicode_artists(tmpdir):
+    grabbers_list = [AZLyricsGrabber(), SongLyricsGrabber()]
+    grabber_stats = GrabberStats(str(tmpdir.join('grabbers.db')))
+    for _ in range(GrabberStats.MIN_ARTIST_ATTEMPTS):
+        for artist in (TEST_ARTIST, TEST_ARTIST, 'Кино'):
+            grabber_stats.record(AZLyricsGrabber.get_name(), artist, artist != TEST_ARTIST, 0.5)
+            grabber_stats.record(SongLyricsGrabber.get_name(), artist, artist == TEST_ARTIST, 0.5)
+    # Artists written in other scripts have their own statistics (and don't share the overall ones).
+    assert grabber_stats.sort(grabbers_list, None) == grabbers_list[::-1]
+    assert grabber_stats.sort(grabbers_list, 'Кино') == grabbers_list
+    assert grabber_stats.sort(grabbers_list, 'Сплин') == grabbers_list[::-1]
+    grabber_stats.close()
+
+
+def _fake_pages(monkeypatch, pages):
+    """
+    Replaces the lyrics websites with the given pages.
+
+    :param pages: The pages' texts, by their URLs.
+    :return: The list the requested URLs are added to.
+    """
+    requests = []
+
+    def fetch_page(url, verbose=True):
+        requests.append(url)
+        if url not in pages:
+            raise PageNotFoundException(url)
+        return pages[url]
+
+    async def fetch_page_async(url, verbose=True):
+        return fetch_page(url)
+
+    monkeypatch.setattr(base, 'fetch_text', lambda url, start_tag, verbose=True: fetch_page(url))
+    monkeypatch.setattr(base, 'fetch_text_async', lambda url, start_tag, verbose=True: fetch_page_async(url))
+    monkeypatch.setattr(base, 'fetch_page', fetch_page)
+    monkeypatch.setattr(base, 'fetch_page_async', fetch_page_async)
+    monkeypatch.setattr(base, 'page_exists', lambda url: requests.append(url) or url in pages)
+    return requests
+
+
+def test_artist_resolution(monkeypatch, tmpdir):
+    requests = _fake_pages(monkeypatch, {'http://lyrics.wikia.com/Coldplay:Yellow': 'Look at the stars...',
+                                         'http://lyrics.wikia.com/Coldplay': ''})
+    artists_cache = ArtistsCache(str(tmpdir.join('artists.db')))
+    grabber = LyricswikiGrabber(artists_cache=artists_cache)
+    assert grabber.find_lyrics('Yellow', 'coldplay') == 'Look at the stars...'
+    # The resolved (canonical) slug is used right away.
+    assert grabber.find_lyrics('Trouble', 'coldplay') is None
+    assert requests[-1] == 'http://lyrics.wikia.com/Coldplay:Trouble'
+    # Both slugs of a missing artist are tried (and then its pages), once.
+    del requests[:]
+    assert grabber.find_lyrics('Nothing', 'the nobodies') is None
+    assert len(requests) == 4
+    assert grabber.is_artist_missing('the nobodies')
+    assert grabber.find_lyrics('Nothing Else', 'the nobodies') is None
+    assert len(requests) == 4
+    # The resolved artists are kept for the next runs.
+    assert LyricswikiGrabber(artists_cache=artists_cache).is_artist_missing('The Nobodies')
+    assert not LyricswikiGrabber().is_artist_missing('The Nobodies')
+    # Artists written in other scripts don't collide.
+    assert grabber.find_lyrics('Кукушка', 'Кино') is None
+    assert grabber.is_artist_missing('Кино')
+    assert not grabber.is_artist_missing('Сплин')
+    assert not LyricswikiGrabber(artists_cache=artists_cache).is_artist_missing('Сплин')
+    artists_cache.close()
+
+
+def test_album_index(monkeypatch):
+    index_page = '<b>"Parachutes"</b><a href="../lyrics/coldplay/yellow.html" target="_blank">Yellow</a>' \
+                 '<a href="../lyrics/coldplay/dontpanic.html" target="_blank">Don&#039;t Panic</a>' \
+                 '<a href="../lyrics/coldplaying/shiver.html" target="_blank">Shiver</a>' \
+                 '<a href="../lyrics/coldplay/kukushka.html" target="_blank">Кукушка</a>'
+    requests = _fake_pages(monkeypatch, {'http://www.azlyrics.com/c/coldplay.html': index_page,
+                                         'http://www.azlyrics.com/lyrics/coldplay/yellow.html': 'Yellow...',
+                                         'http://www.azlyrics.com/lyrics/coldplay/dontpanic.html': 'Panic...',
+                                         'http://www.azlyrics.com/lyrics/coldplay/kukushka.html': 'Kukushka...'})
+    grabber = AZLyricsGrabber()
+    assert grabber.find_lyrics('Yellow', 'Coldplay', 'Parachutes') == 'Yellow...'
+    assert asyncio.run(grabber.find_lyrics_async('Don\'t Panic', 'Coldplay', 'Parachutes')) == 'Panic...'
+    assert grabber.find_lyrics('Yellow (Live)', 'Coldplay', 'Parachutes') == 'Yellow...'
+    # Tracks which aren't listed (including other artists' tracks) aren't requested.
+    assert grabber.find_lyrics('Shiver', 'Coldplay', 'Parachutes') is None
+    assert requests == ['http://www.azlyrics.com/c/coldplay.html',
+                        'http://www.azlyrics.com/lyrics/coldplay/yellow.html',
+                        'http://www.azlyrics.com/lyrics/coldplay/dontpanic.html',
+                        'http://www.azlyrics.com/lyrics/coldplay/yellow.html']
+    # Titles in other scripts are listed by their own keys.
+    assert grabber.find_lyrics('Кукушка', 'Coldplay', 'Parachutes') == 'Kukushka...'
+    assert grabber.find_lyrics('Звезда', 'Coldplay', 'Parachutes') is None
+    assert requests[4:] == ['http://www.azlyrics.com/lyrics/coldplay/kukushka.html']
@@ -2,15 +2,50 @@ import sys
 import shutil
 import os
 import glob
+from argparse import Namespace
 
 import pytest
 from mutagen.id3 import ID3
 
 from mp3organizer import organizer
+from mp3organizer.gui.arguments import Arguments
+from mp3organizer.clients.base import Client
+from mp3organizer.clients.gracenote.gracenote_client import GracenoteClient
+from mp3organizer.lyrics.songlyrics_grabber import SongLyricsGrabber
 from .test_consts import TEST_PATH, TEST_FILES_DIRECTORY, TEST_TRACKS_LIST, TEST_FILE_AUDIO, TEST_BASE_PATH, \
     TEST_GENRE, TEST_ARTIST, TEST_ALBUM, TEST_YEAR
 
 
+class PrefetchingClient(Client):
+    """
+    A client which remembers the albums it was asked to prefetch.
+    """
+
+    def __init__(self, batched_searches):
+        super().__init__(verbose=False)
+        self.BATCHED_SEARCHES = batched_searches
+        self.queries = None
+
+    def connect(self):
+        self._connected = True
+
+    def prefetch_albums(self, queries):
+        self.queries = queries
+
+
+class FakeGracenoteAPI(object):
+    """
+    A Gracenote API which finds nothing, and remembers the batched searches.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def search_albums(self, queries):
+        self.queries.extend(queries)
+        return [[] for _ in queries]
+
+
 @pytest.fixture
 def setup(request):
     """
@@ -77,3 +112,48 @@ def test_normal():
     assert os.path.splitext(os.path.basename(artwork_files[0]))[0] == TEST_ALBUM
     # Check no other files were created.
     assert len(os.listdir(TEST_PATH)) == len(TEST_TRACKS_LIST) + 1
+
+
+def test_gui_arguments():
+    # The GUI's arguments hold everything the organizer reads.
+    args = Arguments(TEST_PATH, TEST_ALBUM, TEST_ARTIST, TEST_GENRE, TEST_PATH, GracenoteClient.get_name(),
+                     SongLyricsGrabber.get_name())
+    resources = organizer._get_shared_resources(args)
+    assert isinstance(resources.clients[0], GracenoteClient)
+    assert isinstance(resources.grabbers[0], SongLyricsGrabber)
+    assert resources.lyrics_cache is None
+
+
+@pytest.mark.parametrize('albums_count, workers, expected_sizes', [
+    (25, 1, [10, 10, 5]),
+    (25, 4, [7, 7, 7, 4]),
+    (3, 4, [1, 1, 1]),
+    (0, 2, [])
+])
+def test_split_batches(albums_count, workers, expected_sizes):
+    album_paths = ['Album {}'.format(index) for index in range(albums_count)]
+    batches = list(organizer._split_batches(album_paths, workers))
+    assert [len(batch) for batch in batches] == expected_sizes
+    assert sum(batches, []) == album_paths
+
+
+@pytest.mark.parametrize('gracenote_first', [True, False])
+def test_prefetch_albums(monkeypatch, gracenote_first):
+    gracenote_client = GracenoteClient(verbose=False)
+    gracenote_client.api = FakeGracenoteAPI()
+    gracenote_client._connected = True
+    other_client = PrefetchingClient(True)
+    clients = [gracenote_client, other_client] if gracenote_first else [other_client, gracenote_client]
+    monkeypatch.setattr(organizer, '_organize_library_album', lambda args, album_path, resources: (None, None))
+    album_paths = [os.path.join(TEST_ARTIST, TEST_ALBUM)]
+    batch = organizer._organize_albums_batch(Namespace(verbose=False), album_paths,
+                                             organizer.SharedResources(clients, []))
+    assert next(batch) == (album_paths[0], None, None)
+    # Only the preferred client prefetches the albums.
+    queries = [(TEST_ALBUM, TEST_ARTIST)]
+    assert gracenote_client.api.queries == (queries if gracenote_first else [])
+    assert other_client.queries == (None if gracenote_first else queries)
+    assert len(gracenote_client._prefetched_results) == len(gracenote_client.api.queries)
+    # The results which weren't used are discarded along with the batch.
+    assert list(batch) == []
+    assert gracenote_client._prefetched_results == {}
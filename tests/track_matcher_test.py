@@ -0,0 +1,66 @@
+import time
+
+from mp3organizer.datatypes.track import Track
+from mp3organizer.file_utils import DirectoryIndex
+from mp3organizer.track_matcher import match_tracks, _solve_assignment
+
+
+def test_global_matching(tmpdir):
+    # Picking the shortest file for each track on its own gives "Love" the "Love Story" file.
+    for file_name in ('01 - Love (Remastered).mp3', '02 - Love Story.mp3', 'Bonus - Unknown.mp3'):
+        tmpdir.ensure(file_name)
+    tracks_list = [Track(1, 'Love'), Track(2, 'Love Story'), Track(3, 'Missing')]
+    assert match_tracks(tracks_list, DirectoryIndex(str(tmpdir))) == {
+        0: str(tmpdir.join('01 - Love (Remastered).mp3')), 1: str(tmpdir.join('02 - Love Story.mp3'))}
+
+
+def test_partial_title(tmpdir):
+    tmpdir.ensure('03 - Knights Of Cydonia (Live).mp3')
+    tmpdir.ensure('Cydonia.mp3')
+    index = DirectoryIndex(str(tmpdir))
+    # Partial titles are only matched along with the track's number.
+    assert match_tracks([Track(3, 'Knights of Cydonia Remix')], index) == {
+        0: str(tmpdir.join('03 - Knights Of Cydonia (Live).mp3'))}
+    assert match_tracks([Track(4, 'Knights of Cydonia Remix')], index) == {}
+
+
+def test_compilation(tmpdir):
+    tracks_list = [Track(number, 'Love Song Part {}'.format(number)) for number in range(1, 201)]
+    for track in tracks_list:
+        tmpdir.ensure('{} (Remastered).mp3'.format(track))
+    start_time = time.time()
+    matches = match_tracks(tracks_list, DirectoryIndex(str(tmpdir)))
+    assert time.time() - start_time < 10
+    assert all(matches[position] == str(tmpdir.join('{} (Remastered).mp3'.format(track)))
+               for position, track in enumerate(tracks_list))
+
+
+def test_solve_assignment():
+    assert sorted(_solve_assignment([[3, 2], [2, 0]])) == [(0, 1), (1, 0)]
+    assert sorted(_solve_assignment([[1], [5], [2]])) == [(1, 0)]
+
+
+def test_fuzzy_matching(tmpdir):
+    for file_name in ('01 - Yelow.mp3', '02 - Trouble (feat. Somebody) [2009 Remaster].mp3', 'Shivver.mp3',
+                      '07 - Clocks.mp3'):
+        tmpdir.ensure(file_name)
+    index = DirectoryIndex(str(tmpdir))
+    tracks_list = [Track(1, 'Yellow'), Track(2, 'Trouble (Remastered)'), Track(3, 'Shiver'), Track(4, 'Clock')]
+    # The file holding another track's number isn't matched.
+    assert match_tracks(tracks_list, index) == {
+        0: str(tmpdir.join('01 - Yelow.mp3')),
+        1: str(tmpdir.join('02 - Trouble (feat. Somebody) [2009 Remaster].mp3')),
+        2: str(tmpdir.join('Shivver.mp3'))}
+    assert match_tracks(tracks_list, index, fuzzy_threshold=None) == {}
+    assert match_tracks([Track(3, 'Shiver')], index, fuzzy_threshold=0.9) == {}
+
+
+def test_duration_matching(tmpdir, monkeypatch):
+    for file_name in ('01 - Yellow.mp3', '01 - Yellow (Live).mp3'):
+        tmpdir.ensure(file_name)
+    index = DirectoryIndex(str(tmpdir))
+    durations = {str(tmpdir.join('01 - Yellow.mp3')): 266.8, str(tmpdir.join('01 - Yellow (Live).mp3')): 301.2}
+    monkeypatch.setattr(index, 'get_duration', durations.get)
+    # Without the track's length, the shorter name wins.
+    assert match_tracks([Track(1, 'Yellow')], index) == {0: str(tmpdir.join('01 - Yellow.mp3'))}
+    assert match_tracks([Track(1, 'Yellow', duration=300)], index) == {0: str(tmpdir.join('01 - Yellow (Live).mp3'))}
@@ -1,9 +1,11 @@
 import os
+import shutil
 
 import pytest
 
-from file_utils import get_album, PathException, get_artist
-from .test_consts import TEST_ARTIST, TEST_ALBUM
+from mp3organizer.file_utils import get_album, PathException, get_artist, find_album_paths, DirectoryIndex
+from mp3organizer.normalization import normalize_name, get_name_tokens
+from .test_consts import TEST_ARTIST, TEST_ALBUM, TEST_FILES_DIRECTORY, TEST_FILE_AUDIO
 
 TEST_PATH = os.path.join("C:\\", TEST_ARTIST, TEST_ALBUM)
 TEST_INVALID_ALBUM_PATH = ""
@@ -34,3 +36,45 @@ def test_get_artist_with_path():
 def test_get_artist_invalid_path():
     with pytest.raises(PathException):
         get_artist(TEST_INVALID_ARTIST_PATH)
+
+
+def test_find_album_paths(tmpdir):
+    album_path = tmpdir.join(TEST_ARTIST, TEST_ALBUM)
+    album_path.ensure('01 - Track.mp3')
+    tmpdir.ensure(TEST_ARTIST, 'Empty Album', 'cover.jpg')
+    tmpdir.ensure(TEST_ARTIST, 'Loose Track.mp3')
+    assert find_album_paths(str(tmpdir)) == [str(album_path)]
+
+
+def test_directory_index(tmpdir):
+    for file_name in ('01 - Uprising.mp3', '01 - Uprising (Live).mp3', '02 - Resistance.mp3', '03 - Exogenesis.MP3',
+                      'Resistance.jpg'):
+        tmpdir.ensure(file_name)
+    index = DirectoryIndex(str(tmpdir))
+    # Extensions are matched regardless of their case.
+    assert len(index.files) == 4
+    assert index.find('uprising') == [str(tmpdir.join('01 - Uprising.mp3')),
+                                      str(tmpdir.join('01 - Uprising (Live).mp3'))]
+    assert index.find('Uprising Live') == [str(tmpdir.join('01 - Uprising (Live).mp3'))]
+    # Only whole words match.
+    assert index.find('Resist') == []
+    index.rename(str(tmpdir.join('02 - Resistance.mp3')), str(tmpdir.join('02 - Resistance Remix.mp3')))
+    assert index.find('Resistance') == [str(tmpdir.join('02 - Resistance Remix.mp3'))]
+
+
+def test_directory_index_durations(tmpdir):
+    shutil.copy2(os.path.join(os.path.dirname(__file__), TEST_FILES_DIRECTORY, TEST_FILE_AUDIO),
+                 str(tmpdir.join('01 - Audio.mp3')))
+    tmpdir.ensure('02 - Empty.mp3')
+    index = DirectoryIndex(str(tmpdir))
+    assert index.get_duration(str(tmpdir.join('01 - Audio.mp3'))) > 0
+    # Unreadable files have no length.
+    assert index.get_duration(str(tmpdir.join('02 - Empty.mp3'))) is None
+    index.rename(str(tmpdir.join('01 - Audio.mp3')), str(tmpdir.join('01 - Renamed.mp3')))
+    assert index._durations[str(tmpdir.join('01 - Renamed.mp3'))] > 0
+
+
+def test_normalize_name():
+    assert normalize_name('  01 - Don\'t Panic (Café Version)!  ') == '01 don t panic caf version'
+    assert get_name_tokens('Yellow [Live]') == ('yellow', 'live')
+    assert get_name_tokens('--') == ('',)
@@ -0,0 +1,53 @@
+import os
+import sys
+
+import pytest
+
+from mp3organizer.watcher import InotifyWatcher, PollingWatcher, Debouncer
+from .test_consts import TEST_ARTIST, TEST_ALBUM
+
+
+def _get_all_changes(watcher):
+    changes = set()
+    new_changes = watcher.get_changes(0.5)
+    while new_changes:
+        changes.update(new_changes)
+        new_changes = watcher.get_changes(0.1)
+    return changes
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='inotify is only available on Linux')
+def test_inotify_watcher(tmpdir):
+    tmpdir.ensure(TEST_ARTIST, dir=True)
+    watcher = InotifyWatcher(str(tmpdir))
+    # New directories are watched as well.
+    album_path = tmpdir.join(TEST_ARTIST, TEST_ALBUM)
+    album_path.ensure('01 - Track.mp3')
+    assert str(album_path) in _get_all_changes(watcher)
+    album_path.join('01 - Track.mp3').write('audio')
+    assert _get_all_changes(watcher) == {str(album_path)}
+    watcher.close()
+
+
+def test_polling_watcher(tmpdir):
+    album_path = tmpdir.join(TEST_ARTIST, TEST_ALBUM)
+    album_path.ensure('01 - Track.mp3')
+    watcher = PollingWatcher(str(tmpdir), interval=0)
+    assert watcher.get_changes(0) == set()
+    album_path.join('01 - Track.mp3').write('audio')
+    album_path.ensure('02 - Track.mp3')
+    assert watcher.get_changes(0) == {str(album_path)}
+    assert watcher.get_changes(0) == set()
+
+
+def test_debouncer():
+    debouncer = Debouncer(period=5)
+    assert debouncer.get_timeout(now=0) is None
+    debouncer.add([os.path.join(TEST_ARTIST, TEST_ALBUM), TEST_ARTIST], now=0)
+    # Changed directories are held until they stop changing.
+    debouncer.add([TEST_ARTIST], now=3)
+    assert debouncer.get_timeout(now=3) == 2
+    assert debouncer.pop_ready(now=4) == []
+    assert debouncer.pop_ready(now=5) == [os.path.join(TEST_ARTIST, TEST_ALBUM)]
+    assert debouncer.pop_ready(now=8) == [TEST_ARTIST]
+    assert debouncer.get_timeout(now=8) is None